@@ -1,11 +1,7 @@
 """ Classes that derive from TrafficArrays (like Traffic) get automated create,
     delete, and reset functionality for all registered child arrays."""
 # -*- coding: utf-8 -*-
-try:
-    from collections.abc import Collection
-except ImportError:
-    # In python <3.3 collections.abc doesn't exist
-    from collections import Collection
+from itertools import compress
 import numpy as np
 
 defaults = {"float": 0.0, "int": 0, "uint":0, "bool": False, "S": "", "str": ""}
@@ -30,7 +26,13 @@ class RegisterElementParameters:
 class TrafficArrays:
     """ Parent class to use separate arrays and lists to allow
         vectorizing but still maintain and object like benefits
-        for creation and deletion of an element for all parameters"""
+        for creation and deletion of an element for all parameters.
+
+        Registered arrays are views of the first ntraf elements of larger
+        storage buffers, of which the capacity is doubled when they are
+        full. Creating aircraft therefore doesn't copy all arrays each
+        time. Arrays can still be replaced by new arrays, these are copied
+        into the buffer (or get a new buffer) at the next create."""
 
     # The TrafficArrays class keeps track of all of the constructed
     # TrafficArray objects
@@ -51,6 +53,8 @@ class TrafficArrays:
         self._children = []
         self._ArrVars  = []
         self._LstVars  = []
+        # Storage buffers of the registered arrays, as (buffer, view) tuples
+        self._ArrBufs  = dict()
 
     def reparent(self, newparent):
         ''' Give TrafficArrays object a new parent. '''
@@ -64,32 +68,78 @@ class TrafficArrays:
         return RegisterElementParameters(self)
 
     def _init_trafarrays(self, keys):
+        presized = bool(self._LstVars or self._ArrVars)
+        newlst, newarr = [], []
         for key in keys:
             if isinstance(self.__dict__[key], list):
-                self._LstVars.append(key)
+                newlst.append(key)
             elif isinstance(self.__dict__[key], np.ndarray):
-                self._ArrVars.append(key)
+                newarr.append(key)
             elif isinstance(self.__dict__[key], TrafficArrays):
                 self.__dict__[key].reparent(self)
+        self._LstVars.extend(newlst)
+        self._ArrVars.extend(newarr)
 
         # In plugins and replaceable classes it could be that their instance
         # is created when the simulation is already running, and traffic is
         # present. Size traffic arrays accordingly here
         if TrafficArrays.root.ntraf:
-            self.create(TrafficArrays.root.ntraf)
+            if presized:
+                # A derived class registers additional arrays after its
+                # base class already sized its own: only size the new ones
+                self._append(newlst, newarr, TrafficArrays.root.ntraf)
+            else:
+                self.create(TrafficArrays.root.ntraf)
 
     def create(self, n=1):
         ''' Append n elements (aircraft) to all lists and arrays. '''
+        self._append(self._LstVars, self._ArrVars, n)
 
-        for v in self._LstVars:  # Lists (mostly used for strings)
+    def _append(self, lstvars, arrvars, n):
+        ''' Append n default elements to the given lists and arrays. '''
+        for v in lstvars:  # Lists (mostly used for strings)
             lst = self.__dict__.get(v)
             vartype = type(lst[0]).__name__ if lst else 'str'
             lst.extend([defaults.get(vartype)] * n)
 
-        for v in self._ArrVars:  # Numpy array
+        for v in arrvars:  # Numpy array
+            arr = self.__dict__[v]
+            nold = len(arr)
             # Get type without byte length
-            vartype = ''.join(c for c in str(self.__dict__[v].dtype) if c.isalpha())
-            self.__dict__[v] = np.append(self.__dict__[v], [defaults.get(vartype, 0)] * n)
+            vartype = ''.join(c for c in str(arr.dtype) if c.isalpha())
+            default = defaults.get(vartype, 0)
+            buf, view = self._ArrBufs.get(v, (None, None))
+            if arr is not view and view is not None and len(view) == nold and \
+                    arr.dtype == buf.dtype and len(buf) >= nold + n:
+                # The array was replaced by an array of the same size and
+                # type since the last create (for instance by an assignment
+                # like traf.lat = newlat): copy it into the current buffer.
+                # Arrays should preferably be updated in place (traf.lat[:] =
+                # newlat), as this copy still costs O(ntraf) per create.
+                buf[:nold] = arr
+            elif arr is not view or len(buf) < nold + n:
+                # Allocate a new buffer when the current one is full, or when
+                # the array was resized since the last create (for instance
+                # by a delete). Views of the old buffer may still be in use
+                # elsewhere, so these are left untouched. The buffer type
+                # follows the type promotion of np.append (e.g., '<U1'
+                # becomes '<U21').
+                dtype = np.result_type(arr.dtype, np.array([default]).dtype)
+                buf = np.empty((newcapacity(nold + n),) + arr.shape[1:], dtype=dtype)
+                buf[:nold] = arr
+
+            buf[nold:nold + n] = default
+            view = buf[:nold + n]
+            self._ArrBufs[v] = (buf, view)
+            self.__dict__[v] = view
+
+    def capacity(self, name):
+        ''' Returns the number of elements that traffic array 'name' can hold
+            before its storage needs to be reallocated. '''
+        buf, view = self._ArrBufs.get(name, (None, None))
+        if view is None or self.__dict__[name] is not view:
+            return len(self.__dict__[name])
+        return len(buf)
 
     def istrafarray(self, name):
         ''' Returns true if parameter 'name' is a traffic array. '''
@@ -107,17 +157,33 @@ class TrafficArrays:
         for child in self._children:
             child.delete(idx)
 
+        if not (self._ArrVars or self._LstVars):
+            return
+
+        # Compact all lists and arrays in a single pass using a mask of the
+        # remaining elements. Arrays are compacted into a new buffer, as
+        # views of the current buffer may still be in use elsewhere.
+        first = self.__dict__[(self._ArrVars or self._LstVars)[0]]
+        keep = np.ones(len(first), dtype=bool)
+        keep[np.asarray(idx)] = False
+        nkeep = np.count_nonzero(keep)
         for v in self._ArrVars:
-            self.__dict__[v] = np.delete(self.__dict__[v], idx)
+            arr = self.__dict__[v]
+            buf = np.empty((newcapacity(nkeep),) + arr.shape[1:], dtype=arr.dtype)
+            view = np.compress(keep, arr, axis=0, out=buf[:nkeep])
+            self._ArrBufs[v] = (buf, view)
+            self.__dict__[v] = view
 
-        if self._LstVars:
-            if isinstance(idx, Collection):
-                for i in reversed(idx):
-                    for v in self._LstVars:
-                        del self.__dict__[v][i]
-            else:
-                for v in self._LstVars:
-                    del self.__dict__[v][idx]
+        for v in self._LstVars:
+            self.__dict__[v][:] = compress(self.__dict__[v], keep)
+
+    def remap(self, newidx):
+        ''' Called after aircraft are deleted, with for each aircraft index
+            before the delete its new index, or -1 for deleted aircraft.
+            Objects that store aircraft indices can override this function
+            to update these. '''
+        for child in self._children:
+            child.remap(newidx)
 
     def reset(self):
         ''' Delete all elements from arrays and start at 0 aircraft. '''
@@ -125,7 +191,16 @@ class TrafficArrays:
             child.reset()
 
         for v in self._ArrVars:
-            self.__dict__[v] = np.array([], dtype=self.__dict__[v].dtype)
+            arr = self.__dict__[v]
+            self.__dict__[v] = np.empty((0,) + arr.shape[1:], dtype=arr.dtype)
+        self._ArrBufs.clear()
 
         for v in self._LstVars:
             self.__dict__[v] = []
+
+
+def newcapacity(nmin):
+    ''' Capacity of a new storage buffer that holds at least nmin elements.
+        Twice the required size is allocated, so that appending aircraft one
+        by one has an amortised cost of O(1) per aircraft and array. '''
+    return max(16, 2 * nmin)
@@ -232,7 +232,7 @@ class ScreenIO:
 
     def send_trails(self):
         # Trails, send only new line segments to be added
-        if bs.traf.trails.active and len(bs.traf.trails.newlat0) > 0:
+        if bs.traf.trails.active and bs.traf.trails.nnew > 0:
             data = dict(swtrails=bs.traf.trails.active,
                         traillat0=bs.traf.trails.newlat0,
                         traillon0=bs.traf.trails.newlon0,
@@ -257,10 +257,10 @@ class ScreenIO:
         data['inconf'] = bs.traf.cd.inconf
         data['tcpamax'] = bs.traf.cd.tcpamax
         data['rpz'] = bs.traf.cd.rpz
-        data['nconf_cur'] = len(bs.traf.cd.confpairs_unique)
-        data['nconf_tot'] = len(bs.traf.cd.confpairs_all)
-        data['nlos_cur'] = len(bs.traf.cd.lospairs_unique)
-        data['nlos_tot'] = len(bs.traf.cd.lospairs_all)
+        data['nconf_cur'] = len(bs.traf.cd.confkeys)
+        data['nconf_tot'] = bs.traf.cd.nconf_all
+        data['nlos_cur'] = len(bs.traf.cd.loskeys)
+        data['nlos_tot'] = bs.traf.cd.nlos_all
         data['trk']        = bs.traf.trk
         data['vs']         = bs.traf.vs
         data['vmin']       = bs.traf.perf.vmin
@@ -306,12 +306,12 @@ def _sendrte(sender, acid):
         data['aclat']  = bs.traf.lat[idx]
         data['aclon']  = bs.traf.lon[idx]
 
-        data['wplat']  = route.wplat
-        data['wplon']  = route.wplon
+        data['wplat']  = route.wplat.tolist()
+        data['wplon']  = route.wplon.tolist()
 
-        data['wpalt']  = route.wpalt
-        data['wpspd']  = route.wpspd
+        data['wpalt']  = route.wpalt.tolist()
+        data['wpspd']  = route.wpspd.tolist()
 
-        data['wpname'] = route.wpname
+        data['wpname'] = route.wpname.tolist()
 
     bs.net.send_stream(b'ROUTEDATA' + (sender or b'*'), data)  # Send route data to GUI
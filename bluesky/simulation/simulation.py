@@ -72,8 +72,10 @@ class Simulation:
         if (not self.ffmode or self.state != bs.OP) and remainder > MINSLEEP:
             time.sleep(remainder)
 
-        # Always update stack
+        # Always update stack, and delete aircraft that were deleted by
+        # stack commands
         simstack.process()
+        bs.traf.flushdelete()
 
         if self.state == bs.OP:
             # Plot/log the current timestep, and call preupdate functions
@@ -98,6 +100,9 @@ class Simulation:
             bs.traf.update()
             simtime.update()
 
+            # Delete aircraft that were queued for deletion in this timestep
+            bs.traf.flushdelete()
+
         # Always update syst
         self.syst += self.simdt / self.dtmult
 
@@ -74,6 +74,12 @@ def initbasecmds():
             bs.traf.cond.atdistcmd,
             "When a/c passing this distance[nm] to position, execute the command cmd",
         ],
+        "ATMOSLUT": [
+            "ATMOSLUT [ON/OFF], [step]",
+            "[onoff,float]",
+            aero.atmoslut,
+            "Switch table-driven atmosphere (with given altitude step [m]) on or off",
+        ],
         "ATSPD": [
             "acid ATSPD spd cmd ",
             "acid,spd,string",
@@ -187,7 +193,7 @@ def initbasecmds():
             if isinstance(a[0], str)
             else bs.traf.groups.delgroup(a[0])
             if hasattr(a[0], "groupname")
-            else bs.traf.delete(a),
+            else bs.traf.queuedelete(a),
             "Delete command (aircraft, wind, area)",
         ],
 
@@ -360,6 +366,12 @@ def initbasecmds():
             "[bool]",
             bs.sim.realtime,
             "En-/disable realtime running allowing a variable timestep."],
+        "RENAME": [
+            "RENAME acid,newid",
+            "acid,txt",
+            bs.traf.rename,
+            "Change the callsign of an aircraft",
+        ],
         "RESET": ["RESET", "", bs.sim.reset, "Reset simulation"],
         "SEED": [
             "SEED value",
@@ -190,6 +190,17 @@ def savecmd(cmd, line):
     savefile.write(f'{timtxt}>{line}\n')
 
 
+def savecmds(cmd, lines):
+    ''' Save multiple command lines to file if SAVEIC is turned on.
+        lines can be a generator, which is then only evaluated when
+        recording. '''
+    if savefile is None or cmd in saveexcl:
+        return
+
+    timtxt = tim2txt(bs.sim.simt - saveict0)
+    savefile.writelines(f'{timtxt}>{line}\n' for line in lines)
+
+
 def reset():
     ''' Reset SAVEIC recorder: close file and reset excluded command list. '''
     global saveexcl
@@ -16,7 +16,7 @@ settings.set_variable_defaults(start_location="EHAM", scenario_path="scenario")
 
 # List of TMX commands not yet implemented in BlueSky
 tmxlist = ("BGPASAS", "DFFLEVEL", "FFLEVEL", "FILTCONF", "FILTTRED", "FILTTAMB",
-           "GRAB", "HDGREF", "MOVIE", "NAVDB", "PREDASAS", "RENAME", "RETYPE",
+           "GRAB", "HDGREF", "MOVIE", "NAVDB", "PREDASAS", "RETYPE",
            "SWNLRPASAS", "TRAFRECDT", "TRAFLOGDT", "TREACT", "WINDGRID")
 
 
@@ -0,0 +1,364 @@
+"""
+Tests alternative conflict detection implementations against the
+reference StateBased implementation.
+"""
+import numpy as np
+import bluesky as bs
+from bluesky.tools.aero import ft, kts, Rearth
+from bluesky.traffic.asas import StateBased, StateBased32, GridStateBased, \
+    ParallelStateBased, IncrementalStateBased, AltitudeStateBased, MVP
+from bluesky.traffic.asas.statebased import detect_pairs, pairs2conflicts
+
+
+def create_random_traffic(traffic_, n, lat0=52.0, lon0=4.0, span=3.0):
+    """
+    Create n aircraft with random positions, headings, speeds and
+    flight levels, of which some are climbing or descending.
+    """
+    rng = np.random.RandomState(42)
+    traffic_.reset()
+    acid = ['AC{:05d}'.format(i) for i in range(n)]
+    lat = lat0 + rng.rand(n) * span
+    lon = (lon0 + rng.rand(n) * span + 180.0) % 360.0 - 180.0
+    hdg = rng.rand(n) * 360.0
+    alt = (rng.choice([30000., 31000., 32000.], n) + rng.rand(n) * 400.) * ft
+    spd = (250. + rng.rand(n) * 200.) * kts
+    traffic_.cre(acid, 'B744', lat, lon, hdg, alt, spd)
+    traffic_.vs[:] = np.where(rng.rand(n) < 0.2, (rng.rand(n) - 0.5) * 20.0, 0.0)
+
+
+def detect(traffic_, method):
+    """
+    Select CD method, and perform conflict detection for the current traffic.
+    """
+    method.select()
+    cd = traffic_.cd
+    return cd.detect(traffic_, traffic_, cd.rpz, cd.hpz, cd.dtlookahead)
+
+
+def assert_same_detection(traffic_, method):
+    """
+    Compare the output of a CD method with that of StateBased.
+    """
+    ref = detect(traffic_, StateBased)
+    res = detect(traffic_, method)
+
+    assert list(res[0]) == ref[0]
+    assert list(res[1]) == ref[1]
+    for refvalue, value in zip(ref[2:], res[2:]):
+        assert np.array_equal(np.asarray(refvalue), np.asarray(value))
+
+
+def test_statebased32(traffic_):
+    """
+    Single-precision screening should give identical results to double
+    precision, also around the dateline and at high latitudes.
+    """
+    create_random_traffic(traffic_, 400)
+    assert_same_detection(traffic_, StateBased32)
+
+    create_random_traffic(traffic_, 400, lon0=178.5)
+    assert_same_detection(traffic_, StateBased32)
+
+    create_random_traffic(traffic_, 400, lat0=80.0, span=9.0)
+    assert_same_detection(traffic_, StateBased32)
+    traffic_.reset()
+
+
+def test_gridstatebased(traffic_):
+    """
+    Grid-based detection should give identical results to StateBased,
+    also around the dateline, at high latitudes and around the pole.
+    """
+    create_random_traffic(traffic_, 400)
+    assert_same_detection(traffic_, GridStateBased)
+
+    create_random_traffic(traffic_, 400, lon0=178.5)
+    assert_same_detection(traffic_, GridStateBased)
+
+    create_random_traffic(traffic_, 400, lat0=80.0, span=9.0)
+    assert_same_detection(traffic_, GridStateBased)
+
+    # Slow aircraft around the north pole, so that longitude cells sized
+    # for a latitude below the pole would be too narrow
+    create_random_traffic(traffic_, 400)
+    rng = np.random.RandomState(43)
+    traffic_.lat[:] = 90.0 - rng.rand(400)
+    traffic_.lon[:] = rng.rand(400) * 360.0 - 180.0
+    traffic_.gs[:] *= 0.1
+    assert_same_detection(traffic_, GridStateBased)
+    traffic_.reset()
+
+
+def test_statebased_tiled(traffic_):
+    """
+    Tiled detection should give identical results to full-matrix detection.
+    """
+    create_random_traffic(traffic_, 400)
+    ref = detect(traffic_, StateBased)
+    StateBased.implinstance().blocksize = 64
+    res = detect(traffic_, StateBased)
+    StateBased.implinstance().blocksize = 0
+
+    assert res[0] == ref[0]
+    assert res[1] == ref[1]
+    for refvalue, value in zip(ref[2:], res[2:]):
+        assert np.array_equal(np.asarray(refvalue), np.asarray(value))
+    traffic_.reset()
+
+
+def test_parallelstatebased(traffic_):
+    """
+    Multi-threaded detection should give identical results, and identical
+    pair ordering, independent of the number of workers.
+    """
+    create_random_traffic(traffic_, 400)
+    for nworkers in (1, 3, 4):
+        ParallelStateBased.select()
+        traffic_.cd.setnworkers(nworkers)
+        assert_same_detection(traffic_, ParallelStateBased)
+
+    # Without traffic the results should be empty
+    traffic_.reset()
+    res = detect(traffic_, ParallelStateBased)
+    assert len(res[0]) == 0 and len(res[1]) == 0
+    assert all(len(value) == 0 for value in res[2:])
+
+
+def test_incrementalstatebased(traffic_):
+    """
+    Incremental detection should give identical results to StateBased
+    when aircraft move between detection cycles, and should skip
+    aircraft that can't be in conflict yet.
+    """
+    create_random_traffic(traffic_, 100, span=20.0)
+    simt = bs.sim.simt
+    dt = 10.0
+    for _ in range(5):
+        assert_same_detection(traffic_, IncrementalStateBased)
+        bs.sim.simt += dt
+        traffic_.lat += np.degrees(dt * traffic_.gsnorth / Rearth)
+        traffic_.lon += np.degrees(dt * traffic_.gseast / Rearth /
+                                   np.cos(np.radians(traffic_.lat)))
+        traffic_.alt += dt * traffic_.vs
+    assert np.any(traffic_.cd.tnextcheck > bs.sim.simt - dt)
+    bs.sim.simt = simt
+    traffic_.reset()
+
+
+def test_incrementalstatebased_intruder(traffic_):
+    """
+    Incremental detection against separate intruder data should bound
+    the closing speed with the speeds of the intruders, and aircraft
+    within a foot of their selected altitude should be scheduled as level.
+    """
+    from types import SimpleNamespace
+    traffic_.reset()
+    traffic_.cre(['IN0', 'IN1'], 'B744', np.full(2, 52.0), np.array([4.0, 8.4]),
+                 np.array([90.0, 270.0]), 30000.0 * ft, 250.0 * kts)
+    traffic_.alt += 0.5 * ft
+    # The intruder data reports three times the ground speed
+    intruder = SimpleNamespace(**{name: getattr(traffic_, name).copy() for name in
+                                  ('lat', 'lon', 'alt', 'trk', 'tas', 'vs')})
+    intruder.gs = 3.0 * traffic_.gs
+    idx1, idx2 = np.array([0, 1]), np.array([1, 0])
+    IncrementalStateBased.select()
+    cd = traffic_.cd
+    simt = bs.sim.simt
+    dt = 20.0
+    nconf = 0
+    for i in range(25):
+        ref = pairs2conflicts(traffic_, idx1, idx2, *detect_pairs(
+            traffic_, intruder, cd.rpz, cd.hpz, cd.dtlookahead, idx1, idx2))
+        res = cd.detect(traffic_, intruder, cd.rpz, cd.hpz, cd.dtlookahead)
+        assert list(res[0]) == list(ref[0])
+        nconf += len(ref[0])
+        if i == 0:
+            assert np.all(cd.tnextcheck > bs.sim.simt)
+        for ac in (traffic_, intruder):
+            ac.lon += np.degrees(dt * ac.gs * np.sin(np.radians(ac.trk)) / Rearth /
+                                 np.cos(np.radians(ac.lat)))
+        bs.sim.simt += dt
+    assert nconf > 0
+    bs.sim.simt = simt
+    traffic_.reset()
+
+
+def test_altitudestatebased(traffic_):
+    """
+    Detection with altitude prefilter should give identical results to
+    StateBased, and should prune vertically separated pairs.
+    """
+    create_random_traffic(traffic_, 400)
+    assert_same_detection(traffic_, AltitudeStateBased)
+    cd = traffic_.cd
+    assert 0 < cd.npruned < cd.npairs == 400 * 399
+    traffic_.reset()
+
+
+def test_conflict_database(traffic_):
+    """
+    The index-based conflict database should give the same unique and
+    cumulative conflicts as sets of callsign pairs, also when aircraft
+    are deleted between detection cycles.
+    """
+    create_random_traffic(traffic_, 200)
+    StateBased.select()
+    cd = traffic_.cd
+    ref_all = list()
+    ref_unique = set()
+    for _ in range(3):
+        cd.update(traffic_, traffic_)
+        unique = {frozenset(pair) for pair in cd.confpairs}
+        ref_all.extend(unique - ref_unique)
+        ref_unique = unique
+        assert cd.confpairs_unique == ref_unique
+        assert cd.lospairs_unique == {frozenset(pair) for pair in cd.lospairs}
+        assert sorted(map(sorted, cd.confpairs_all)) == sorted(map(sorted, ref_all))
+        assert cd.nconf_all == len(ref_all)
+        traffic_.delete(np.arange(0, traffic_.ntraf, 7))
+
+    # Tools and plugins can assign the callsign sets and lists, also with
+    # pairs of deleted aircraft, or clear them
+    cd.update(traffic_, traffic_)
+    assert cd.confpairs_unique and ref_all
+    pairs_all = cd.confpairs_all
+    cd.confpairs_all = pairs_all[:2]
+    assert cd.confpairs_all == pairs_all[:2] and cd.nconf_all == 2
+    unique = cd.confpairs_unique
+    cd.confpairs_unique = set(list(unique)[1:])
+    assert cd.confpairs_unique == set(list(unique)[1:])
+    cd.update(traffic_, traffic_)
+    assert cd.confpairs_all == pairs_all[:2] + [list(unique)[0]]
+    cd.confpairs_unique = set()
+    cd.lospairs_unique = set()
+    cd.confpairs_all = []
+    cd.lospairs_all = []
+    cd.confpairs.clear()
+    assert not (cd.confpairs_unique or cd.confpairs_all or cd.confpairs)
+    assert cd.nconf_all == cd.nlos_all == 0
+    traffic_.reset()
+
+
+def mvp_reference(cr, conf, ownship, intruder):
+    """
+    Resolution vectors of MVP, computed per conflict pair.
+    """
+    dv = np.zeros((ownship.ntraf, 3))
+    timesolveV = np.ones(ownship.ntraf) * 1e9
+    for ((ac1, ac2), qdr, dist, tcpa, tLOS) in zip(conf.confpairs, conf.qdr, conf.dist, conf.tcpa, conf.tLOS):
+        idx1 = ownship.id.index(ac1)
+        idx2 = intruder.id.index(ac2)
+        dv_mvp, tsolV = cr.MVP(ownship, intruder, conf, qdr, dist, tcpa, tLOS, idx1, idx2)
+        if tsolV < timesolveV[idx1]:
+            timesolveV[idx1] = tsolV
+        if cr.swprio:
+            dv[idx1], _ = cr.applyprio(dv_mvp, dv[idx1], dv[idx2], ownship.vs[idx1], intruder.vs[idx2])
+        else:
+            dv_mvp[2] = 0.5 * dv_mvp[2]
+            dv[idx1] = dv[idx1] - dv_mvp
+        if cr.noresoac[idx2]:
+            dv[idx1] = dv[idx1] + dv_mvp
+        if cr.resooffac[idx1]:
+            dv[idx1] = 0.0
+    return dv, timesolveV
+
+
+def test_mvp_vectorised(traffic_):
+    """
+    Array-based MVP should give identical resolutions to pairwise MVP,
+    for all priority rules.
+    """
+    create_random_traffic(traffic_, 300)
+    StateBased.select()
+    MVP.select()
+    cd, cr = traffic_.cd, traffic_.cr
+    cd.update(traffic_, traffic_)
+    assert len(cd.confpairs) > 0
+    cr.noresoac[::7] = True
+    cr.resooffac[::11] = True
+    for swprio, priocode in [(False, ''), (True, 'FF1'), (True, 'FF2'),
+                             (True, 'FF3'), (True, 'LAY1'), (True, 'LAY2')]:
+        cr.swprio, cr.priocode = swprio, priocode
+        ref = mvp_reference(cr, cd, traffic_, traffic_)
+        res = cr.resolution_vectors(cd, traffic_, traffic_)
+        assert np.array_equal(ref[0], res[0])
+        assert np.array_equal(ref[1], res[1])
+    cr.swprio, cr.priocode = False, ''
+    traffic_.reset()
+
+
+def resumenav_reference(cr, conf, ownship, intruder, resopairs):
+    """
+    Resume navigation decision, evaluated per resolution pair.
+    Returns the new active flags, and the remaining resolution pairs.
+    """
+    def anglediff(a, b):
+        d = a - b
+        if d > 180:
+            return anglediff(a, b + 360)
+        elif d < -180:
+            return anglediff(a + 360, b)
+        return d
+
+    active = cr.active.copy()
+    resopairs = resopairs | set(conf.confpairs)
+    delpairs = set()
+    changeactive = dict()
+    for conflict in resopairs:
+        idx1, idx2 = ownship.id2idx(conflict)
+        if idx1 < 0:
+            delpairs.add(conflict)
+            continue
+        if idx2 >= 0:
+            re = 6371000.
+            dist = re * np.array([np.radians(intruder.lon[idx2] - ownship.lon[idx1]) *
+                                  np.cos(0.5 * np.radians(intruder.lat[idx2] +
+                                                          ownship.lat[idx1])),
+                                  np.radians(intruder.lat[idx2] - ownship.lat[idx1])])
+            vrel = np.array([intruder.gseast[idx2] - ownship.gseast[idx1],
+                             intruder.gsnorth[idx2] - ownship.gsnorth[idx1]])
+            past_cpa = np.dot(dist, vrel) > 0.0
+            rpz = np.max(conf.rpz[[idx1, idx2]])
+            hdist = np.linalg.norm(dist)
+            hor_los = hdist < rpz
+            is_bouncing = abs(anglediff(ownship.trk[idx1], intruder.trk[idx2])) < 30.0 and \
+                hdist < rpz * cr.resofach
+        if idx2 >= 0 and (not past_cpa or hor_los or is_bouncing):
+            changeactive[idx1] = True
+        else:
+            changeactive[idx1] = changeactive.get(idx1, False)
+            delpairs.add(conflict)
+    for idx, isactive in changeactive.items():
+        active[idx] = isactive
+    return active, resopairs - delpairs
+
+
+def test_resumenav_vectorised(traffic_):
+    """
+    Array-based resume navigation should give the same active flags and
+    resolution pairs as the pairwise implementation, also when aircraft
+    are deleted.
+    """
+    create_random_traffic(traffic_, 300)
+    StateBased.select()
+    MVP.select()
+    cd, cr = traffic_.cd, traffic_.cr
+    refpairs = set()
+    dt = 20.0
+    for _ in range(6):
+        cd.update(traffic_, traffic_)
+        refactive, refpairs = resumenav_reference(cr, cd, traffic_, traffic_, refpairs)
+        cr.resumenav(cd, traffic_, traffic_)
+        assert np.array_equal(cr.active, refactive)
+        idx1 = traffic_.uid2idx(cr.resopairs >> 32)
+        idx2 = traffic_.uid2idx(cr.resopairs & 0xffffffff)
+        assert {(traffic_.id[i], traffic_.id[j]) for i, j in zip(idx1, idx2)} == refpairs
+
+        # Move aircraft, and delete some
+        traffic_.lat += np.degrees(dt * traffic_.gsnorth / Rearth)
+        traffic_.lon += np.degrees(dt * traffic_.gseast / Rearth /
+                                   np.cos(np.radians(traffic_.lat)))
+        traffic_.alt += dt * traffic_.vs
+        traffic_.delete(np.arange(0, traffic_.ntraf, 13))
+    traffic_.reset()
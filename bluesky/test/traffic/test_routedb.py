@@ -0,0 +1,262 @@
+"""
+Tests the columnar route database, and the list-like waypoint views of
+Route objects.
+"""
+import gc
+import numpy as np
+from bluesky.traffic.route import Route
+from bluesky.traffic.routedb import RouteDatabase, WaypointColumn, routedb
+from bluesky.tools.misc import txt2alt, txt2spd
+
+
+def test_routedb_insert_delete():
+    """
+    Inserting and deleting waypoints in many routes should give the same
+    result as with lists, also when blocks are moved and compacted, and
+    when routes are created in bulk.
+    """
+    rng = np.random.RandomState(7)
+    db = RouteDatabase()
+    ref = dict()
+    for _ in range(5000):
+        action = rng.rand()
+        if action < 0.03 or not ref:
+            ref[db.newslot()] = []
+        elif action < 0.05:
+            slots = db.newslots(rng.randint(1, 40)).tolist()
+            assert len(set(slots)) == len(slots) and not set(slots) & set(ref)
+            ref.update((slot, []) for slot in slots)
+        elif action < 0.08:
+            slot = list(ref)[rng.randint(len(ref))]
+            db.free(slot)
+            del ref[slot]
+        else:
+            slot = list(ref)[rng.randint(len(ref))]
+            wps = ref[slot]
+            if action < 0.8 or not wps:
+                idx = rng.randint(len(wps) + 1)
+                lat = rng.rand()
+                db.insert(slot, idx, wpname=f'WP{lat:.6f}', wplat=lat)
+                wps.insert(idx, lat)
+            else:
+                idx = rng.randint(len(wps))
+                db.delete(slot, idx)
+                del wps[idx]
+
+    assert db.nunused < db.top
+    for slot, wps in ref.items():
+        assert WaypointColumn(db, slot, 'wplat') == wps
+        assert WaypointColumn(db, slot, 'wpname') == [f'WP{lat:.6f}' for lat in wps]
+        assert np.all(db.column(slot, 'wpalt') == -999.0)
+    db.compact()
+    assert db.nunused == 0
+    for slot, wps in ref.items():
+        assert WaypointColumn(db, slot, 'wplat') == wps
+
+
+def test_route_view(traffic_):
+    """
+    Waypoint attributes of a route should behave like lists, and active
+    waypoint data should be available for all aircraft at once.
+    """
+    traffic_.reset()
+    traffic_.cre(['AC0', 'AC1', 'AC2'], 'B744', np.full(3, 52.0),
+                 np.array([4.0, 5.0, 6.0]), 90.0, 3000.0, 150.0)
+    for i in range(2):
+        route = traffic_.ap.route[i]
+        for j in range(3):
+            route.addwpt(i, f'AC{i}', route.wplatlon, 52.25 + 0.25 * j,
+                         4.0 + i + 0.25 * j, 1000.0 * j)
+
+    route = traffic_.ap.route[1]
+    assert route.nwp == 3 and route.iactwp == -1
+    assert route.wpname == ['AC1001', 'AC1002', 'AC1003']
+    assert route.wplat[-1] == 52.75 and isinstance(route.wplat[0], float)
+    assert route.wplat[1:] == [52.5, 52.75]
+    assert route.wpname.index('AC1002') == 1 and 'AC1003' in route.wpname
+
+    # Commands stacked at a waypoint
+    assert route.wpstack[1] == []
+    route.wpstack[1].append('ECHO PASSED')
+    assert route.wpstack[1] == ['ECHO PASSED']
+
+    # Route-related data of a deleted waypoint is removed as well
+    route.delwpt(1, 'AC1002')
+    assert route.wpname == ['AC1001', 'AC1003']
+    assert route.wpstack == [[], []]
+    route.calcfp()
+    assert len(route.wpxtoalt) == 2
+
+    traffic_.ap.route[0].iactwp = 0
+    route.iactwp = 1
+    lat, alt = routedb.getactwp(traffic_.ap.routeslot, 'wplat', 'wpalt')
+    assert np.array_equal(lat, [52.25, 52.75, 0.0])
+    assert np.array_equal(alt, [0.0, 2000.0, -999.0])
+    traffic_.reset()
+
+def test_getnextwps(traffic_):
+    """
+    Going to the next waypoint of many routes at once should give the same
+    data as doing this per route, and should advance the active waypoint
+    until the last waypoint.
+    """
+    rng = np.random.RandomState(3)
+    traffic_.reset()
+    n = 20
+    traffic_.cre([f'AC{i}' for i in range(n)], 'B744', np.full(n, 52.0),
+                 np.linspace(4.0, 5.0, n), 90.0, 3000.0, 150.0)
+    routes = traffic_.ap.route
+    for i, route in enumerate(routes):
+        for j in range(i % 5 + 1):
+            route.addwpt(i, f'AC{i}', route.wplatlon, 52.0 + rng.rand(),
+                         4.0 + rng.rand(), 1000.0 * rng.randint(-1, 3))
+        route.wpflyturn = (rng.rand(route.nwp) < 0.3).tolist()
+        route.wpturnrad = rng.rand(route.nwp).tolist()
+        route.iactwp = rng.randint(-1, route.nwp)
+        route.calcfp()
+
+    for _ in range(4):
+        iactwp = [route.iactwp for route in routes]
+        ref = [route.getnextwp() for route in routes]
+        refturn = [route.getnextturnwp() for route in routes]
+        refiactwp = [route.iactwp for route in routes]
+        for route, i in zip(routes, iactwp):
+            route.iactwp = i
+        res = Route.getnextwps(traffic_.ap.routeslot)
+        resturn = Route.getnextturnwps(traffic_.ap.routeslot)
+        assert [route.iactwp for route in routes] == refiactwp
+        for i in range(n):
+            assert [value[i] for value in res] == list(ref[i])
+            assert [value[i] for value in resturn] == list(refturn[i])
+
+    # Next waypoint data of a single route
+    route = routes[0]
+    routedb.clear(route.slot)
+    for lat in (52.0, 52.5, 53.0):
+        route.addwpt(0, 'AC0', route.wplatlon, lat, 4.0, 2000.0)
+    route.iactwp = 0
+    lat, lon, alt, spd, xtoalt, toalt, xtorta, torta, lnavon, flyby, flyturn, \
+        turnrad, turnspd, nextqdr, swlastwp = route.getnextwp()
+    assert route.iactwp == 1 and lnavon and not swlastwp
+    assert (lat, lon, alt, toalt) == (52.5, 4.0, 2000.0, 2000.0)
+    assert abs(nextqdr) < 1e-6
+    route.getnextwp()
+    lnavon, swlastwp = route.getnextwp()[8::6]
+    assert route.iactwp == 2 and not lnavon and swlastwp
+    traffic_.reset()
+
+
+def test_calcfp_incremental(traffic_):
+    """
+    Recalculating only the changed part of a flight plan should give the
+    same result as recalculating the complete flight plan.
+    """
+    rng = np.random.RandomState(11)
+    traffic_.reset()
+    traffic_.cre(['AC0'], 'B744', np.full(1, 52.0), np.full(1, 4.0),
+                 90.0, 3000.0, 150.0)
+    route = traffic_.ap.route[0]
+    fields = ('wpdirfrom', 'wpdistto', 'wpialt', 'wptoalt', 'wpxtoalt',
+              'wpirta', 'wptorta', 'wpxtorta')
+    for i in range(300):
+        action = rng.rand()
+        if action < 0.5 or route.nwp < 3:
+            afterwp = route.wpname[rng.randint(route.nwp)] \
+                if route.nwp and rng.rand() < 0.5 else ''
+            route.addwpt(0, f'WP{i}', route.wplatlon, 52.0 + rng.rand(),
+                         4.0 + rng.rand(), rng.choice([-999.0, 1000.0 * rng.randint(10)]),
+                         afterwp=afterwp)
+        elif action < 0.7:
+            routedb.delete(route.slot, rng.randint(route.nwp))
+        elif action < 0.85:
+            route.wpalt[rng.randint(route.nwp)] = rng.choice([-999.0, 1000.0 * rng.randint(10)])
+        else:
+            route.wprta[rng.randint(route.nwp)] = rng.choice([-999.0, 100.0 * rng.randint(100)])
+
+        route.calcfp()
+        res = [getattr(route, name)[:] for name in fields]
+        routedb.touch(route.slot)
+        route.calcfp()
+        assert res == [getattr(route, name)[:] for name in fields]
+    traffic_.reset()
+
+
+def test_addwpts(traffic_):
+    """
+    Adding a list of waypoints at once should give the same route as
+    adding them one by one.
+    """
+    traffic_.reset()
+    traffic_.cre(['AC0', 'AC1'], 'B744', np.full(2, 52.0), np.full(2, 4.0),
+                 90.0, 3000.0, 150.0)
+    wpts = [('52.1', '4.1', 'FL100', '250'), ('52.2', '4.3', '', ''),
+            ('52.4', '4.2', '5000', ''), ('52.5', '4.5', '', '0.78')]
+    for wpt in wpts:
+        Route.addwptStack(0, f'{wpt[0]},{wpt[1]}', txt2alt(wpt[2]) if wpt[2] else None,
+                          txt2spd(wpt[3]) if wpt[3] else None)
+    assert Route.addwptsStack(1, ','.join(','.join(wpt) for wpt in wpts))
+
+    ref, route = traffic_.ap.route
+    assert route.nwp == 4
+    for name in ('wplat', 'wplon', 'wpalt', 'wpspd', 'wptoalt', 'wpxtoalt',
+                 'wpdistto', 'wpdirfrom'):
+        assert getattr(route, name) == getattr(ref, name)
+    assert route.iactwp == ref.iactwp
+
+    # Waypoints added to a route that is already flown should not make the
+    # autopilot fly direct to the active waypoint again
+    traffic_.actwp.lat[1] = traffic_.actwp.lon[1] = 0.0
+    traffic_.ap.trk[1] = 45.0
+    assert Route.addwptsStack(1, '52.6,4.6,3000,')
+    assert traffic_.actwp.lat[1] == traffic_.actwp.lon[1] == 0.0
+    assert traffic_.ap.trk[1] == 45.0
+    assert traffic_.actwp.nextaltco[1] == route.wptoalt[route.iactwp]
+
+    res = Route.addwptsStack(1, '52.7,4.7,,,,FL100')
+    assert not res[0] and route.nwp == 6
+    traffic_.reset()
+
+
+def test_route_release(traffic_):
+    """
+    A route should free its slot in the database that holds it when it is
+    deleted, but not when that slot was already freed. Reducing nwp
+    removes the waypoints at the end of the route.
+    """
+    traffic_.reset()
+    route = Route('TST0')
+    slot = route.slot
+    assert route.routedb is routedb and routedb.inuse[slot]
+    del route
+    gc.collect()
+    assert not routedb.inuse[slot]
+
+    route = Route('TST1')
+    slot = route.slot
+    routedb.free(slot)
+    nfree = len(routedb.freeslots)
+    del route
+    gc.collect()
+    assert len(routedb.freeslots) == nfree
+
+    # A route of another database frees its slot in that database
+    db = RouteDatabase()
+    route = Route('TST2', db.newslot())
+    route.routedb = db
+    del route
+    gc.collect()
+    assert not db.inuse.any()
+
+    route = Route('TST3')
+    for i, lat in enumerate((52.0, 52.5, 53.0)):
+        route.addwpt_data(False, i, f'WP{i}', lat, 4.0, route.wplatlon, 2000.0, 200.0)
+    route.nwp = 1
+    assert route.wplat == [52.0]
+    try:
+        route.nwp = 2
+        assert False, 'nwp can only be reduced'
+    except ValueError:
+        pass
+    route.nwp = 0
+    assert route.wplat == []
+    traffic_.reset()
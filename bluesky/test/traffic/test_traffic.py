@@ -8,7 +8,10 @@ Author <ahfarrell@sparkl.com> Andrew Farrell
 Tests traffic module
 """
 
-from bluesky.tools.aero import casormach
+import numpy as np
+from bluesky.tools.aero import casormach, ft, kts
+from bluesky.traffic.asas import ConflictDetection, StateBased
+from bluesky.tools.kinematics import kinematics_state, kinematics_reference
 
 
 def test_traffic_create_missingarg_fail(traffic_):
@@ -146,4 +149,557 @@ def test_traffic_reset(traffic_):
     validate_lengths(traffic_, 0)
 
 
+def test_traffic_capacity(traffic_):
+    """
+    Test array storage with capacity doubling.
+
+    Arrays should keep their values when aircraft are created one by one,
+    when arrays are replaced, and when aircraft are deleted. Arrays that
+    were replaced should not be changed by a subsequent create, and are
+    copied into the existing buffer when they have the same size.
+    """
+    traffic_.reset()
+    capacities = set()
+    for i in range(100):
+        traffic_.cre('CAP{}'.format(i), 'B744', 52.0, 4.0 + 0.01 * i, 90, 3000, 150)
+        capacities.add(traffic_.capacity('lat'))
+    assert len(capacities) == 4
+    assert np.allclose(traffic_.lon, 4.0 + 0.01 * np.arange(100))
+    assert len(traffic_.ap.alt) == len(traffic_.cd.inconf) == 100
+
+    capacity = traffic_.capacity('lat')
+    traffic_.lat = traffic_.lat + 1.0
+    lat = traffic_.lat
+    traffic_.alt[:] = 1000.0
+    traffic_.cre('CAP100', 'B744', 52.0, 5.0, 90, 3000, 150)
+    assert len(lat) == 100 and np.all(lat == 53.0)
+    assert traffic_.capacity('lat') == capacity
+    assert np.all(traffic_.lat[:-1] == 53.0) and traffic_.lat[-1] == 52.0
+    assert np.all(traffic_.alt[:-1] == 1000.0)
+
+    traffic_.delete([0, 5])
+    traffic_.cre('CAP101', 'B744', 52.0, 5.0, 90, 3000, 150)
+    assert traffic_.id[:5] == ['CAP1', 'CAP2', 'CAP3', 'CAP4', 'CAP6']
+    assert np.allclose(traffic_.lon[:-2], 4.0 + 0.01 * np.delete(np.arange(100), [0, 5]))
+    assert len(traffic_.ap.alt) == len(traffic_.cd.inconf) == traffic_.ntraf == 100
+    traffic_.reset()
+
+
+def test_traffic_queuedelete(traffic_):
+    """
+    Test deferred deletion.
+
+    Queued aircraft should stay in the traffic arrays until the queue is
+    flushed, after which all of them are deleted at once. Until then they
+    can't be found by callsign, so that a new aircraft can take their
+    callsign, and they are excluded from conflict detection.
+    """
+    traffic_.reset()
+    traffic_.cre(['QD{}'.format(i) for i in range(20)], 'B744',
+                 np.full(20, 52.0), 4.0 + 0.01 * np.arange(20), 90, 3000, 150)
+    traffic_.queuedelete([3, 7])
+    traffic_.queuedelete(np.array([7, 12]))
+    assert traffic_.ntraf == 20
+    assert list(np.flatnonzero(traffic_.deleted)) == [3, 7, 12]
+    assert traffic_.id2idx('QD7') == -1
+    traffic_.queuedelete(19)
+    assert traffic_.id2idx('*') == 18
+    traffic_.cre('QD7', 'B744', 52.0, 5.0, 90, 3000, 150)
+    assert traffic_.id2idx('QD7') == traffic_.id2idx('#') == 20
+
+    # All aircraft fly at the same altitude and speed within 5 nm: only
+    # conflicts of the aircraft that are not queued should remain
+    selected = ConflictDetection.selected()
+    StateBased.select()
+    traffic_.cd.update(traffic_, traffic_)
+    assert len(traffic_.cd.confpairs) > 0
+    assert not any(traffic_.deleted[traffic_.cd.confpairs.idx.ravel()])
+    assert not traffic_.cd.inconf[traffic_.deleted].any()
+    selected.select()
+
+    traffic_.flushdelete()
+    remaining = np.append(np.delete(np.arange(20), [3, 7, 12, 19]), 7)
+    assert traffic_.ntraf == len(traffic_.id) == len(traffic_.ap.alt) == 17
+    assert traffic_.id == ['QD{}'.format(i) for i in remaining]
+    assert all(traffic_.id2idx(acid) == i for i, acid in enumerate(traffic_.id))
+    assert np.allclose(traffic_.lon[:-1], 4.0 + 0.01 * remaining[:-1])
+    assert not traffic_.deleted.any()
+    traffic_.reset()
+
+
+def test_traffic_idindex(traffic_):
+    """
+    Test the callsign index.
+
+    Lookups should stay consistent with the list of callsigns when
+    aircraft are created, deleted, and renamed.
+    """
+    traffic_.reset()
+    traffic_.cre(['ID{}'.format(i) for i in range(10)], 'B744',
+                 np.full(10, 52.0), np.full(10, 4.0), 90, 3000, 150)
+    traffic_.cre('ID10', 'B744', 52.0, 4.0, 90, 3000, 150)
+    ok, _msg = traffic_.cre('id10', 'B744', 52.0, 4.0, 90, 3000, 150)
+    assert not ok
+    traffic_.delete([2, 5])
+    traffic_.queuedelete(0)
+    traffic_.flushdelete()
+    assert traffic_.rename(traffic_.id2idx('ID9'), 'NEW9')
+
+    assert traffic_.id2idx('id3') == 1
+    assert traffic_.id2idx('ID0') == traffic_.id2idx('ID9') == -1
+    idx = traffic_.id2idx(traffic_.id + ['ID5'])
+    assert isinstance(idx, np.ndarray)
+    assert list(idx) == list(range(traffic_.ntraf)) + [-1]
+    assert traffic_.idindex == {acid: i for i, acid in enumerate(traffic_.id)}
+    traffic_.reset()
+    assert not traffic_.idindex
+
+
+def test_traffic_rename(traffic_):
+    """
+    After a rename, the route and conflicts of the aircraft should be
+    found by its new callsign.
+    """
+    from bluesky.traffic.route import Route
+    traffic_.reset()
+    traffic_.cre(['RN0', 'RN1'], 'B744', 52.0, np.array([4.0, 4.02]), 90, 3000, 150)
+    selected = ConflictDetection.selected()
+    StateBased.select()
+    traffic_.cd.update(traffic_, traffic_)
+    ok, _msg = traffic_.rename(1, 'rn0')
+    assert not ok
+    assert traffic_.rename(0, 'xy1')
+    assert traffic_.id2idx('XY1') == 0 and traffic_.id2idx('RN0') == -1
+    assert Route._routes.get('RN0') is None
+    assert Route._routes.get('XY1') is traffic_.ap.route[0]
+    assert traffic_.ap.route[0].acid == 'XY1'
+    assert Route.addwptStack(0, '52.0,5.0')
+    assert traffic_.ap.route[0].nwp == 1
+    assert traffic_.cd.confpairs_unique == {frozenset(('XY1', 'RN1'))}
+    selected.select()
+    traffic_.reset()
+
+
+def test_traffic_crefile(traffic_, tmp_path):
+    """
+    Test bulk creation of aircraft of different types from a CSV file.
+
+    Each aircraft should get the performance parameters of its own type,
+    identical to when it is created separately.
+    """
+    types = ['B744', 'A320', 'B738', 'A320', 'E190']
+    fname = tmp_path / 'bulk.csv'
+    fname.write_text('# acid,type,lat,lon,hdg,alt,spd\n' + ''.join(
+        'BULK{},{},52.0,{},90,{},{}\n'.format(i, actype, 4.0 + 0.1 * i,
+                                            1000 * i, 250 if i % 2 else 0.8)
+        for i, actype in enumerate(types)))
+
+    traffic_.reset()
+    for i, actype in enumerate(types):
+        traffic_.cre('REF{}'.format(i), actype)
+    ok, _msg = traffic_.crefile(str(fname))
+    assert ok
+    assert traffic_.type[5:] == types
+    assert list(traffic_.perf.actype[5:]) == list(traffic_.perf.actype[:5])
+    assert np.array_equal(traffic_.perf.mass[5:], traffic_.perf.mass[:5])
+    assert np.allclose(traffic_.lon[5:], 4.0 + 0.1 * np.arange(5))
+    assert np.allclose(traffic_.alt[5:], 1000 * ft * np.arange(5))
+    assert np.allclose(traffic_.cas[6::2], 250 * kts)
+    assert np.allclose(traffic_.M[5::2], 0.8)
+
+    ok, _msg = traffic_.crefile(str(fname))
+    assert not ok and traffic_.ntraf == 10
+
+    # Speeds are parsed as in the CRE command
+    fname.write_text('MACH1,B744,52.0,4.0,90,30000,M0.78\nSLOW1,B744,52.0,4.0,90,0,0.05\n')
+    ok, _msg = traffic_.crefile(str(fname))
+    assert ok
+    assert np.isclose(traffic_.M[-2], 0.78)
+    assert np.isclose(traffic_.cas[-1], 0.05 * kts)
+
+    # Altitudes are parsed as in the CRE command, also as flight level
+    fname.write_text('LVL1,A320,52.0,4.0,90,FL350,M0.78\nLVL2,A320,52.0,4.0,90,12000,280\n'
+                     'LVL3,A320,52.0,4.0,90,fl100,0.5\n')
+    ok, _msg = traffic_.crefile(str(fname))
+    assert ok
+    assert np.allclose(traffic_.alt[-3:], np.array([35000, 12000, 10000]) * ft)
+    assert np.allclose(traffic_.M[[-3, -1]], [0.78, 0.5])
+    assert np.isclose(traffic_.cas[-2], 280 * kts)
+
+    fname.write_text('BAD1,A320,52.0,4.0,90,FLX,250\n')
+    ok, _msg = traffic_.crefile(str(fname))
+    assert not ok
+    traffic_.reset()
+
+
+def test_autopilot_computevnav(traffic_):
+    """
+    VNAV profiles computed for many aircraft at once should be identical
+    to those computed per aircraft.
+    """
+    rng = np.random.RandomState(5)
+    n = 50
+    traffic_.reset()
+    traffic_.cre(['VNAV{}'.format(i) for i in range(n)], 'B744',
+                 52.0 + rng.rand(n), 4.0 + rng.rand(n), 90.0,
+                 rng.rand(n) * 20000 * ft, 250 * kts)
+    traffic_.vs[:] = (rng.rand(n) - 0.5) * 10.0
+    traffic_.swvnav[:] = rng.rand(n) < 0.9
+    traffic_.ap.swtoc[:] = rng.rand(n) < 0.5
+    traffic_.ap.swtod[:] = rng.rand(n) < 0.5
+    traffic_.actwp.lat[:] = 52.0 + rng.rand(n)
+    traffic_.actwp.lon[:] = 4.0 + rng.rand(n)
+    traffic_.ap.dist2wp[:] = rng.rand(n) * 20000.0
+    toalt = np.where(rng.rand(n) < 0.8, rng.rand(n) * 20000 * ft, -999.0)
+    xtoalt = rng.rand(n) * 100000.0
+    torta = np.full(n, -999.0)
+
+    arrays = [traffic_.ap.dist2vs, traffic_.ap.dist2wp, traffic_.ap.alt,
+              traffic_.ap.vnavvs, traffic_.selalt, traffic_.actwp.vs,
+              traffic_.actwp.nextaltco, traffic_.actwp.xtoalt]
+    initial = [arr.copy() for arr in arrays]
+    for i in range(n):
+        traffic_.ap.ComputeVNAV(i, toalt[i], xtoalt[i], torta[i], 0.0)
+    ref = [arr.copy() for arr in arrays]
+    for arr, value in zip(arrays, initial):
+        arr[:] = value
+    traffic_.ap.ComputeVNAV(np.arange(n), toalt, xtoalt, torta, np.zeros(n))
+    for arr, value in zip(arrays, ref):
+        assert np.array_equal(arr, value)
+    traffic_.reset()
+
+
+def calcvrta_reference(v0, dx, dt, trafax):
+    """
+    Required ground speed to meet an RTA, for scalar arguments.
+    """
+    ax = max(0.01, abs(trafax)) if v0 * dt < dx else -max(0.01, abs(trafax))
+    a = -0.5 / ax
+    b = v0 / ax + dt
+    c = -0.5 * v0 * v0 / ax - dx
+    D = b * b - 4. * a * c
+    vlst = []
+    if D >= 0.:
+        for v1 in ((-b - np.sqrt(D)) / (2. * a), (-b + np.sqrt(D)) / (2. * a)):
+            dtacc = (v1 - v0) / ax
+            if dtacc >= 0 and dt - dtacc >= 0.:
+                vlst.append(v1)
+    if not vlst:
+        return dx / dt
+    if len(vlst) == 2:
+        return vlst[int(abs(vlst[1] - v0) < abs(vlst[0] - v0))]
+    return vlst[0]
+
+
+def test_autopilot_calcvrta():
+    """
+    Required RTA speeds calculated for arrays should be identical to
+    those calculated per aircraft.
+    """
+    from bluesky.traffic.autopilot import calcvrta
+    rng = np.random.RandomState(11)
+    n = 1000
+    v0 = rng.rand(n) * 250.0
+    dx = rng.rand(n) * 200000.0
+    dt = 1.0 + rng.rand(n) * 1000.0
+    ax = (rng.rand(n) - 0.5) * 2.0
+    ref = [calcvrta_reference(*args) for args in zip(v0, dx, dt, ax)]
+    assert np.array_equal(calcvrta(v0, dx, dt, ax), ref)
+    assert calcvrta(v0[0], dx[0], dt[0], ax[0]) == ref[0]
+
+
+def conditional_reference(traffic_, conditions):
+    """
+    Commands of conditions that became true, evaluated per condition.
+    Returns the issued commands, and the remaining conditions.
+    """
+    from bluesky.tools.geo import qdrdist
+    issued, remaining = [], []
+    for acid, condtype, target, lastdif, latlon, cmd in conditions:
+        idx = traffic_.id2idx(acid)
+        if idx < 0:
+            continue
+        if condtype == 2:
+            actual = qdrdist(traffic_.lat[idx], traffic_.lon[idx], *latlon)[1]
+        else:
+            actual = traffic_.cas[idx] if condtype else traffic_.alt[idx]
+        actdif = target - actual
+        if actdif * lastdif <= 0.0:
+            issued.append(cmd)
+        else:
+            remaining.append((acid, condtype, target, actdif, latlon, cmd))
+    return issued, remaining
+
+
+def test_conditional_commands(traffic_, monkeypatch):
+    """
+    Conditional commands evaluated for all conditions at once should be
+    issued in the same order as when evaluated per condition, also when
+    aircraft are deleted.
+    """
+    import bluesky.stack
+    from bluesky.tools.geo import qdrdist
+    rng = np.random.RandomState(5)
+    n = 40
+    traffic_.reset()
+    traffic_.cre(['CD{}'.format(i) for i in range(n)], 'B744', 52.0 + rng.rand(n),
+                 4.0 + rng.rand(n), 90, 3000, 150)
+    cond = traffic_.cond
+    conditions = []
+    for i in range(400):
+        idx = rng.randint(n)
+        cmd = 'ECHO {}'.format(i)
+        condtype = rng.randint(3)
+        if condtype == 0:
+            target = traffic_.alt[idx] + rng.randn() * 100.0
+            cond.ataltcmd(idx, target, cmd)
+            actual = traffic_.alt[idx]
+        elif condtype == 1:
+            target = traffic_.tas[idx] + rng.randn() * 10.0
+            cond.atspdcmd(idx, target, cmd)
+            actual = traffic_.tas[idx]
+        else:
+            latlon = (52.0 + rng.rand(), 4.0 + rng.rand())
+            target = rng.rand() * 40.0
+            cond.atdistcmd(idx, *latlon, target, cmd)
+            actual = qdrdist(traffic_.lat[idx], traffic_.lon[idx], *latlon)[1]
+        conditions.append((traffic_.id[idx], condtype, target, target - actual,
+                           latlon if condtype == 2 else None, cmd))
+
+    issued = []
+    monkeypatch.setattr(bluesky.stack, 'stack', issued.append)
+    for _ in range(10):
+        traffic_.alt += rng.randn(traffic_.ntraf) * 50.0
+        traffic_.cas += rng.randn(traffic_.ntraf) * 5.0
+        traffic_.lat += rng.randn(traffic_.ntraf) * 0.05
+        traffic_.lon += rng.randn(traffic_.ntraf) * 0.05
+        issued.clear()
+        cond.update()
+        refissued, conditions = conditional_reference(traffic_, conditions)
+        assert issued == refissued and len(issued) > 0
+        assert cond.ncond == len(conditions)
+
+        traffic_.delete(rng.choice(traffic_.ntraf, 3, replace=False))
+        assert list(cond.acidx[:cond.ncond]) == \
+            [traffic_.id2idx(c[0]) for c in conditions if c[0] in traffic_.id]
+    traffic_.reset()
+    assert cond.ncond == 0
+
+
+def test_traffic_trails(traffic_):
+    """
+    Trail segments should be kept in order in a ring buffer of limited
+    size, without segments older than the maximum age, and segments that
+    were not sent yet should be available as one slice.
+    """
+    import bluesky as bs
+    rng = np.random.RandomState(8)
+    n = 30
+    traffic_.reset()
+    traffic_.cre(['TR{}'.format(i) for i in range(n)], 'B744', 52.0 + rng.rand(n),
+                 4.0 + rng.rand(n), 90, 3000, 150)
+    trails = traffic_.trails
+    trails.maxseg, trails.maxage = 200, 120.0
+    trails.setTrails(True, 5.0)
+    trails.setTrails(traffic_.id2idx('TR3'), 'RED')
+    simt = bs.sim.simt
+    lasttim = np.full(n, simt)
+    lastpos = np.array([traffic_.lat, traffic_.lon]).T
+    segments = []
+    sent = 0
+    for step in range(100):
+        bs.sim.simt += 1.0 + rng.rand()
+        traffic_.lat += rng.randn(n) * 0.01
+        traffic_.lon += rng.randn(n) * 0.01
+        trails.update()
+        for i in np.flatnonzero(bs.sim.simt - lasttim > 5.0):
+            segments.append((*lastpos[i], traffic_.lat[i], traffic_.lon[i], bs.sim.simt, i))
+            lastpos[i] = traffic_.lat[i], traffic_.lon[i]
+            lasttim[i] = bs.sim.simt
+        ref = [seg for seg in segments[-200:] if seg[4] >= bs.sim.simt - 120.0]
+        new = [seg for seg in segments[sent:] if seg in ref]
+
+        assert trails.nseg == len(ref) and trails.nnew == len(new)
+        assert list(zip(trails.newlat0, trails.newlon0, trails.newlat1, trails.newlon1)) == \
+            [seg[:4] for seg in new]
+        if step % 3 == 0:
+            trails.clearnew()
+            sent = len(segments)
+        if step % 7 == 0:
+            trails.buffer()
+            assert list(trails.bglat0) == [seg[0] for seg in ref]
+            assert np.array_equal(trails.bgcol, np.reshape(
+                [trails.colorList['RED' if seg[5] == 3 else 'CYAN'] for seg in ref], (-1, 3)))
+            assert len(trails.lat0) == 0
+    assert len(trails.seglat0) == 200
+    bs.sim.simt = simt
+    traffic_.reset()
+    trails.maxseg = bs.settings.trails_maxseg
+    trails.maxage = bs.settings.trails_maxage
+
+
+def test_traffic_kinematics(traffic_):
+    """
+    The kinematics update with in-place operations should give results
+    that are bit-for-bit identical to those with temporary arrays, with
+    and without wind.
+    """
+    import bluesky as bs
+    from bluesky.tools.aero import ft
+    rng = np.random.RandomState(21)
+    n = 500
+    traffic_.reset()
+    traffic_.cre(['KN{}'.format(i) for i in range(n)], 'B744', 52.0 + rng.rand(n),
+                 4.0 + rng.rand(n), rng.rand(n) * 360.0,
+                 rng.choice([0.0, 30.0 * ft, 3000.0, 10000.0], n), 150.0)
+    fields = ('tas', 'cas', 'M', 'ax', 'az', 'hdg', 'swhdgsel', 'swaltsel', 'vs',
+              'gsnorth', 'gseast', 'gs', 'trk', 'windnorth', 'windeast', 'work',
+              'alt', 'lat', 'lon', 'coslat', 'distflown')
+    for wind in (False, True):
+        if wind:
+            traffic_.wind.addpoint(52.5, 4.5, 270.0, 20.0)
+            traffic_.wind.addpoint(52.0, 4.0, 200.0, 10.0)
+        for _ in range(5):
+            traffic_.aporasas.tas[:] = 100.0 + rng.rand(n) * 150.0
+            traffic_.aporasas.hdg[:] = rng.rand(n) * 360.0
+            traffic_.aporasas.alt[:] = traffic_.alt + rng.choice([0.0, 1.0, 500.0, -500.0], n)
+            traffic_.aporasas.vs[:] = rng.randn(n) * 10.0
+            traffic_.ap.turnphi[:] = rng.choice([0.0, 0.3], n)
+            ref = kinematics_state(traffic_)
+            kinematics_reference(ref, bs.sim.simdt)
+            traffic_.update_airspeed()
+            traffic_.update_groundspeed()
+            traffic_.update_pos()
+            for name in fields:
+                assert np.array_equal(getattr(traffic_, name), getattr(ref, name)), name
+    traffic_.wind.clear()
+    traffic_.reset()
+
+
+def test_traffic_derivedstate(traffic_):
+    """
+    Test that the cached atmosphere and trig of the traffic state are equal
+    to direct computation, and are recomputed after an in place update.
+    """
+    from bluesky.tools import aero
+    rng = np.random.RandomState(22)
+    n = 200
+    traffic_.reset()
+    traffic_.cre(['DS{}'.format(i) for i in range(n)], 'B744', 52.0 + rng.rand(n),
+                 4.0 + rng.rand(n), rng.rand(n) * 360.0, rng.rand(n) * 15000.0, 150.0)
+    derived = traffic_.derived
+    for _ in range(2):
+        atmos = derived.atmos(traffic_.alt)
+        assert derived.atmos(traffic_.alt) is atmos
+        for cached, ref in zip(atmos, aero.vatmos(traffic_.alt)):
+            assert np.array_equal(cached, ref)
+        sinhdg, coshdg = derived.sincos(traffic_.hdg)
+        assert np.array_equal(sinhdg, np.sin(np.radians(traffic_.hdg)))
+        assert np.array_equal(coshdg, np.cos(np.radians(traffic_.hdg)))
+
+        # Conversions with a precomputed atmosphere
+        spd = np.where(rng.rand(n) > 0.5, 0.8, 150.0)
+        for fun in (aero.vtas2mach, aero.vmach2tas, aero.veas2tas, aero.vtas2eas,
+                    aero.vcas2tas, aero.vtas2cas, aero.vmach2cas, aero.vcas2mach,
+                    aero.vcasormach2tas, aero.vvsound):
+            args = (traffic_.alt,) if fun is aero.vvsound else (spd, traffic_.alt)
+            assert np.array_equal(fun(*args, atmos), fun(*args)), fun.__name__
+        assert np.array_equal(aero.vcasormach(spd, traffic_.alt, atmos),
+                              aero.vcasormach(spd, traffic_.alt))
+
+        # Change the state in place: cached values are recomputed
+        traffic_.alt += 100.0
+        traffic_.hdg[:10] += 1.0
+        assert derived.atmos(traffic_.alt) is not atmos
+        assert derived.sincos(traffic_.hdg)[0] is not sinhdg
+    traffic_.reset()
+
+
+def test_aero_atmostable():
+    """
+    Test the table-driven atmosphere against the analytic atmosphere,
+    within the documented error bounds, also outside the table range.
+    """
+    from bluesky.tools import aero
+    rng = np.random.RandomState(23)
+    h = np.concatenate((rng.rand(10000) * 23000.0 - 1000.0,
+                        [-1000.0, 0.0, 11000.0, 22000.0, -2000.0, 30000.0, np.nan]))
+    ref = aero.vatmos(h)
+    cas = aero.vcas2tas(150.0, h)
+    try:
+        assert aero.atmoslut(True)[0]
+        assert aero.atmostable is not None and aero.atmostable.step == 1.0
+        p, rho, T = aero.vatmos(h)
+        assert np.allclose(p, ref[0], rtol=3.2e-9, atol=0.0, equal_nan=True)
+        assert np.allclose(rho, ref[1], rtol=3.2e-9, atol=0.0, equal_nan=True)
+        assert np.allclose(T, ref[2], rtol=1e-15, atol=0.0, equal_nan=True)
+        assert np.allclose(aero.vcas2tas(150.0, h), cas, rtol=3.2e-9, atol=0.0, equal_nan=True)
+        # Outside the table the atmosphere is computed analytically
+        for value, refvalue in zip(aero.vatmos(h[-3:-1]), ref):
+            assert np.array_equal(value, refvalue[-3:-1])
+        # Scalar altitudes give scalar results
+        assert all(np.ndim(value) == 0 for value in aero.vatmos(5000.0))
+        # Error scales with the square of the step
+        aero.atmoslut(True, 10.0)
+        assert np.allclose(aero.vatmos(h)[1], ref[1], rtol=3.2e-7, atol=0.0, equal_nan=True)
+    finally:
+        aero.atmoslut(False)
+    assert aero.atmostable is None
+    assert np.array_equal(aero.vatmos(h)[0], ref[0], equal_nan=True)
+
+
+def test_windfield_interpolation():
+    """
+    Test wind interpolation with the nearest definition points, and on a
+    regular grid given in arbitrary order.
+    """
+    from bluesky import settings
+    from bluesky.traffic.windfield import Windfield
+    rng = np.random.RandomState(24)
+    npos = 300
+    lat, lon = 50.0 + 5.0 * rng.rand(npos), 3.0 + 5.0 * rng.rand(npos)
+    alt = 12000.0 * rng.rand(npos)
+
+    # Scattered points: inverse distance squared weights of the k nearest points
+    nvec = 100
+    wind = Windfield()
+    for i in range(nvec):
+        wind.addpoint(48.0 + 9.0 * rng.rand(), 1.0 + 9.0 * rng.rand(), [360.0 * rng.rand(), 270.0],
+                      [30.0 * rng.rand(), 20.0], [0.0, 10000.0])
+    vnorth, veast = wind.getdata(lat, lon, alt)
+    rlat, rlon = np.radians(lat).reshape(-1, 1), np.radians(lon).reshape(-1, 1)
+    vlat, vlon = np.radians(wind.lat), np.radians(wind.lon)
+    chord = (np.sin(rlat) - np.sin(vlat))**2 + (np.cos(rlat) * np.cos(rlon) - np.cos(vlat) * np.cos(vlon))**2 + \
+        (np.cos(rlat) * np.sin(rlon) - np.cos(vlat) * np.sin(vlon))**2
+    nearest = np.argsort(chord, axis=1)[:, :settings.wind_knn]
+    dy = lat.reshape(-1, 1) - wind.lat[nearest]
+    dx = np.cos(np.radians(0.5 * (lat.reshape(-1, 1) + wind.lat[nearest]))) * (lon.reshape(-1, 1) - wind.lon[nearest])
+    weights = 1.0 / (1e-20 + dx * dx + dy * dy)
+    weights /= weights.sum(axis=1, keepdims=True)
+    ialt = (alt / wind.altstep).astype(int).reshape(-1, 1)
+    falt = alt / wind.altstep - ialt.ravel()
+    for value, table in ((vnorth, wind.vnorth), (veast, wind.veast)):
+        ref = (1.0 - falt) * (table[ialt, nearest] * weights).sum(axis=1) + \
+            falt * (table[ialt + 1, nearest] * weights).sum(axis=1)
+        assert np.allclose(value, ref, rtol=0.0, atol=1e-10)
+
+    # Regular grid in arbitrary order: linear field is interpolated exactly
+    glat, glon = np.meshgrid(np.arange(49.0, 57.0), np.arange(2.0, 10.0), indexing='ij')
+    order = rng.permutation(glat.size)
+    glat, glon = glat.ravel()[order], glon.ravel()[order]
+    windalt = np.array([1000.0, 5000.0, 9000.0, 13000.0])
+    wind = Windfield()
+    wind.addpointvne(glat, glon, np.add.outer(0.001 * windalt, glat), np.add.outer(0.002 * windalt, -glon), windalt)
+    assert wind.fgrid is not None
+    vnorth, veast = wind.getdata(lat, lon, np.maximum(alt, 1000.0))
+    assert np.allclose(vnorth, 0.001 * np.maximum(alt, 1000.0) + lat)
+    assert np.allclose(veast, 0.002 * np.maximum(alt, 1000.0) - lon)
+
+    # Adding a point converts the grid to definition points
+    wind.addpoint(60.0, 5.0, 90.0, 10.0)
+    assert wind.fgrid is None and wind.vnorth.shape == (wind.nalt, glat.size + 1)
+    vnorth, veast = wind.getdata(glat[:5], glon[:5], 5000.0 * np.ones(5))
+    assert np.allclose(vnorth, 5.0 + glat[:5]) and np.allclose(veast, 10.0 - glon[:5])
+
+
 # test remaining traffic functions
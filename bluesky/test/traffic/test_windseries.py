@@ -0,0 +1,97 @@
+"""
+Tests the WINDSERIES plugin for time-varying wind from local files.
+"""
+import datetime
+import importlib.util
+import os
+import threading
+import numpy as np
+from scipy.io import netcdf_file
+import bluesky as bs
+from bluesky.traffic.windsim import WindSim
+
+
+def load_plugin():
+    """
+    Import the windseries plugin module from the plugins folder.
+    """
+    fname = os.path.join(os.path.dirname(__file__), '..', '..', '..',
+                         'plugins', 'windseries.py')
+    spec = importlib.util.spec_from_file_location('windseries', fname)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def write_series(fname, hours, veast):
+    """
+    Write a classic netCDF file with a uniform eastward wind per time slice.
+    """
+    levels = np.array([1000.0, 500.0, 200.0])
+    lats = np.array([53.0, 52.0, 51.0, 50.0])
+    lons = np.array([3.0, 4.0, 5.0, 6.0])
+    with netcdf_file(fname, 'w') as f:
+        for name, values in (('time', hours), ('level', levels),
+                             ('latitude', lats), ('longitude', lons)):
+            f.createDimension(name, len(values))
+            var = f.createVariable(name, 'f8', (name,))
+            var[:] = values
+        f.variables['time'].units = 'hours since 2020-01-01 00:00:00'
+        shape = (len(hours), len(levels), len(lats), len(lons))
+        u = f.createVariable('u', 'f4', ('time', 'level', 'latitude', 'longitude'))
+        u[:] = np.broadcast_to(np.reshape(veast, (-1, 1, 1, 1)), shape)
+        v = f.createVariable('v', 'f4', ('time', 'level', 'latitude', 'longitude'))
+        v[:] = np.zeros(shape)
+
+
+def test_windseries(traffic_, tmp_path):
+    """
+    The wind should be interpolated in time between the two slices around
+    the simulation time, and move to the next slice pair, which is read
+    in advance, when the simulation time passes the next slice. All files
+    are read on the reader thread.
+    """
+    windseries = load_plugin()
+    write_series(str(tmp_path / 'wind0.nc'), [0.0, 1.0], [10.0, 20.0])
+    write_series(str(tmp_path / 'wind1.nc'), [2.0], [40.0])
+
+    windseries.WindSeries.select()
+    wind = windseries.WindSeries.implinstance()
+    utc = bs.sim.utc
+
+    # Record the threads on which the slices are read
+    threads = set()
+    scannetcdf = wind.scannetcdf
+    def scan(fname):
+        threads.add(threading.current_thread())
+        def record(load):
+            def recordload():
+                threads.add(threading.current_thread())
+                return load()
+            return recordload
+        return [(t, record(load)) for t, load in scannetcdf(fname)]
+    wind.scannetcdf = scan
+
+    try:
+        bs.sim.utc = datetime.datetime(2020, 1, 1, 0, 30)
+        ok, _msg = wind.loadseries(str(tmp_path), 50.0, 3.0, 53.0, 6.0)
+        assert ok
+        assert wind.times == [0.0, 3600.0, 7200.0]
+
+        # Halfway between the first two slices
+        vnorth, veast = wind.getdata(51.5, 4.5, 3000.0)
+        assert np.isclose(veast, 15.0) and np.isclose(vnorth, 0.0)
+        assert sorted(wind.slices) == [0, 1] and 2 in wind.pending
+        wind.pending[2].result()
+
+        # Passing the second slice swaps in the slice that was read in advance
+        bs.sim.utc = datetime.datetime(2020, 1, 1, 1, 45)
+        vnorth, veast = wind.getdata(np.array([51.5, 52.5]), np.array([4.5, 5.5]),
+                                     np.array([3000.0, 9000.0]))
+        assert np.allclose(veast, 35.0) and np.allclose(vnorth, 0.0)
+        assert sorted(wind.slices) == [1, 2] and not wind.pending
+        assert threads and threading.main_thread() not in threads
+    finally:
+        wind.clear()
+        bs.sim.utc = utc
+        WindSim.select()
@@ -6,7 +6,7 @@ import numpy as np
 from bluesky import settings
 
 
-settings.set_variable_defaults(casmach_threshold=2.0)
+settings.set_variable_defaults(casmach_threshold=2.0, atmos_lut=False, atmos_lut_step=1.0)
 # International standard atmpshere only up to 72000 ft / 22 km
 
 #
@@ -52,6 +52,25 @@ def casmachthr(threshold:float=None):
     return True, f'CASMACHTHR: Set CAS/Mach threshold to {threshold}'
 
 
+def atmoslut(flag:bool=None, step:float=None):
+    """ ATMOSLUT [ON/OFF], [step]
+
+        Switch the table-driven atmosphere of the vectorised aero functions
+        on or off, with the given altitude step [m] (default 1 m).
+        See AtmosTable.
+    """
+    if flag is None:
+        if atmostable is None:
+            return True, 'ATMOSLUT: The atmosphere is computed analytically'
+        return True, f'ATMOSLUT: The atmosphere is looked up in a table with {atmostable.step} m steps'
+
+    # Clear the current table first: the new table is computed analytically
+    globals()['atmostable'] = None
+    if flag:
+        globals()['atmostable'] = AtmosTable(step or settings.atmos_lut_step)
+    return True, f'ATMOSLUT: Table-driven atmosphere switched {"on" if flag else "off"}'
+
+
 #
 # Functions for aeronautics in this module
 #  - physical quantities always in SI units
@@ -60,11 +79,16 @@ def casmachthr(threshold:float=None):
 #  International Standard Atmosphere up to 22 km
 #
 #   p,rho,T = vatmos(h)    # atmos as function of geopotential altitude h [m]
+#                          # (the speed conversions below accept its result as
+#                          #  optional argument atmos, to avoid recomputing it)
 #   a = vvsound(h)         # speed of sound [m/s] as function of h[m]
 #   p = vpressure(h)       # calls atmos but retruns only pressure [Pa]
 #   T = vtemperature(h)    # calculates temperature [K] (saves time rel to atmos)
 #   rho = vdensity(h)      # calls atmos but retruns only pressure [Pa]
 #
+#  With setting atmos_lut (or command ATMOSLUT) the vectorised atmosphere is
+#  looked up in a table with linear interpolation, see AtmosTable.
+#
 #  Speed conversion at altitude h[m] in ISA:
 #
 # M   = vtas2mach(tas,h)  # true airspeed (tas) to mach number conversion
@@ -93,6 +117,15 @@ def vatmos(h):
         - rho: Density [kg / m3]
         - T: Temperature [K]
     """
+    if atmostable is not None:
+        return atmostable.atmos(h)
+    return isa_vatmos(h)
+
+
+def isa_vatmos(h):
+    """ Analytic ISA pressure, density, and temperature for a given altitude.
+        See vatmos.
+    """
     # Temp
     T = vtemp(h)
 
@@ -147,92 +180,98 @@ def vdensity(h):
     return r
 
 
-def vvsound(h):
+def vvsound(h, atmos=None):
     """ Calculate the speed of sound for a given altitude.
 
         Arguments:
         - h: Altitude [m]
+        - atmos: Optional (p, rho, T) at altitude h, as returned by vatmos
 
         Returns:
         - a: Speed of sound [m/s]
     """
-    T = vtemp(h)
+    T = vtemp(h) if atmos is None else atmos[2]
     a = np.sqrt(gamma * R * T)
     return a
 
 
 # ---------Speed conversions---h in [m]------------------
-def vtas2mach(tas, h):
+def vtas2mach(tas, h, atmos=None):
     """ True airspeed (tas) to mach number conversion for numpy arrays.
 
         Arguments:
         - tas: True airspeed [m/s]
         - h: Altitude [m]
+        - atmos: Optional (p, rho, T) at altitude h, as returned by vatmos
 
         Returns:
         - M: Mach number [-]
     """
-    a = vvsound(h)
+    a = vvsound(h, atmos)
     mach = tas / a
     return mach
 
 
-def vmach2tas(mach, h):
+def vmach2tas(mach, h, atmos=None):
     """ True airspeed (tas) to mach number conversion for numpy arrays.
 
         Arguments:
         - mach: Mach number [-]
         - h: Altitude [m]
+        - atmos: Optional (p, rho, T) at altitude h, as returned by vatmos
 
         Returns:
         - tas: True airspeed [m/s]
     """
-    a = vvsound(h)
+    a = vvsound(h, atmos)
     tas = mach * a
     return tas
 
 
-def veas2tas(eas, h):
+def veas2tas(eas, h, atmos=None):
     """ Equivalent airspeed to true airspeed conversion for numpy arrays.
 
         Arguments:
         - eas: Equivalent airspeed [m/s]
         - h: Altitude [m]
+        - atmos: Optional (p, rho, T) at altitude h, as returned by vatmos
 
         Returns:
         - tas: True airspeed [m/s]
     """
-    rho = vdensity(h)
+    rho = vdensity(h) if atmos is None else atmos[1]
     tas = eas * np.sqrt(rho0 / rho)
     return tas
 
 
-def vtas2eas(tas, h):
+def vtas2eas(tas, h, atmos=None):
     """ True airspeed to equivent airspeed conversion for numpy arrays.
 
         Arguments:
         - tas: True airspeed [m/s]
         - h: Altitude [m]
+        - atmos: Optional (p, rho, T) at altitude h, as returned by vatmos
 
         Returns:
         - eas: Equivalent airspeed [m/s]
     """
-    rho = vdensity(h)
+    rho = vdensity(h) if atmos is None else atmos[1]
     eas = tas * np.sqrt(rho / rho0)
     return eas
 
 
-def vcas2tas(cas, h):
+def vcas2tas(cas, h, atmos=None):
     """ Calibrated to true airspeed conversion for numpy arrays.
 
         Arguments:
         - cas: Calibrated airspeed [m/s]
         - h: Altitude [m]
+        - atmos: Optional (p, rho, T) at altitude h, as returned by vatmos
 
         Returns:
         - tas: True airspeed [m/s]
     """
-    p, rho, _ = vatmos(h)
+    p, rho, _ = vatmos(h) if atmos is None else atmos
     qdyn = p0 * ((1.0 + rho0 * cas * cas / (7.0 * p0)) ** 3.5 - 1.0)
     tas = np.sqrt(7.0 * p / rho * ((1.0 + qdyn / p) ** (2.0 / 7.0) - 1.0))
 
@@ -241,17 +280,18 @@ def vcas2tas(cas, h):
     return tas
 
 
-def vtas2cas(tas, h):
+def vtas2cas(tas, h, atmos=None):
     """ True to calibrated airspeed conversion for numpy arrays.
 
         Arguments:
         - tas: True airspeed [m/s]
         - h: Altitude [m]
+        - atmos: Optional (p, rho, T) at altitude h, as returned by vatmos
 
         Returns:
         cas: Calibrated airspeed [m/s]
     """
-    p, rho, _ = vatmos(h)
+    p, rho, _ = vatmos(h) if atmos is None else atmos
     qdyn = p*((1.+rho*tas*tas/(7.*p))**3.5-1.)
     cas = np.sqrt(7.*p0/rho0*((qdyn/p0+1.)**(2./7.)-1.))
 
@@ -260,42 +300,45 @@ def vtas2cas(tas, h):
     return cas
 
 
-def vmach2cas(mach, h):
+def vmach2cas(mach, h, atmos=None):
     """ Mach to calibrated airspeed conversion for numpy arrays.
 
         Arguments:
         - mach: Mach number [-]
         - h: Altitude [m]
+        - atmos: Optional (p, rho, T) at altitude h, as returned by vatmos
 
         Returns:
         - cas: Calibrated airspeed [m/s]
     """
-    tas = vmach2tas(mach, h)
-    cas = vtas2cas(tas, h)
+    tas = vmach2tas(mach, h, atmos)
+    cas = vtas2cas(tas, h, atmos)
     return cas
 
 
-def vcas2mach(cas, h):
+def vcas2mach(cas, h, atmos=None):
     """ Calibrated airspeed to Mach conversion for numpy arrays.
 
         Arguments:
         - cas: Calibrated airspeed [m/s]
         - h: Altitude [m]
+        - atmos: Optional (p, rho, T) at altitude h, as returned by vatmos
 
         Returns:
         - mach: Mach number [-]
     """
-    tas = vcas2tas(cas, h)
-    M   = vtas2mach(tas, h)
+    tas = vcas2tas(cas, h, atmos)
+    M   = vtas2mach(tas, h, atmos)
     return M
 
-def vcasormach(spd, h):
+def vcasormach(spd, h, atmos=None):
     """ Interpret input speed as either CAS or a Mach number, and return TAS, CAS, and Mach.
 
         Arguments:
         - spd: Airspeed. Interpreted as Mach number [-] when its value is below the
                CAS/Mach threshold. Otherwise interpreted as CAS [m/s].
         - h: Altitude [m]
+        - atmos: Optional (p, rho, T) at altitude h, as returned by vatmos
 
         Returns:
         - tas: True airspeed [m/s]
@@ -303,25 +346,26 @@ def vcasormach(spd, h):
         - mach: Mach number [-]
     """
     ismach = np.logical_and(spd > 0.1, spd < casmach_thr)
-    tas = np.where(ismach, vmach2tas(spd, h), vcas2tas(spd, h))
-    cas = np.where(ismach, vtas2cas(tas, h), spd)
-    mach   = np.where(ismach, spd, vtas2mach(tas, h))
+    tas = np.where(ismach, vmach2tas(spd, h, atmos), vcas2tas(spd, h, atmos))
+    cas = np.where(ismach, vtas2cas(tas, h, atmos), spd)
+    mach   = np.where(ismach, spd, vtas2mach(tas, h, atmos))
     return tas, cas, mach
 
 
-def vcasormach2tas(spd, h):
+def vcasormach2tas(spd, h, atmos=None):
     """ Interpret input speed as either CAS or a Mach number, and return TAS.
 
         Arguments:
         - spd: Airspeed. Interpreted as Mach number [-] when its value is below the
                CAS/Mach threshold. Otherwise interpreted as CAS [m/s].
         - h: Altitude [m]
+        - atmos: Optional (p, rho, T) at altitude h, as returned by vatmos
 
         Returns:
         - tas: True airspeed [m/s]
     """
     ismach = np.logical_and(spd > 0.1, spd < casmach_thr)
-    return np.where(ismach, vmach2tas(spd, h), vcas2tas(spd, h))
+    return np.where(ismach, vmach2tas(spd, h, atmos), vcas2tas(spd, h, atmos))
 
 
 def crossoveralt(cas, mach):
@@ -348,6 +392,72 @@ def crossoveralt(cas, mach):
     theta = delta ** (-beta * R / g0)
     return 1000.0 / 6.5 * T0 * (1.0 - theta)
 
+
+# ------------------------------------------------------------------------------
+# Table-driven atmosphere
+# ------------------------------------------------------------------------------
+class AtmosTable:
+    """ Lookup table of the vectorised ISA atmosphere, with linear
+        interpolation in altitude.
+
+        When enabled, vatmos (and with it all vectorised speed conversions)
+        looks up pressure, density and temperature in this table, instead of
+        evaluating the analytic expressions. Altitudes outside the table
+        range (and NaN) are computed analytically. Temperature and speed of
+        sound alone (vtemp, vvsound) are cheaper to compute than to look up,
+        so these are always computed analytically.
+
+        Interpolation error relative to the analytic functions, for a step
+        of 1 m (the error scales with the square of the step):
+        - temperature: exact up to rounding, because temperature is linear
+          between table nodes (the tropopause at 11 km is a table node when
+          the step divides 12000 m)
+        - pressure and density: below 3.2e-9, i.e., step**2 / 8 / H**2 with
+          the stratospheric scale height H = 6342 m
+
+        Arguments:
+        - step: Altitude step [m]
+        - hmin, hmax: Altitude range [m] of the table
+    """
+    def __init__(self, step=1.0, hmin=-1000.0, hmax=22000.0):
+        self.step = step
+        self.hmin = hmin
+        self.n = int(round((hmax - hmin) / step)) + 1
+        p, rho, T = isa_vatmos(hmin + step * np.arange(self.n))
+        # Values at the nodes, and slopes per step from each node to the
+        # next (zero for the last node, so that it needs no special case)
+        self.tables = [(values, np.append(np.diff(values), 0.0)) for values in (p, rho, T)]
+
+    def atmos(self, h):
+        """ Pressure [Pa], density [kg/m3] and temperature [K] at altitude h [m]. """
+        shape = np.shape(h)
+        h = np.atleast_1d(np.asarray(h, dtype=float))
+        x = (h - self.hmin) * (1.0 / self.step)  # Fractional table index
+        outside = ~((x >= 0.0) & (x <= self.n - 1))
+        anyoutside = outside.any()
+        if anyoutside:
+            x[outside] = 0.0
+        i = x.astype(np.intp)
+        x -= i
+
+        values = []
+        for nodes, slopes in self.tables:
+            value = slopes[i]
+            value *= x
+            value += nodes[i]
+            values.append(value)
+
+        if anyoutside:
+            for value, isavalue in zip(values, isa_vatmos(h[outside])):
+                value[outside] = isavalue
+        return tuple(values) if shape else tuple(value[0] for value in values)
+
+
+# Module-wide atmosphere table, None when the atmosphere is computed analytically
+atmostable = None
+if settings.atmos_lut:
+    atmoslut(True)
+
 # ------------------------------------------------------------------------------
 # Scalar aero functions
 # ------------------------------------------------------------------------------
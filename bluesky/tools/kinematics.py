@@ -0,0 +1,73 @@
+""" Reference kinematics update of the traffic (airspeed, groundspeed and
+    position), computed with temporary arrays as it was before the traffic
+    kinematics were updated in place. It is used to check and benchmark the
+    in-place update of the Traffic object. """
+from types import SimpleNamespace
+import numpy as np
+from bluesky.tools.aero import g0, fpm, ft, Rearth, vtas2cas, vtas2mach
+
+
+def kinematics_state(traf):
+    """
+    Copy of the traffic state that is used by the kinematics update.
+    """
+    names = ('tas', 'cas', 'M', 'ax', 'az', 'hdg', 'swhdgsel', 'swaltsel',
+             'vs', 'gsnorth', 'gseast', 'gs', 'trk', 'windnorth', 'windeast',
+             'work', 'alt', 'lat', 'lon', 'coslat', 'distflown', 'eps')
+    return SimpleNamespace(
+        aporasas=SimpleNamespace(tas=traf.aporasas.tas.copy(), hdg=traf.aporasas.hdg.copy(),
+                                 alt=traf.aporasas.alt.copy(), vs=traf.aporasas.vs.copy()),
+        ap=SimpleNamespace(turnphi=traf.ap.turnphi.copy(), bankdef=traf.ap.bankdef.copy()),
+        perf=SimpleNamespace(axmax=traf.perf.axmax.copy(), thrust=traf.perf.thrust.copy()),
+        wind=traf.wind, **{name: getattr(traf, name).copy() for name in names})
+
+
+def kinematics_reference(t, simdt):
+    """
+    Kinematics update (airspeed, groundspeed and position) of all aircraft
+    in state t, as computed with temporary arrays before the traffic
+    kinematics were updated in place.
+    """
+    delta_spd = t.aporasas.tas - t.tas
+    need_ax = np.abs(delta_spd) > np.abs(simdt * t.perf.axmax)
+    t.ax = need_ax * np.sign(delta_spd) * t.perf.axmax
+    t.tas = np.where(need_ax, t.tas + t.ax * simdt, t.aporasas.tas)
+    t.cas = vtas2cas(t.tas, t.alt)
+    t.M = vtas2mach(t.tas, t.alt)
+    turnrate = np.degrees(g0 * np.tan(np.where(t.ap.turnphi > t.eps, t.ap.turnphi, t.ap.bankdef)
+                                      / np.maximum(t.tas, t.eps)))
+    delhdg = (t.aporasas.hdg - t.hdg + 180) % 360 - 180
+    t.swhdgsel = np.abs(delhdg) > np.abs(simdt * turnrate)
+    t.hdg = np.where(t.swhdgsel, t.hdg + simdt * turnrate * np.sign(delhdg), t.aporasas.hdg) % 360.0
+    delta_alt = t.aporasas.alt - t.alt
+    t.swaltsel = np.abs(delta_alt) > 1.05 * np.maximum(np.abs(simdt * t.aporasas.vs),
+                                                       np.abs(simdt * t.vs))
+    target_vs = t.swaltsel * np.sign(delta_alt) * np.abs(t.aporasas.vs)
+    delta_vs = target_vs - t.vs
+    need_az = np.abs(delta_vs) > 300 * fpm
+    t.az = need_az * np.sign(delta_vs) * (300 * fpm)
+    t.vs = np.where(need_az, t.vs + t.az * simdt, target_vs)
+    t.vs = np.where(np.isfinite(t.vs), t.vs, 0)
+
+    if t.wind.winddim == 0:
+        t.gsnorth = t.tas * np.cos(np.radians(t.hdg))
+        t.gseast = t.tas * np.sin(np.radians(t.hdg))
+        t.gs = t.tas
+        t.trk = t.hdg
+        t.windnorth[:], t.windeast[:] = 0.0, 0.0
+    else:
+        applywind = t.alt > 50. * ft
+        t.windnorth[:], t.windeast[:] = t.wind.getdata(t.lat, t.lon, t.alt)
+        t.gsnorth = t.tas * np.cos(np.radians(t.hdg)) + t.windnorth * applywind
+        t.gseast = t.tas * np.sin(np.radians(t.hdg)) + t.windeast * applywind
+        t.gs = np.logical_not(applywind) * t.tas + \
+            applywind * np.sqrt(t.gsnorth**2 + t.gseast**2)
+        t.trk = np.logical_not(applywind) * t.hdg + \
+            applywind * np.degrees(np.arctan2(t.gseast, t.gsnorth)) % 360.
+    t.work += (t.perf.thrust * simdt * np.sqrt(t.gs * t.gs + t.vs * t.vs))
+
+    t.alt = np.where(t.swaltsel, np.round(t.alt + t.vs * simdt, 6), t.aporasas.alt)
+    t.lat = t.lat + np.degrees(simdt * t.gsnorth / Rearth)
+    t.coslat = np.cos(np.deg2rad(t.lat))
+    t.lon = t.lon + np.degrees(simdt * t.gseast / t.coslat / Rearth)
+    t.distflown += t.gs * simdt
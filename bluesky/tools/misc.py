@@ -3,6 +3,7 @@ Miscellaneous modules
 
 Modules:
      txt2alt(txt): read altitude[ft] from txt (FL ot ft)
+     txt2alt_array(col): txt2alt for an array of texts or numbers
      txt2tas(spd,h): read CAS or Mach and convert to TAS for given altitude
      tim2txt(t)  : convert time[s] to HH:MM:SS.hh
      i2txt(i,n)  : convert integer to string of n chars with leading zeros
@@ -28,6 +29,21 @@ def txt2alt(txt):
     raise ValueError(f'Could not parse "{txt}" as altitude"')
 
 
+def txt2alt_array(col):
+    """ Convert an array of texts or numbers to altitudes in meter, with the
+        same rules as txt2alt. Numbers are converted at once, only flight
+        levels are parsed per element. """
+    col = np.asarray(col)
+    if col.dtype.kind in 'biuf':
+        return col.astype(float) * ft
+    col = np.char.upper(np.char.strip(col.astype(str)))
+    isfl = np.char.startswith(col, 'FL')
+    alt = np.empty(col.shape)
+    alt[~isfl] = col[~isfl].astype(float) * ft
+    alt[isfl] = [txt2alt(txt) for txt in col[isfl]]
+    return alt
+
+
 def tim2txt(t):
     """Convert time to timestring: HH:MM:SS.hh"""
     return strftime("%H:%M:%S.", gmtime(t)) + i2txt(int((t - int(t)) * 100.), 2)
@@ -120,6 +136,26 @@ def txt2spd(txt):
         raise ValueError(f'Could not parse {txt} as speed.')
 
 
+def txt2spd_array(col):
+    """ Convert an array of texts or numbers to speeds, with the same rules
+        as txt2spd. Numbers are converted at once, only texts with a Mach
+        prefix are parsed per element.
+
+        Returns:
+        - Array of speeds in meters per second or Mach.
+    """
+    col = np.asarray(col)
+    if col.dtype.kind not in 'biuf':
+        col = np.char.upper(np.char.strip(col.astype(str)))
+        ismach = np.char.find(col, 'M') >= 0
+        spd = np.empty(col.shape)
+        spd[ismach] = [txt2spd(txt) for txt in col[ismach]]
+        spd[~ismach] = txt2spd_array(col[~ismach].astype(float))
+        return spd
+    spd = col.astype(float)
+    return np.where((0.1 < spd) & (spd < 1.0), spd, spd * kts)
+
+
 def txt2tas(txt, h):
     """Convert text to speed (EAS [kts]/MACH[-] to TAS[m/s])"""
     if len(txt) == 0:
@@ -79,7 +79,7 @@ class ActiveWaypoint(Entity, replaceable=True):
         flybyturndist,turnrad = self.calcturn(turntas,bs.traf.ap.bankdef,qdr,next_qdr,turnradnm)
 
         # Turb dist iz ero for flyover, calculated distance for others
-        self.turndist = np.logical_or(flyby,flyturn)*flybyturndist
+        self.turndist[:] = np.logical_or(flyby,flyturn)*flybyturndist
 
         # Avoid circling by checking for flying away on almost straight legs with small turndist
         # difference between direction to and track larger than 90
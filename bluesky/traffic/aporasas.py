@@ -36,14 +36,15 @@ class APorASAS(TrafficArrays):
         # Select asas if there is a conflict AND resolution is on
         # Determine desired states per channel whether to use value from ASAS or AP.
         # bs.traf.cr.active may be used as well, will set all of these channels
-        self.trk = np.where(bs.traf.cr.hdgactive, bs.traf.cr.trk, bs.traf.ap.trk)
-        self.tas = np.where(bs.traf.cr.tasactive, asastas, bs.traf.ap.tas)
-        self.alt = np.where(bs.traf.cr.altactive, bs.traf.cr.alt, bs.traf.ap.alt)
-        self.vs  = np.where(bs.traf.cr.vsactive, bs.traf.cr.vs, bs.traf.ap.vs)
+        # (arrays are written in place, so that they keep their storage buffer)
+        self.trk[:] = np.where(bs.traf.cr.hdgactive, bs.traf.cr.trk, bs.traf.ap.trk)
+        self.tas[:] = np.where(bs.traf.cr.tasactive, asastas, bs.traf.ap.tas)
+        self.alt[:] = np.where(bs.traf.cr.altactive, bs.traf.cr.alt, bs.traf.ap.alt)
+        self.vs[:]  = np.where(bs.traf.cr.vsactive, bs.traf.cr.vs, bs.traf.ap.vs)
 
         # ASAS can give positive and negative VS, but the sign of VS is determined using delalt in Traf.ComputeAirSpeed
         # Therefore, ensure that pilot.vs is always positive to prevent opposite signs of delalt and VS in Traf.ComputeAirSpeed
-        self.vs = np.abs(self.vs)
+        self.vs[:] = np.abs(self.vs)
 
         # Compute the desired heading needed to compensate for the wind
         if bs.traf.wind.winddim > 0:
@@ -56,7 +57,7 @@ class APorASAS(TrafficArrays):
             steer    = np.arcsin(np.minimum(1.0, np.maximum(-1.0,
                                      Vw * np.sin(drift) / np.maximum(0.001, bs.traf.tas))))
             # desired heading
-            self.hdg = (self.trk + np.degrees(steer)) % 360.
+            self.hdg[:] = (self.trk + np.degrees(steer)) % 360.
         else:
-            self.hdg = self.trk % 360.
+            self.hdg[:] = self.trk % 360.
 
@@ -1,4 +1,8 @@
-from .detection import ConflictDetection
+from .detection import ConflictDetection, PairList
 from .resolution import ConflictResolution
-from .statebased import StateBased
+from .statebased import StateBased, StateBased32
+from .gridstatebased import GridStateBased
+from .parallelstatebased import ParallelStateBased
+from .incrementalstatebased import IncrementalStateBased
+from .altitudestatebased import AltitudeStateBased
 from .mvp import MVP
\ No newline at end of file
@@ -0,0 +1,86 @@
+''' State-based conflict detection with an altitude-layer prefilter. '''
+import numpy as np
+from bluesky import stack
+from bluesky.traffic.asas.statebased import StateBased, detect_pairs, pairs2conflicts
+from bluesky.traffic.asas.gridstatebased import expandranges
+
+
+class AltitudeStateBased(StateBased):
+    ''' State-based conflict detection that only computes the CPA for
+        aircraft pairs that can get within each other's vertical protected
+        zone within the lookahead time, given their vertical speeds.
+        Intruders are sorted on altitude once per cycle, and the altitude
+        window of each ownship is found with a binary search. Results are
+        identical to StateBased. '''
+    def __init__(self):
+        super().__init__()
+        # Number of pairs pruned by the prefilter, and number of pairs
+        # without prefilter, in the last cycle and since the last reset
+        self.npruned = self.npairs = 0
+        self.npruned_total = self.npairs_total = 0
+
+    def reset(self):
+        super().reset()
+        self.npruned = self.npairs = 0
+        self.npruned_total = self.npairs_total = 0
+
+    @stack.command(name='CDPRUNED')
+    def showpruned(self):
+        ''' Show the number of aircraft pairs that were skipped by the
+            altitude prefilter of conflict detection. '''
+        return True, f'Altitude prefilter: pruned {self.npruned} of ' + \
+            f'{self.npairs} pairs in last cycle, {self.npruned_total} of ' + \
+            f'{self.npairs_total} pairs in total'
+
+    def detect(self, ownship, intruder, rpz, hpz, dtlookahead):
+        ''' Conflict detection between ownship (traf) and intruder (traf/adsb).'''
+        idx1, idx2 = altitudepairs(ownship, intruder, hpz, dtlookahead)
+
+        # Keep track of the number of pruned pairs
+        self.npairs = ownship.ntraf * (ownship.ntraf - 1)
+        self.npruned = self.npairs - len(idx1)
+        self.npairs_total += self.npairs
+        self.npruned_total += self.npruned
+
+        return pairs2conflicts(ownship, idx1, idx2,
+            *detect_pairs(ownship, intruder, rpz, hpz, dtlookahead, idx1, idx2))
+
+
+def altitudepairs(ownship, intruder, hpz, dtlookahead):
+    ''' Find all ownship-intruder pairs that can be vertically within the
+        protected zone within the lookahead time of the ownship.
+
+        Returns index arrays idx1 (ownship) and idx2 (intruder), sorted on
+        (idx1, idx2), and without ownship-ownship pairs. '''
+    nown, nint = len(ownship.lat), len(intruder.lat)
+    if nown == 0 or nint == 0:
+        return np.array([], dtype=int), np.array([], dtype=int)
+
+    # Largest altitude difference per ownship that can still result in a
+    # conflict within the lookahead time, including a small safety margin
+    dtlook = np.maximum(0.0, dtlookahead)
+    ownvs = np.abs(ownship.vs)
+    intvs = np.abs(intruder.vs)
+    vreach = 1.01 * (np.max(hpz) + (ownvs + np.max(intvs)) * dtlook) + 1.0  # [m]
+
+    # Sort intruders on altitude, and find the altitude window of each ownship
+    order = np.argsort(intruder.alt, kind='stable')
+    sortedalt = intruder.alt[order]
+    starts = np.searchsorted(sortedalt, ownship.alt - vreach, side='left')
+    counts = np.searchsorted(sortedalt, ownship.alt + vreach, side='right') - starts
+
+    # Expand to candidate pairs
+    idx1 = np.repeat(np.arange(nown), counts)
+    idx2 = order[expandranges(starts, counts)]
+
+    # Narrow down using the vertical speed and vertical protected zone of
+    # each pair, and remove ownship-ownship pairs
+    pairvreach = 1.01 * (np.maximum(hpz[idx1], hpz[idx2]) +
+                         (ownvs[idx1] + intvs[idx2]) * dtlook[idx1]) + 1.0
+    keep = (idx1 != idx2) & \
+        (np.abs(intruder.alt[idx2] - ownship.alt[idx1]) < pairvreach)
+
+    # Sort pairs on (idx1, idx2)
+    pairkey = idx1[keep] * nint + idx2[keep]
+    pairkey.sort()
+    return pairkey // nint, pairkey % nint
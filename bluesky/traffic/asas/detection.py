@@ -1,9 +1,11 @@
 ''' This module provides the Conflict Detection base class. '''
+from collections.abc import Sequence
 import numpy as np
 
 import bluesky as bs
 from bluesky.tools.aero import ft, nm
 from bluesky.core import Entity
+from bluesky.core.trafficarrays import newcapacity
 from bluesky.stack import command
 
 
@@ -11,6 +13,73 @@ bs.settings.set_variable_defaults(asas_pzr=5.0, asas_pzh=1000.0,
                                   asas_dtlookahead=300.0)
 
 
+class PairList(Sequence):
+    ''' List of conflicting aircraft pairs, stored as an (n, 2) int32 array
+        of ownship and intruder indices (attribute idx). Callsign tuples
+        (ownship id, intruder id) are only created when the list is accessed
+        as a sequence of tuples. '''
+    def __init__(self, idx1=(), idx2=(), acid=()):
+        self.idx = np.column_stack((idx1, idx2)).astype(np.int32)
+        # Callsigns at the time of detection: these stay valid when aircraft
+        # are deleted before the pairs are used
+        self.acid = acid
+
+    @classmethod
+    def fromids(cls, pairs, ownship):
+        ''' Create a PairList from a list of callsign tuples. '''
+        idx = np.array([ownship.id2idx(pair) for pair in pairs],
+                       dtype=np.int32).reshape(-1, 2)
+        return cls(idx[:, 0], idx[:, 1], list(ownship.id))
+
+    def __len__(self):
+        return len(self.idx)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self)[i]
+        idx1, idx2 = self.idx[i]
+        return self.acid[idx1], self.acid[idx2]
+
+    def __iter__(self):
+        acid = self.acid
+        return ((acid[idx1], acid[idx2]) for idx1, idx2 in self.idx.tolist())
+
+    def __eq__(self, other):
+        if isinstance(other, (PairList, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def clear(self):
+        ''' Remove all pairs. '''
+        self.idx = self.idx[:0]
+
+
+def pairkeys(ownship, intruder, pairs):
+    ''' Sorted, unique int64 keys of the aircraft pairs in PairList pairs,
+        independent of the order in which a pair is given: (a, b) = (b, a).
+        Keys are made of stable aircraft uids, so that they stay the same
+        when traffic arrays are reordered by deletions. '''
+    uid1 = ownship.uid[pairs.idx[:, 0]]
+    uid2 = intruder.uid[pairs.idx[:, 1]]
+    return np.unique(np.minimum(uid1, uid2) << 32 | np.maximum(uid1, uid2))
+
+
+def appendkeys(buf, n, keys):
+    ''' Append keys to the first n elements of buffer buf. A larger buffer
+        is allocated when buf is full, so that the history of conflict keys
+        is kept in a single array, at an amortised cost of O(1) per key.
+        Returns the (new) buffer and number of used elements. '''
+    if n + keys.size > buf.size:
+        newbuf = np.empty(newcapacity(n + keys.size), dtype=np.int64)
+        newbuf[:n] = buf[:n]
+        buf = newbuf
+    buf[n:n + keys.size] = keys
+    return buf, n + keys.size
+
+
 class ConflictDetection(Entity, replaceable=True):
     ''' Base class for Conflict Detection implementations. '''
     def __init__(self):
@@ -29,20 +98,26 @@ class ConflictDetection(Entity, replaceable=True):
         self.global_dtnolook = True
 
         # Conflicts and LoS detected in the current timestep (used for resolving)
-        self.confpairs = list()
-        self.lospairs = list()
+        self.confpairs = PairList()
+        self.lospairs = PairList()
         self.qdr = np.array([])
         self.dist = np.array([])
         self.dcpa = np.array([])
         self.tcpa = np.array([])
         self.tLOS = np.array([])
-        # Unique conflicts and LoS in the current timestep (a, b) = (b, a)
-        self.confpairs_unique = set()
-        self.lospairs_unique = set()
+        # Keys of unique conflicts and LoS in the current timestep (a, b) = (b, a)
+        self.confkeys = np.array([], dtype=np.int64)
+        self.loskeys = np.array([], dtype=np.int64)
+
+        # Keys of all conflicts and LoS since simt=0, stored in buffers of which
+        # the first nconf_all/nlos_all elements are used (see confkeys_all)
+        self.confkeysbuf = np.zeros(0, dtype=np.int64)
+        self.loskeysbuf = np.zeros(0, dtype=np.int64)
+        self.nconf_all = 0
+        self.nlos_all = 0
 
-        # All conflicts and LoS since simt=0
-        self.confpairs_all = list()
-        self.lospairs_all = list()
+        # Callsigns of all aircraft in the conflict keys, by uid
+        self.uid2id = dict()
 
         # Per-aircraft conflict data
         with self.settrafarrays():
@@ -58,17 +133,17 @@ class ConflictDetection(Entity, replaceable=True):
 
     def clearconfdb(self):
         ''' Clear conflict database. '''
-        self.confpairs_unique.clear()
-        self.lospairs_unique.clear()
-        self.confpairs.clear()
-        self.lospairs.clear()
+        self.confkeys = np.array([], dtype=np.int64)
+        self.loskeys = np.array([], dtype=np.int64)
+        self.confpairs = PairList()
+        self.lospairs = PairList()
         self.qdr = np.array([])
         self.dist = np.array([])
         self.dcpa = np.array([])
         self.tcpa = np.array([])
         self.tLOS = np.array([])
-        self.inconf = np.zeros(bs.traf.ntraf)
-        self.tcpamax = np.zeros(bs.traf.ntraf)
+        self.inconf[:] = False
+        self.tcpamax[:] = 0.0
 
     def create(self, n):
         super().create(n)
@@ -81,8 +156,10 @@ class ConflictDetection(Entity, replaceable=True):
     def reset(self):
         super().reset()
         self.clearconfdb()
-        self.confpairs_all.clear()
-        self.lospairs_all.clear()
+        self.confkeysbuf = np.zeros(0, dtype=np.int64)
+        self.loskeysbuf = np.zeros(0, dtype=np.int64)
+        self.nconf_all = self.nlos_all = 0
+        self.uid2id.clear()
         self.rpz_def = bs.settings.asas_pzr * nm
         self.hpz_def = bs.settings.asas_pzh * ft
         self.dtlookahead_def = bs.settings.asas_dtlookahead
@@ -208,21 +285,130 @@ class ConflictDetection(Entity, replaceable=True):
 
     def update(self, ownship, intruder):
         ''' Perform an update step of the Conflict Detection implementation. '''
-        self.confpairs, self.lospairs, self.inconf, self.tcpamax, self.qdr, \
+        confpairs, lospairs, self.inconf[:], self.tcpamax[:], self.qdr, \
             self.dist, self.dcpa, self.tcpa, self.tLOS = \
                 self.detect(ownship, intruder, self.rpz, self.hpz, self.dtlookahead)
 
+        # Implementations can also return lists of callsign tuples
+        self.confpairs = confpairs if isinstance(confpairs, PairList) else \
+            PairList.fromids(confpairs, ownship)
+        self.lospairs = lospairs if isinstance(lospairs, PairList) else \
+            PairList.fromids(lospairs, ownship)
+
+        # Exclude aircraft that are queued for deletion
+        if ownship.deleted.any():
+            self.excludedeleted(ownship)
+
         # confpairs has conflicts observed from both sides (a, b) and (b, a)
-        # confpairs_unique keeps only one of these
-        confpairs_unique = {frozenset(pair) for pair in self.confpairs}
-        lospairs_unique = {frozenset(pair) for pair in self.lospairs}
+        # confkeys keeps only one of these
+        confkeys = pairkeys(ownship, intruder, self.confpairs)
+        loskeys = pairkeys(ownship, intruder, self.lospairs)
+
+        # Store new conflicts and LoS
+        newconf = np.setdiff1d(confkeys, self.confkeys, assume_unique=True)
+        newlos = np.setdiff1d(loskeys, self.loskeys, assume_unique=True)
+        self.confkeysbuf, self.nconf_all = appendkeys(self.confkeysbuf, self.nconf_all, newconf)
+        self.loskeysbuf, self.nlos_all = appendkeys(self.loskeysbuf, self.nlos_all, newlos)
+
+        # Remember the callsigns of aircraft in new conflicts and LoS.
+        # Aircraft are always appended, so uids are sorted in ownship.
+        newuids = [uid for uid in np.unique(np.concatenate((
+            newconf >> 32, newconf & 0xffffffff, newlos >> 32,
+            newlos & 0xffffffff))).tolist() if uid not in self.uid2id]
+        if newuids:
+            idx = np.searchsorted(ownship.uid, newuids)
+            self.uid2id.update(zip(newuids, (ownship.id[i] for i in idx)))
+
+        # Update confkeys and loskeys
+        self.confkeys = confkeys
+        self.loskeys = loskeys
+
+    def excludedeleted(self, ownship):
+        ''' Remove the conflicts and LoS of aircraft that are queued for
+            deletion. '''
+        deleted = ownship.deleted
+        conf, los = self.confpairs, self.lospairs
+        keep = ~(deleted[conf.idx[:, 0]] | deleted[conf.idx[:, 1]])
+        keeplos = ~(deleted[los.idx[:, 0]] | deleted[los.idx[:, 1]])
+        self.confpairs = PairList(conf.idx[keep, 0], conf.idx[keep, 1], conf.acid)
+        self.lospairs = PairList(los.idx[keeplos, 0], los.idx[keeplos, 1], los.acid)
+        self.qdr, self.dist, self.dcpa, self.tcpa, self.tLOS = (
+            np.asarray(v)[keep] for v in (self.qdr, self.dist, self.dcpa, self.tcpa, self.tLOS))
+
+        # Recompute the per-aircraft conflict flag and max tCPA
+        idx1 = self.confpairs.idx[:, 0]
+        self.inconf[:] = False
+        self.inconf[idx1] = True
+        self.tcpamax[:] = 0.0
+        np.maximum.at(self.tcpamax, idx1, self.tcpa)
+
+    def keys2pairs(self, keys):
+        ''' Convert conflict keys to callsign pairs. '''
+        uid2id = self.uid2id
+        return [frozenset((uid2id[uid1], uid2id[uid2])) for uid1, uid2 in
+                zip((keys >> 32).tolist(), (keys & 0xffffffff).tolist())]
+
+    def pairs2keys(self, pairs):
+        ''' Convert callsign pairs of current aircraft, or of aircraft in
+            earlier conflicts, to conflict keys (in the same order). '''
+        id2uid = {acid: uid for uid, acid in self.uid2id.items()}
+        id2uid.update(zip(bs.traf.id, bs.traf.uid.tolist()))
+        keys = []
+        for pair in pairs:
+            uid1, uid2 = sorted(id2uid[acid] for acid in pair)
+            keys.append(uid1 << 32 | uid2)
+            for acid in pair:
+                self.uid2id.setdefault(id2uid[acid], acid)
+        return np.array(keys, dtype=np.int64)
+
+    @property
+    def confpairs_unique(self):
+        ''' Unique conflicts in the current timestep as a set of callsign
+            pairs. '''
+        return set(self.keys2pairs(self.confkeys))
+
+    @confpairs_unique.setter
+    def confpairs_unique(self, pairs):
+        self.confkeys = np.unique(self.pairs2keys(pairs))
+
+    @property
+    def lospairs_unique(self):
+        ''' Unique LoS in the current timestep as a set of callsign pairs. '''
+        return set(self.keys2pairs(self.loskeys))
+
+    @lospairs_unique.setter
+    def lospairs_unique(self, pairs):
+        self.loskeys = np.unique(self.pairs2keys(pairs))
+
+    @property
+    def confkeys_all(self):
+        ''' Keys of all conflicts since simt=0, in order of detection. '''
+        return self.confkeysbuf[:self.nconf_all]
+
+    @property
+    def loskeys_all(self):
+        ''' Keys of all LoS since simt=0, in order of detection. '''
+        return self.loskeysbuf[:self.nlos_all]
+
+    @property
+    def confpairs_all(self):
+        ''' All conflicts since simt=0 as a list of callsign pairs. '''
+        return self.keys2pairs(self.confkeys_all)
+
+    @confpairs_all.setter
+    def confpairs_all(self, pairs):
+        self.confkeysbuf = self.pairs2keys(pairs)
+        self.nconf_all = self.confkeysbuf.size
 
-        self.confpairs_all.extend(confpairs_unique - self.confpairs_unique)
-        self.lospairs_all.extend(lospairs_unique - self.lospairs_unique)
+    @property
+    def lospairs_all(self):
+        ''' All LoS since simt=0 as a list of callsign pairs. '''
+        return self.keys2pairs(self.loskeys_all)
 
-        # Update confpairs_unique and lospairs_unique
-        self.confpairs_unique = confpairs_unique
-        self.lospairs_unique = lospairs_unique
+    @lospairs_all.setter
+    def lospairs_all(self, pairs):
+        self.loskeysbuf = self.pairs2keys(pairs)
+        self.nlos_all = self.loskeysbuf.size
 
     def detect(self, ownship, intruder, rpz, hpz, dtlookahead):
         ''' Detect any conflicts between ownship and intruder.
@@ -230,8 +416,8 @@ class ConflictDetection(Entity, replaceable=True):
             detection of conflicts. See for instance
             bluesky.traffic.asas.statebased.
         '''
-        confpairs = []
-        lospairs = []
+        confpairs = PairList()
+        lospairs = PairList()
         inconf = np.zeros(ownship.ntraf)
         tcpamax = np.zeros(ownship.ntraf)
         qdr = np.array([])
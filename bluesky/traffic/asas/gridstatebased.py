@@ -0,0 +1,107 @@
+''' State-based conflict detection with a spatial grid as broad phase. '''
+import numpy as np
+from bluesky.tools.aero import Rearth
+from bluesky.traffic.asas.statebased import StateBased, detect_pairs, pairs2conflicts
+
+
+# [deg] Latitude from which the grid has a single longitude band
+latpolar = 89.0
+
+
+class GridStateBased(StateBased):
+    ''' State-based conflict detection that only computes the CPA for
+        aircraft pairs that are in the same or in neighbouring cells of a
+        lat/lon/altitude grid. The grid cell size is derived from the
+        protected zone, the lookahead time and the maximum ground and
+        vertical speeds, so that no conflict within the lookahead time is
+        missed. Results are identical to StateBased. '''
+    def detect(self, ownship, intruder, rpz, hpz, dtlookahead):
+        ''' Conflict detection between ownship (traf) and intruder (traf/adsb).'''
+        idx1, idx2 = gridpairs(ownship, intruder, rpz, hpz, dtlookahead)
+        return pairs2conflicts(ownship, idx1, idx2,
+            *detect_pairs(ownship, intruder, rpz, hpz, dtlookahead, idx1, idx2))
+
+
+def expandranges(starts, counts):
+    ''' Concatenate the index ranges [start, start + count) for all
+        elements of starts and counts. '''
+    ends = np.cumsum(counts)
+    return np.arange(ends[-1] if len(ends) else 0) + \
+        np.repeat(starts - ends + counts, counts)
+
+
+def gridpairs(ownship, intruder, rpz, hpz, dtlookahead):
+    ''' Find all ownship-intruder pairs that can be in conflict within the
+        lookahead time, using a lat/lon/altitude grid.
+
+        Returns index arrays idx1 (ownship) and idx2 (intruder), sorted on
+        (idx1, idx2), and without ownship-ownship pairs. '''
+    nown, nint = len(ownship.lat), len(intruder.lat)
+    if nown == 0 or nint == 0:
+        return np.array([], dtype=int), np.array([], dtype=int)
+
+    # Largest distance between two aircraft that can still result in a
+    # conflict within the lookahead time, including a small safety margin
+    dtlook = max(0.0, np.max(dtlookahead))
+    gsmax = max(np.max(np.abs(ownship.gs)), np.max(np.abs(intruder.gs)))
+    vsmax = max(np.max(np.abs(ownship.vs)), np.max(np.abs(intruder.vs)))
+    hreach = 1.01 * (np.max(rpz) + 2.0 * gsmax * dtlook) + 1.0  # [m]
+    vreach = 1.01 * (np.max(hpz) + 2.0 * vsmax * dtlook) + 1.0  # [m]
+
+    # Grid cell size in latitude and longitude. Longitude cells are sized
+    # for the highest latitude in the traffic, and wrap around the dateline.
+    # Close to the poles, where longitude cells would become too narrow,
+    # the grid has a single longitude band.
+    dlatcell = np.degrees(hreach / Rearth)
+    latmax = max(np.max(np.abs(ownship.lat)), np.max(np.abs(intruder.lat))) + dlatcell
+    if latmax < latpolar:
+        dloncell = np.degrees(hreach / (Rearth * np.cos(np.radians(latmax))))
+        nlon = max(1, int(360.0 // dloncell))
+    else:
+        nlon = 1
+
+    def cells(traf):
+        ''' Grid cell indices of all aircraft in traf. '''
+        ialt = np.floor(traf.alt / vreach).astype(np.int64)
+        ilat = np.floor(traf.lat / dlatcell).astype(np.int64)
+        ilon = np.floor((traf.lon + 180.0) % 360.0 * nlon / 360.0).astype(np.int64) % nlon
+        return ialt, ilat, ilon
+
+    oalt, olat, olon = cells(ownship)
+    ialt, ilat, ilon = cells(intruder)
+
+    # Combine cell indices into one key. Altitude and latitude indices are
+    # padded by one cell so that neighbours of all cells have a valid key
+    altmin = min(oalt.min(), ialt.min()) - 1
+    latmin = min(olat.min(), ilat.min()) - 1
+    nlat = max(olat.max(), ilat.max()) - latmin + 2
+
+    def cellkey(kalt, klat, klon):
+        return ((kalt - altmin) * nlat + klat - latmin) * nlon + klon
+
+    # Sort intruders on their cell key
+    intkeys = cellkey(ialt, ilat, ilon)
+    order = np.argsort(intkeys, kind='stable')
+    sortedkeys = intkeys[order]
+
+    # Keys of all neighbouring cells of each ownship: 3x3x3 cells,
+    # or fewer in longitude if the grid has less than three longitude cells
+    lonoffsets = (-1, 0, 1) if nlon >= 3 else tuple(range(nlon))
+    nbkeys = np.column_stack([
+        cellkey(oalt + da, olat + dl, (olon + dlo) % nlon if nlon >= 3 else
+                np.full(nown, dlo, dtype=np.int64))
+        for da in (-1, 0, 1) for dl in (-1, 0, 1) for dlo in lonoffsets]).ravel()
+
+    # Find the range of intruders in each neighbouring cell
+    starts = np.searchsorted(sortedkeys, nbkeys, side='left')
+    counts = np.searchsorted(sortedkeys, nbkeys, side='right') - starts
+
+    # Expand to candidate pairs
+    idx1 = np.repeat(np.repeat(np.arange(nown), nbkeys.size // nown), counts)
+    idx2 = order[expandranges(starts, counts)]
+
+    # Remove ownship-ownship pairs, and sort pairs on (idx1, idx2)
+    keep = idx1 != idx2
+    pairkey = idx1[keep] * nint + idx2[keep]
+    pairkey.sort()
+    return pairkey // nint, pairkey % nint
@@ -0,0 +1,127 @@
+''' Incremental state-based conflict detection with recheck scheduling. '''
+import numpy as np
+import bluesky as bs
+from bluesky.tools.aero import ft
+from bluesky.traffic.asas.statebased import StateBased, detect_pairs, pairs2conflicts
+
+
+# Relative safety margin on closing speeds used to compute the earliest
+# time at which a conflict can become possible
+bs.settings.set_variable_defaults(asas_recheckmargin=0.1)
+
+# [m] Maximum difference between altitude and selected altitude of aircraft
+# that are considered level
+levelmargin = 1.0 * ft
+
+
+def maxspeed(ac):
+    ''' Upper bound of the ground speed of aircraft ac in the coming cycles:
+        its ground speed, or its current or selected airspeed plus the wind
+        speed. Intruder data (e.g., ADS-B) without autopilot or wind data
+        only gives the current ground speed and airspeed. '''
+    tas = np.maximum(ac.tas, ac.ap.tas) if hasattr(ac, 'ap') else ac.tas
+    if hasattr(ac, 'windnorth'):
+        tas = tas + np.sqrt(ac.windnorth**2 + ac.windeast**2)
+    return np.maximum(ac.gs, tas)
+
+
+class IncrementalStateBased(StateBased):
+    ''' State-based conflict detection that keeps, per aircraft, the earliest
+        simulation time at which it can be in conflict with any other
+        aircraft. This bound follows from the current separation, the
+        maximum closing speed and the lookahead time. Pairs of which both
+        aircraft are not yet due are skipped, which gives a cost of
+        O(ndue * ntraf) per cycle instead of O(ntraf^2).
+
+        Only level aircraft with unchanged autopilot selections are
+        scheduled. Aircraft that climb or descend, that are following ASAS,
+        or that receive a new speed or altitude selection, or new protected
+        zone or lookahead settings, are rechecked against all other
+        aircraft in each cycle. Heading changes don't affect the bound,
+        as it uses a direction-independent closing speed. '''
+    def __init__(self):
+        super().__init__()
+        self.margin = bs.settings.asas_recheckmargin
+        with self.settrafarrays():
+            # [s] Earliest simulation time at which a conflict is possible
+            self.tnextcheck = np.array([])
+            # Autopilot selections and CD settings at the last check
+            self.prevselspd = np.array([])
+            self.prevselalt = np.array([])
+            self.prevselvs = np.array([])
+            self.prevrpz = np.array([])
+            self.prevhpz = np.array([])
+            self.prevdtlook = np.array([])
+
+    def clearconfdb(self):
+        super().clearconfdb()
+        # Recheck all aircraft at the next detection
+        self.tnextcheck[:] = -1e9
+
+    def reset(self):
+        super().reset()
+        self.margin = bs.settings.asas_recheckmargin
+
+    def detect(self, ownship, intruder, rpz, hpz, dtlookahead):
+        ''' Conflict detection between ownship (traf) and intruder (traf/adsb).'''
+        # Aircraft that can be scheduled: level (within levelmargin of the
+        # selected altitude), and not following ASAS
+        level = (ownship.vs == 0.0) & \
+            (np.abs(ownship.alt - ownship.selalt) < levelmargin) & \
+            np.logical_not(ownship.cr.active)
+
+        # Aircraft with new autopilot selections or CD settings are rechecked
+        changed = (ownship.selspd != self.prevselspd) | \
+            (ownship.selalt != self.prevselalt) | \
+            (ownship.selvs != self.prevselvs) | (rpz != self.prevrpz) | \
+            (hpz != self.prevhpz) | (dtlookahead != self.prevdtlook)
+        self.prevselspd[:] = ownship.selspd
+        self.prevselalt[:] = ownship.selalt
+        self.prevselvs[:] = ownship.selvs
+        self.prevrpz[:] = rpz
+        self.prevhpz[:] = hpz
+        self.prevdtlook[:] = dtlookahead
+
+        due = changed | np.logical_not(level) | (self.tnextcheck <= bs.sim.simt)
+        idue = np.flatnonzero(due)
+        inotdue = np.flatnonzero(np.logical_not(due))
+
+        # Candidate pairs: all pairs that involve at least one due aircraft,
+        # sorted on (idx1, idx2), without ownship-ownship pairs
+        nint = len(intruder.lat)
+        pairkey = np.concatenate((
+            (idue.reshape(-1, 1) * nint + np.arange(nint)).ravel(),
+            (inotdue.reshape(-1, 1) * nint + idue).ravel()))
+        pairkey.sort()
+        idx1, idx2 = pairkey // nint, pairkey % nint
+        notself = idx1 != idx2
+        idx1, idx2 = idx1[notself], idx2[notself]
+
+        result = detect_pairs(ownship, intruder, rpz, hpz, dtlookahead, idx1, idx2)
+
+        # Earliest time at which a conflict is possible for each pair of
+        # level aircraft. Pairs with a climbing or descending aircraft are
+        # checked in every cycle, so these don't restrict the recheck time.
+        dist = result[3]
+        vmaxown = maxspeed(ownship)
+        vmaxint = vmaxown if intruder is ownship else maxspeed(intruder)
+        vclose = (1.0 + self.margin) * (vmaxown[idx1] + vmaxint[idx2])
+        pairrpz = np.maximum(rpz[idx1], rpz[idx2])
+        pairhpz = np.maximum(hpz[idx1], hpz[idx2])
+        pairdtlook = np.maximum(dtlookahead[idx1], dtlookahead[idx2])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tpossible = np.where(dist > pairrpz, (dist - pairrpz) / vclose, 0.0) - pairdtlook
+        # Level aircraft that are vertically separated can't get in conflict.
+        # Both can still move to their selected altitude.
+        vertsep = np.abs(intruder.alt[idx2] - ownship.alt[idx1]) >= \
+            pairhpz + 2.0 * levelmargin
+        tpossible[vertsep | np.logical_not(level[idx1] & level[idx2])] = np.inf
+
+        # Update recheck times: due aircraft get a new bound, the bound of
+        # other aircraft can only become earlier. Non-level aircraft are
+        # always due.
+        self.tnextcheck[idue] = np.inf
+        np.minimum.at(self.tnextcheck, idx1, bs.sim.simt + np.maximum(0.0, tpossible))
+        self.tnextcheck[np.logical_not(level)] = bs.sim.simt
+
+        return pairs2conflicts(ownship, idx1, idx2, *result)
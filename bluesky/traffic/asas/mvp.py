@@ -159,43 +159,31 @@ class MVP(ConflictResolution):
         return dv1, dv2
 
 
+    def prioflags(self, vs1, vs2):
+        ''' Array version of applyprio: determine for each conflict pair
+            whether aircraft 1 takes part in the resolution, and the factor
+            applied to the vertical component of the MVP resolution. '''
+        # Aircraft 1 cruising and aircraft 2 climbing/descending, and vice versa
+        cruise1 = (np.abs(vs1) < 0.1) & (np.abs(vs2) > 0.1)
+        cruise2 = (np.abs(vs2) < 0.1) & (np.abs(vs1) > 0.1)
+        both = np.logical_not(cruise1 | cruise2)
+        if self.priocode == 'FF1':
+            return np.ones(len(vs1), dtype=bool), np.full(len(vs1), 0.5)
+        if self.priocode == 'FF2':
+            return np.logical_not(cruise1), np.full(len(vs1), 0.5)
+        if self.priocode == 'FF3':
+            return np.logical_not(cruise2), np.where(both, 0.5, 0.0)
+        if self.priocode == 'LAY1':
+            return np.logical_not(cruise1), np.zeros(len(vs1))
+        if self.priocode == 'LAY2':
+            return np.logical_not(cruise2), np.zeros(len(vs1))
+        return np.zeros(len(vs1), dtype=bool), np.ones(len(vs1))
+
     def resolve(self, conf, ownship, intruder):
         ''' Resolve all current conflicts '''
-        # Initialize an array to store the resolution velocity vector for all A/C
-        dv = np.zeros((ownship.ntraf, 3))
-
-        # Initialize an array to store time needed to resolve vertically
-        timesolveV = np.ones(ownship.ntraf) * 1e9
-
-        # Call MVP function to resolve conflicts-----------------------------------
-        for ((ac1, ac2), qdr, dist, tcpa, tLOS) in zip(conf.confpairs, conf.qdr, conf.dist, conf.tcpa, conf.tLOS):
-            idx1 = ownship.id.index(ac1)
-            idx2 = intruder.id.index(ac2)
-
-            # If A/C indexes are found, then apply MVP on this conflict pair
-            # Because ADSB is ON, this is done for each aircraft separately
-            if idx1 >-1 and idx2 > -1:
-                dv_mvp, tsolV = self.MVP(ownship, intruder, conf, qdr, dist, tcpa, tLOS, idx1, idx2)
-                if tsolV < timesolveV[idx1]:
-                    timesolveV[idx1] = tsolV
-
-                # Use priority rules if activated
-                if self.swprio:
-                    dv[idx1], _ = self.applyprio(dv_mvp, dv[idx1], dv[idx2], ownship.vs[idx1], intruder.vs[idx2])
-                else:
-                    # since cooperative, the vertical resolution component can be halved, and then dv_mvp can be added
-                    dv_mvp[2] = 0.5 * dv_mvp[2]
-                    dv[idx1] = dv[idx1] - dv_mvp
-
-                # Check the noreso aircraft. Nobody avoids noreso aircraft.
-                # But noreso aircraft will avoid other aircraft
-                if self.noresoac[idx2]:
-                    dv[idx1] = dv[idx1] + dv_mvp
-
-                # Check the resooff aircraft. These aircraft will not do resolutions.
-                if self.resooffac[idx1]:
-                    dv[idx1] = 0.0
-
+        # Array to store the resolution velocity vector for all A/C, and
+        # array to store time needed to resolve vertically
+        dv, timesolveV = self.resolution_vectors(conf, ownship, intruder)
 
         # Determine new speed and limit resolution direction for all aicraft-------
 
@@ -264,6 +252,116 @@ class MVP(ConflictResolution):
         alt = alt * (1 - self.swresohoriz) + ownship.selalt * self.swresohoriz
         return newtrack, newgscapped, vscapped, alt
 
+    def resolution_vectors(self, conf, ownship, intruder):
+        ''' Compute the MVP resolution velocity vector (ntraf x 3), and the
+            time needed to resolve vertically, for all aircraft. The
+            resolutions of all conflict pairs are computed at once, and
+            combined in the same order as the pairs in conf.confpairs. '''
+        idx1, idx2 = conf.confpairs.idx.T
+        dv_mvp, tsolV = self.MVP_pairs(ownship, intruder, conf, conf.qdr,
+                                       conf.dist, conf.tcpa, conf.tLOS, idx1, idx2)
+
+        # Time needed to resolve vertically: smallest per ownship
+        timesolveV = np.ones(ownship.ntraf) * 1e9
+        np.fmin.at(timesolveV, idx1, tsolV)
+
+        # Determine which aircraft resolves, and how the vertical
+        # resolution is shared between aircraft
+        if self.swprio:
+            solve1, vfactor = self.prioflags(ownship.vs[idx1], intruder.vs[idx2])
+        else:
+            # since cooperative, the vertical resolution component can be halved
+            solve1, vfactor = np.ones(len(idx1), dtype=bool), np.full(len(idx1), 0.5)
+        dv_mvp[:, 2] = np.where(vfactor == 0.0, 0.0, dv_mvp[:, 2] * vfactor)
+
+        # Nobody avoids noreso aircraft, so noreso intruders give back the
+        # resolution of the ownship. Per pair first the ownship resolution
+        # is applied, and then that of noreso intruders, so that the order
+        # of accumulation is the same as when pairs are processed one by one.
+        contrib = np.stack((-dv_mvp, dv_mvp), axis=1).reshape(-1, 3)
+        apply = np.column_stack((solve1, self.noresoac[idx2])).ravel()
+        dv = np.zeros((ownship.ntraf, 3))
+        np.add.at(dv, np.repeat(idx1, 2)[apply], contrib[apply])
+
+        # Resooff aircraft will not do resolutions
+        dv[self.resooffac] = 0.0
+
+        return dv, timesolveV
+
+    def MVP_pairs(self, ownship, intruder, conf, qdr, dist, tcpa, tLOS, idx1, idx2):
+        """Modified Voltage Potential (MVP) resolution method for arrays of
+           conflict pairs. Returns the resolution vectors (npairs x 3), and
+           the times to solve the conflicts vertically."""
+        # Preliminary calculations-------------------------------------------------
+        # Determine largest RPZ and HPZ of the conflict pair, use lookahead of ownship
+        rpz_m = np.maximum(conf.rpz[idx1] * self.resofach, conf.rpz[idx2] * self.resofach)
+        hpz_m = np.maximum(conf.hpz[idx1] * self.resofacv, conf.hpz[idx2] * self.resofacv)
+        dtlook = conf.dtlookahead[idx1]
+        # Convert qdr from degrees to radians
+        qdr = np.radians(qdr)
+
+        # Relative position vector between id1 and id2
+        drel = np.array([np.sin(qdr) * dist, \
+                        np.cos(qdr) * dist, \
+                        intruder.alt[idx2] - ownship.alt[idx1]])
+
+        # Write velocities as vectors and find relative velocity vector
+        v1 = np.array([ownship.gseast[idx1], ownship.gsnorth[idx1], ownship.vs[idx1]])
+        v2 = np.array([intruder.gseast[idx2], intruder.gsnorth[idx2], intruder.vs[idx2]])
+        vrel = v2 - v1
+
+        # Horizontal resolution----------------------------------------------------
+
+        # Find horizontal distance at the tcpa (min horizontal distance)
+        dcpa  = drel + vrel*tcpa
+        dabsH = np.sqrt(dcpa[0] * dcpa[0] + dcpa[1] * dcpa[1])
+
+        # Compute horizontal intrusion
+        iH = rpz_m - dabsH
+
+        # Exception handlers for head-on conflicts
+        # This is done to prevent division by zero in the next step
+        headon = dabsH <= 10.
+        dabsH[headon] = 10.
+        dcpa[0, headon] = drel[1, headon] / dist[headon] * 10.
+        dcpa[1, headon] = -drel[0, headon] / dist[headon] * 10.
+
+        # If intruder is outside the ownship PZ, then apply extra factor
+        # to make sure that resolution does not graze IPZ
+        with np.errstate(divide='ignore', invalid='ignore'):
+            outside = (rpz_m < dist) & (dabsH < dist)
+            erratum = np.cos(np.arcsin(rpz_m / dist) - np.arcsin(dabsH / dist))
+            intrusion = np.where(outside, rpz_m / erratum - dabsH, iH)
+            dv1 = (intrusion * dcpa[0]) / (np.abs(tcpa) * dabsH)
+            dv2 = (intrusion * dcpa[1]) / (np.abs(tcpa) * dabsH)
+
+            # Vertical resolution--------------------------------------------------
+
+            # Compute the  vertical intrusion
+            # Amount of vertical intrusion dependent on vertical relative velocity
+            vertical = np.abs(vrel[2]) > 0.0
+            iV = np.where(vertical, hpz_m, hpz_m - np.abs(drel[2]))
+
+            # Get the time to solve the conflict vertically - tsolveV
+            tsolV = np.where(vertical, np.abs(drel[2] / vrel[2]), tLOS)
+
+            # If the time to solve the conflict vertically is longer than the look-ahead time,
+            # because the the relative vertical speed is very small, then solve the intrusion
+            # within tinconf
+            slow = tsolV > dtlook
+            tsolV[slow] = tLOS[slow]
+            iV[slow] = hpz_m[slow]
+
+            # Compute the resolution velocity vector in the vertical direction
+            # The direction of the vertical resolution is such that the aircraft with
+            # higher climb/decent rate reduces their climb/decent rate
+            dv3 = np.where(vertical, (iV / tsolV) * (-vrel[2] / np.abs(vrel[2])), (iV / tsolV))
+
+        # Combine resolutions------------------------------------------------------
+
+        # combine the dv components
+        return np.column_stack((dv1, dv2, dv3)), tsolV
+
     def MVP(self, ownship, intruder, conf, qdr, dist, tcpa, tLOS, idx1, idx2):
         """Modified Voltage Potential (MVP) resolution method"""
         # Preliminary calculations-------------------------------------------------
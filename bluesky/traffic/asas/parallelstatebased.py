@@ -0,0 +1,58 @@
+''' Multi-threaded state-based conflict detection. '''
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import cpu_count
+import numpy as np
+import bluesky as bs
+from bluesky import stack
+from bluesky.traffic.asas.statebased import StateBased, detect_block, pairs2conflicts
+
+
+# Number of worker threads for parallel conflict detection (0 = number of cpu's)
+bs.settings.set_variable_defaults(asas_nworkers=0)
+
+
+class ParallelStateBased(StateBased):
+    ''' State-based conflict detection where the ownship aircraft are split
+        in chunks that are evaluated on a pool of worker threads. NumPy
+        releases the GIL in its array operations, so chunks are processed
+        in parallel. Results (including pair ordering) are identical to
+        StateBased. '''
+    def __init__(self):
+        super().__init__()
+        self.nworkers = bs.settings.asas_nworkers or cpu_count()
+        self.pool = None
+
+    def reset(self):
+        super().reset()
+        self.setnworkers(bs.settings.asas_nworkers or cpu_count())
+
+    @stack.command(name='CDWORKERS')
+    def setnworkers(self, n: int = -1):
+        ''' Set the number of worker threads used by parallel conflict
+            detection. '''
+        if n < 1:
+            return True, f'CDWORKERS [n]\nCurrent number of CD workers: {self.nworkers}'
+        if n != self.nworkers and self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        self.nworkers = n
+        return True, f'Setting number of CD workers to {n}'
+
+    def detect(self, ownship, intruder, rpz, hpz, dtlookahead):
+        ''' Conflict detection between ownship (traf) and intruder (traf/adsb).'''
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(self.nworkers)
+
+        # Divide ownship range in chunks: use the tiled block size if set,
+        # otherwise divide evenly over the workers. Without traffic a single
+        # empty chunk gives the (empty) results in the right form.
+        chunksize = max(1, self.blocksize or -(-ownship.ntraf // self.nworkers))
+        chunks = [(i0, min(i0 + chunksize, ownship.ntraf))
+                  for i0 in range(0, max(1, ownship.ntraf), chunksize)]
+
+        # Executor.map returns results in the order of chunks, which keeps
+        # the resulting pair ordering deterministic
+        blocks = list(self.pool.map(
+            lambda chunk: detect_block(ownship, intruder, rpz, hpz,
+                                       dtlookahead, *chunk), chunks))
+        return pairs2conflicts(ownship, *(np.concatenate(v) for v in zip(*blocks)))
@@ -1,14 +1,63 @@
 ''' State-based conflict detection. '''
 import numpy as np
+import bluesky as bs
 from bluesky import stack
 from bluesky.tools import geo
 from bluesky.tools.aero import nm
-from bluesky.traffic.asas import ConflictDetection
+from bluesky.traffic.asas import ConflictDetection, PairList
+
+
+# Number of ownship rows per block in tiled detection (0 = no tiling), and
+# floating point precision of conflict screening ('float64' or 'float32')
+bs.settings.set_variable_defaults(asas_blocksize=0, asas_precision='float64')
 
 
 class StateBased(ConflictDetection):
+    def __init__(self):
+        super().__init__()
+        # [-] Number of ownship aircraft per block in tiled detection
+        self.blocksize = bs.settings.asas_blocksize
+        # Floating point precision of conflict screening
+        self.precision = bs.settings.asas_precision
+
+    def reset(self):
+        super().reset()
+        self.blocksize = bs.settings.asas_blocksize
+        self.precision = bs.settings.asas_precision
+
+    @stack.command(name='CDBLOCKSIZE')
+    def setblocksize(self, size: int = -1):
+        ''' Set the number of ownship aircraft that are processed per block
+            in tiled state-based conflict detection. This limits the memory
+            use of conflict detection to O(size * ntraf) instead of
+            O(ntraf * ntraf). Set to zero to disable tiling. '''
+        if size < 0:
+            return True, f'CDBLOCKSIZE [size]\nCurrent block size: {self.blocksize}' + \
+                (' (tiling disabled)' if self.blocksize == 0 else '')
+        self.blocksize = size
+        return True, 'Tiled conflict detection disabled.' if size == 0 else \
+            f'Setting conflict detection block size to {size} aircraft'
+
+    @stack.command(name='CDPRECISION')
+    def setprecision(self, precision: 'txt' = ''):
+        ''' Set the floating point precision of state-based conflict
+            detection. With FLOAT32, all aircraft pairs are screened in single
+            precision, after which only the candidate pairs are evaluated in
+            double precision. Results are identical to FLOAT64. '''
+        if not precision:
+            return True, f'CDPRECISION [FLOAT32/FLOAT64]\nCurrent precision: {self.precision}'
+        if precision.lower() not in ('float32', 'float64'):
+            return False, f'CDPRECISION: Unknown precision {precision}'
+        self.precision = precision.lower()
+        return True, f'Setting conflict detection precision to {self.precision}'
+
     def detect(self, ownship, intruder, rpz, hpz, dtlookahead):
         ''' Conflict detection between ownship (traf) and intruder (traf/adsb).'''
+        if self.precision == 'float32':
+            return self.detect_float32(ownship, intruder, rpz, hpz, dtlookahead)
+        if 0 < self.blocksize < ownship.ntraf:
+            return self.detect_tiled(ownship, intruder, rpz, hpz, dtlookahead)
+
         # Identity matrix of order ntraf: avoid ownship-ownship detected conflicts
         I = np.eye(ownship.ntraf)
 
@@ -28,15 +77,15 @@ class StateBased(ConflictDetection):
         dx = dist * np.sin(qdrrad)  # is pos j rel to i
         dy = dist * np.cos(qdrrad)  # is pos j rel to i
 
-        # Ownship track angle and speed
-        owntrkrad = np.radians(ownship.trk)
-        ownu = ownship.gs * np.sin(owntrkrad).reshape((1, ownship.ntraf))  # m/s
-        ownv = ownship.gs * np.cos(owntrkrad).reshape((1, ownship.ntraf))  # m/s
+        # Ownship track angle and speed (sin/cos of track shared per step)
+        ownsintrk, owncostrk = bs.traf.derived.sincos(ownship.trk)
+        ownu = ownship.gs * ownsintrk.reshape((1, ownship.ntraf))  # m/s
+        ownv = ownship.gs * owncostrk.reshape((1, ownship.ntraf))  # m/s
 
         # Intruder track angle and speed
-        inttrkrad = np.radians(intruder.trk)
-        intu = intruder.gs * np.sin(inttrkrad).reshape((1, ownship.ntraf))  # m/s
-        intv = intruder.gs * np.cos(inttrkrad).reshape((1, ownship.ntraf))  # m/s
+        intsintrk, intcostrk = bs.traf.derived.sincos(intruder.trk)
+        intu = intruder.gs * intsintrk.reshape((1, ownship.ntraf))  # m/s
+        intv = intruder.gs * intcostrk.reshape((1, ownship.ntraf))  # m/s
 
         du = ownu - intu.T  # Speed du[i,j] is perceived eastern speed of i to j
         dv = ownv - intv.T  # Speed dv[i,j] is perceived northern speed of i to j
@@ -96,15 +145,236 @@ class StateBased(ConflictDetection):
         tcpamax = np.max(tcpa * swconfl, 1)
 
         # Select conflicting pairs: each a/c gets their own record
-        confpairs = [(ownship.id[i], ownship.id[j]) for i, j in zip(*np.where(swconfl))]
+        acid = list(ownship.id)
+        confpairs = PairList(*np.where(swconfl), acid)
         swlos = (dist < rpz) * (np.abs(dalt) < hpz)
-        lospairs = [(ownship.id[i], ownship.id[j]) for i, j in zip(*np.where(swlos))]
+        lospairs = PairList(*np.where(swlos), acid)
 
         return confpairs, lospairs, inconf, tcpamax, \
             qdr[swconfl], dist[swconfl], np.sqrt(dcpa2[swconfl]), \
                 tcpa[swconfl], tinconf[swconfl]
 
 
+    def detect_tiled(self, ownship, intruder, rpz, hpz, dtlookahead):
+        ''' Tiled conflict detection: ownship aircraft are processed in
+            blocks of self.blocksize rows, of which only the conflicting
+            entries are kept. Results are identical to the full-matrix
+            implementation. '''
+        blocks = [detect_block(ownship, intruder, rpz, hpz, dtlookahead, i0,
+                               min(i0 + self.blocksize, ownship.ntraf))
+                  for i0 in range(0, ownship.ntraf, self.blocksize)]
+        return pairs2conflicts(ownship, *(np.concatenate(v) for v in zip(*blocks)))
+
+    def detect_float32(self, ownship, intruder, rpz, hpz, dtlookahead):
+        ''' Mixed-precision conflict detection: all pairs are screened in
+            single precision with slightly enlarged protected zones and
+            lookahead time. The remaining candidate pairs are evaluated in
+            double precision, which gives results identical to detect().
+            The screening is done in blocks when a block size is set. '''
+        blocksize = self.blocksize or max(1, ownship.ntraf)
+        idx1, idx2 = (np.concatenate(v) for v in zip(*(
+            screen_float32(ownship, intruder, rpz, hpz, dtlookahead, i0,
+                           min(i0 + blocksize, ownship.ntraf))
+            for i0 in range(0, max(1, ownship.ntraf), blocksize))))
+        return pairs2conflicts(ownship, idx1, idx2,
+            *detect_pairs(ownship, intruder, rpz, hpz, dtlookahead, idx1, idx2))
+
+
+class StateBased32(StateBased):
+    ''' State-based conflict detection with single-precision screening of
+        aircraft pairs, and double-precision evaluation of the candidate
+        pairs. '''
+    def __init__(self):
+        super().__init__()
+        self.precision = 'float32'
+
+    def reset(self):
+        super().reset()
+        self.precision = 'float32'
+
+
+def screen_float32(ownship, intruder, rpz, hpz, dtlookahead, i0, i1):
+    ''' Single-precision screening of the ownship aircraft [i0, i1) against
+        all intruders. Returns the index arrays idx1 and idx2 of all pairs
+        that can be in conflict or in loss of separation, sorted on
+        (idx1, idx2) and without ownship-ownship pairs.
+
+        The screen computes the smallest horizontal and vertical distance
+        within the (enlarged) lookahead time, assuming constant velocities.
+        The protected zone is enlarged with a margin that is much larger
+        than the single-precision rounding errors, so that no pair is
+        missed that is found by the double-precision detection. '''
+    f32 = np.float32
+    nint = len(intruder.lat)
+    if i1 <= i0 or nint == 0:
+        return np.array([], dtype=int), np.array([], dtype=int)
+
+    # Ownship variables as column vectors, intruder variables as row vectors
+    ownlat = np.radians(ownship.lat[i0:i1]).astype(f32).reshape(-1, 1)
+    ownlon = np.radians(ownship.lon[i0:i1]).astype(f32).reshape(-1, 1)
+    intlat = np.radians(intruder.lat).astype(f32)
+    intlon = np.radians(intruder.lon).astype(f32)
+
+    # Horizontal position and velocity of intruder relative to ownship
+    re = f32(6371000.)  # radius earth [m]
+    dlon = (intlon - ownlon + f32(np.pi)) % f32(2.0 * np.pi) - f32(np.pi)
+    dx = re * dlon * np.cos(f32(0.5) * (intlat + ownlat))
+    dy = re * (intlat - ownlat)
+    owntrk = np.radians(ownship.trk[i0:i1])
+    inttrk = np.radians(intruder.trk)
+    du = (intruder.gs * np.sin(inttrk)).astype(f32) - \
+        (ownship.gs[i0:i1] * np.sin(owntrk)).astype(f32).reshape(-1, 1)
+    dv = (intruder.gs * np.cos(inttrk)).astype(f32) - \
+        (ownship.gs[i0:i1] * np.cos(owntrk)).astype(f32).reshape(-1, 1)
+
+    # Enlarged lookahead time and protected zone
+    dtlook = (1.01 * np.maximum(0.0, dtlookahead[i0:i1]) + 1.0).astype(f32).reshape(-1, 1)
+    rpz = (1.01 * rpz + 100.0).astype(f32)
+    hpz = (1.01 * hpz + 1.0).astype(f32)
+    pairrpz = np.maximum(rpz[i0:i1].reshape(-1, 1), rpz)
+    pairhpz = np.maximum(hpz[i0:i1].reshape(-1, 1), hpz)
+
+    # Smallest horizontal distance within the lookahead time
+    dv2 = np.maximum(du * du + dv * dv, f32(1e-6))
+    tmin = np.clip(-(du * dx + dv * dy) / dv2, f32(0.0), dtlook)
+    dx += du * tmin
+    dy += dv * tmin
+    swhor = dx * dx + dy * dy < pairrpz * pairrpz
+
+    # Smallest vertical distance within the lookahead time
+    dalt = np.abs(intruder.alt.astype(f32) - ownship.alt[i0:i1].astype(f32).reshape(-1, 1))
+    dvs = np.abs(intruder.vs.astype(f32) - ownship.vs[i0:i1].astype(f32).reshape(-1, 1))
+    swver = dalt - dvs * dtlook < pairhpz
+
+    # Candidate pairs, without ownship-ownship pairs
+    idx1, idx2 = np.nonzero(swhor & swver)
+    idx1 += i0
+    notself = idx1 != idx2
+    return idx1[notself], idx2[notself]
+
+
+def detect_block(ownship, intruder, rpz, hpz, dtlookahead, i0, i1):
+    ''' Conflict detection for the block of ownship aircraft [i0, i1)
+        against all intruders. Only the entries of pairs that are in
+        conflict or in loss of separation are returned, in the same form as
+        the arguments of pairs2conflicts. '''
+    nint = len(intruder.lat)
+    idx1 = np.repeat(np.arange(i0, i1), nint)
+    idx2 = np.tile(np.arange(nint), i1 - i0)
+    # Avoid ownship-ownship detected conflicts
+    notself = idx1 != idx2
+    idx1, idx2 = idx1[notself], idx2[notself]
+
+    swconfl, swlos, qdr, dist, dcpa, tcpa, tinconf = \
+        detect_pairs(ownship, intruder, rpz, hpz, dtlookahead, idx1, idx2)
+
+    # Only keep the sparse results
+    keep = swconfl | swlos
+    return idx1[keep], idx2[keep], swconfl[keep], swlos[keep], qdr[keep], \
+        dist[keep], dcpa[keep], tcpa[keep], tinconf[keep]
+
+
+def detect_pairs(ownship, intruder, rpz, hpz, dtlookahead, idx1, idx2):
+    ''' State-based conflict detection for a selection of aircraft pairs.
+
+        This performs the same computations as StateBased.detect, but only
+        for the pairs (ownship[idx1], intruder[idx2]), instead of for the
+        full ntraf x ntraf matrix. Pairs where idx1 == idx2 should not be
+        passed.
+
+        Returns:
+        - swconfl: per pair conflict flag
+        - swlos: per pair loss of separation flag
+        - qdr, dist, dcpa, tcpa, tinconf: per pair CPA results
+    '''
+    # Horizontal conflict ------------------------------------------------------
+    # qdr and dist from ownship to intruder, same as geo.kwikqdrdist_matrix
+    re      = 6371000.  # radius earth [m]
+    dlat    = np.radians(intruder.lat[idx2] - ownship.lat[idx1])
+    dlon    = np.radians(((intruder.lon[idx2] - ownship.lon[idx1]) + 180) % 360 - 180)
+    cavelat = np.cos(np.radians(intruder.lat[idx2] + ownship.lat[idx1]) * 0.5)
+    dangle  = np.sqrt(dlat * dlat + (dlon * dlon) * (cavelat * cavelat))
+    # [m] (via [nm] to obtain exactly the same rounding as StateBased.detect)
+    dist    = re * dangle / nm * nm
+    qdr     = np.degrees(np.arctan2(dlon * cavelat, dlat)) % 360.
+
+    # Calculate horizontal closest point of approach (CPA)
+    qdrrad = np.radians(qdr)
+    dx = dist * np.sin(qdrrad)  # is pos j rel to i
+    dy = dist * np.cos(qdrrad)  # is pos j rel to i
+
+    # Relative velocity of intruder with respect to ownship
+    owntrkrad = np.radians(ownship.trk)
+    inttrkrad = np.radians(intruder.trk)
+    du = (intruder.gs * np.sin(inttrkrad))[idx2] - (ownship.gs * np.sin(owntrkrad))[idx1]
+    dv = (intruder.gs * np.cos(inttrkrad))[idx2] - (ownship.gs * np.cos(owntrkrad))[idx1]
+
+    dv2 = du * du + dv * dv
+    dv2 = np.where(np.abs(dv2) < 1e-6, 1e-6, dv2)  # limit lower absolute value
+    vrel = np.sqrt(dv2)
+
+    tcpa = -(du * dx + dv * dy) / dv2
+
+    # Calculate distance^2 at CPA (minimum distance^2)
+    dcpa2 = np.abs(dist * dist - tcpa * tcpa * dv2)
+
+    # Check for horizontal conflict
+    # RPZ can differ per aircraft, get the largest value per aircraft pair
+    rpz = np.maximum(rpz[idx1], rpz[idx2])
+    R2 = rpz * rpz
+    swhorconf = dcpa2 < R2  # conflict or not
+
+    # Calculate times of entering and leaving horizontal conflict
+    dxinhor = np.sqrt(np.maximum(0., R2 - dcpa2))  # half the distance travelled inzide zone
+    dtinhor = dxinhor / vrel
+
+    tinhor = np.where(swhorconf, tcpa - dtinhor, 1e8)  # Set very large if no conf
+    touthor = np.where(swhorconf, tcpa + dtinhor, -1e8)  # set very large if no conf
+
+    # Vertical conflict --------------------------------------------------------
+    # Vertical crossing of disk (-dh,+dh)
+    dalt = intruder.alt[idx2] - ownship.alt[idx1]
+    dvs = intruder.vs[idx2] - ownship.vs[idx1]
+    dvs = np.where(np.abs(dvs) < 1e-6, 1e-6, dvs)  # prevent division by zero
+
+    # Check for passing through each others zone
+    # hPZ can differ per aircraft, get the largest value per aircraft pair
+    hpz = np.maximum(hpz[idx1], hpz[idx2])
+    tcrosshi = (dalt + hpz) / -dvs
+    tcrosslo = (dalt - hpz) / -dvs
+    tinver = np.minimum(tcrosshi, tcrosslo)
+    toutver = np.maximum(tcrosshi, tcrosslo)
+
+    # Combine vertical and horizontal conflict----------------------------------
+    tinconf = np.maximum(tinver, tinhor)
+    toutconf = np.minimum(toutver, touthor)
+
+    swconfl = swhorconf * (tinconf <= toutconf) * (toutconf > 0.0) * \
+        (tinconf < dtlookahead[idx1])
+    swlos = (dist < rpz) * (np.abs(dalt) < hpz)
+
+    return swconfl, swlos, qdr, dist, np.sqrt(dcpa2), tcpa, tinconf
+
+
+def pairs2conflicts(ownship, idx1, idx2, swconfl, swlos, qdr, dist, dcpa, tcpa, tinconf):
+    ''' Convert the per-pair results of detect_pairs to the outputs of
+        ConflictDetection.detect. Pairs should be sorted on (idx1, idx2) to
+        obtain the same ordering as StateBased.detect. '''
+    # Ownship conflict flag and max tCPA
+    inconf = np.zeros(ownship.ntraf, dtype=bool)
+    inconf[idx1[swconfl]] = True
+    tcpamax = np.zeros(ownship.ntraf)
+    np.maximum.at(tcpamax, idx1[swconfl], tcpa[swconfl])
+
+    # Select conflicting pairs: each a/c gets their own record
+    acid = list(ownship.id)
+    confpairs = PairList(idx1[swconfl], idx2[swconfl], acid)
+    lospairs = PairList(idx1[swlos], idx2[swlos], acid)
+
+    return confpairs, lospairs, inconf, tcpamax, qdr[swconfl], dist[swconfl], \
+        dcpa[swconfl], tcpa[swconfl], tinconf[swconfl]
+
+
 try:
     from bluesky.traffic.asas import casas
 
@@ -1,5 +1,5 @@
 """ Autopilot Implementation."""
-from math import sin, cos, radians, sqrt, atan
+from math import sin, cos, radians
 import numpy as np
 try:
     from collections.abc import Collection
@@ -11,9 +11,10 @@ from bluesky import stack
 from bluesky.tools import geo
 from bluesky.tools.misc import degto180
 from bluesky.tools.position import txt2pos
-from bluesky.tools.aero import ft, nm, fpm, vcasormach2tas, vcas2tas, tas2cas, cas2tas, g0
+from bluesky.tools.aero import ft, nm, fpm, vcasormach2tas, vcas2tas, vtas2cas, g0
 from bluesky.core import Entity, timed_function
 from .route import Route
+from .routedb import routedb
 
 #debug
 from inspect import stack as callstack
@@ -69,8 +70,9 @@ class Autopilot(Entity, replaceable=True):
             # Currently used roll/bank angle [rad]
             self.turnphi = np.array([])  # [rad] bank angle setting of autopilot
 
-            # Route objects
+            # Route objects, and their slot in the route database
             self.route = []
+            self.routeslot = np.array([], dtype=int)
 
 
         self.idxreached = []    # List indices of aircraft who have reached their active waypoint
@@ -98,9 +100,10 @@ class Autopilot(Entity, replaceable=True):
         self.vsdef[-n:] = 1500. * fpm   # default vertical speed of autopilot
         self.bankdef[-n:] = np.radians(25.)
 
-        # Route objects
-        for ridx, acid in enumerate(bs.traf.id[-n:]):
-            self.route[ridx - n] = Route(acid)
+        # Route objects, of which the slots are allocated in one go
+        slots = routedb.newslots(n)
+        self.routeslot[-n:] = slots
+        self.route[-n:] = map(Route, bs.traf.id[-n:], slots.tolist())
 
         # Default ToC/ToD logic on
         self.swtoc[-n:] = True
@@ -118,158 +121,154 @@ class Autopilot(Entity, replaceable=True):
         # List of indices of aircraft which have reached their active waypoint
         self.idxreached = bs.traf.actwp.Reached(qdr, dist, bs.traf.actwp.flyby,
                                        bs.traf.actwp.flyturn,bs.traf.actwp.turnrad,bs.traf.actwp.swlastwp)
-        for i in self.idxreached:
 
-            # Save current wp speed for use on next leg when we pass this waypoint
-            # VNAV speeds are always FROM-speeds, so we accelerate/decellerate at the waypoint
-            # where this speed is specified, so we need to save it for use now
-            # before getting the new data for the next waypoint
-
-            # Get speed for next leg from the waypoint we pass now
-            bs.traf.actwp.spd[i]    = bs.traf.actwp.nextspd[i]
-            bs.traf.actwp.spdcon[i] = bs.traf.actwp.nextspd[i]
-
-            # Execute stack commands for the still active waypoint, which we pass
-            self.route[i].runactwpstack()
-
-            # If specified, use the given turn radius of passing wp for bank angle
-            if bs.traf.actwp.flyturn[i]:
-                if bs.traf.actwp.turnspd[i]>=0.:
-                    turnspd = bs.traf.actwp.turnspd[i]
-                else:
-                    turnspd = bs.traf.tas[i]
-
-                if bs.traf.actwp.turnrad[i] > 0.:
-                    self.turnphi[i] = atan(turnspd*turnspd/(bs.traf.actwp.turnrad[i]*nm*g0)) # [rad]
-                else:
-                    self.turnphi[i] = 0.0  # [rad] or leave untouched???
-
-            else:
-                self.turnphi[i] = 0.0  #[rad] or leave untouched???
-
-            # Get next wp, if there still is one
-            if not bs.traf.actwp.swlastwp[i]:
-                lat, lon, alt, bs.traf.actwp.nextspd[i], \
-                bs.traf.actwp.xtoalt[i], toalt, \
-                    bs.traf.actwp.xtorta[i], bs.traf.actwp.torta[i], \
-                    lnavon, flyby, flyturn, turnrad, turnspd,\
-                    bs.traf.actwp.next_qdr[i], bs.traf.actwp.swlastwp[i] =      \
-                    self.route[i].getnextwp()  # [m] note: xtoalt,nextaltco are in meters
-
-                bs.traf.actwp.nextturnlat[i], bs.traf.actwp.nextturnlon[i], \
-                bs.traf.actwp.nextturnspd[i], bs.traf.actwp.nextturnrad[i], \
-                bs.traf.actwp.nextturnidx[i] = self.route[i].getnextturnwp()
-
-            # Prevent trying to activate the next waypoint when it was already the last waypoint
-            else:
-                bs.traf.swlnav[i] = False
-                bs.traf.swvnav[i] = False
-                bs.traf.swvnavspd[i] = False
-                continue # Go to next a/c which reached its active waypoint
-
-            # End of route/no more waypoints: switch off LNAV using the lnavon
-            # switch returned by getnextwp
-            if not lnavon and bs.traf.swlnav[i]:
-                bs.traf.swlnav[i] = False
-                # Last wp: copy last wp values for alt and speed in autopilot
-                if bs.traf.swvnavspd[i] and bs.traf.actwp.nextspd[i]>= 0.0:
-                    bs.traf.selspd[i] = bs.traf.actwp.nextspd[i]
-
-            # In case of no LNAV, do not allow VNAV mode on its own
-            bs.traf.swvnav[i] = bs.traf.swvnav[i] and bs.traf.swlnav[i]
-
-            bs.traf.actwp.lat[i] = lat  # [deg]
-            bs.traf.actwp.lon[i] = lon  # [deg]
-            # 1.0 in case of fly by, else fly over
-            bs.traf.actwp.flyby[i] = int(flyby)
-
-            # Update qdr and turndist for this new waypoint for ComputeVNAV
-            qdr[i], distnmi = geo.qdrdist(bs.traf.lat[i], bs.traf.lon[i],
-                                          bs.traf.actwp.lat[i], bs.traf.actwp.lon[i])
-
-            #dist[i] = distnmi * nm
-            self.dist2wp[i] = distnmi*nm
-
-            bs.traf.actwp.curlegdir[i] = qdr[i]
-            bs.traf.actwp.curleglen[i] = self.dist2wp[i]
-
-            # User has entered an altitude for this waypoint
-            if alt >= -0.01: # positive alt on this waypoint means altitude constraint
-                bs.traf.actwp.nextaltco[i] = alt  # [m]
-                bs.traf.actwp.xtoalt[i] = 0.0
-            else:
-                bs.traf.actwp.nextaltco[i] = toalt  # [m]
-
-            #if not bs.traf.swlnav[i]:
-            #    bs.traf.actwp.spd[i] = -997.
-
-            # VNAV spd mode: use speed of this waypoint as commanded speed
-            # while passing waypoint and save next speed for passing next wp
-            # Speed is now from speed! Next speed is ready in wpdata
-            if bs.traf.swvnavspd[i] and bs.traf.actwp.spd[i]>= 0.0:
-                    bs.traf.selspd[i] = bs.traf.actwp.spd[i]
-
-            # Update turndist so ComputeVNAV works, is there a next leg direction or not?
-            if bs.traf.actwp.next_qdr[i] < -900.:
-                local_next_qdr = qdr[i]
-            else:
-                local_next_qdr = bs.traf.actwp.next_qdr[i]
-
-            # Get flyturn switches and data
-            bs.traf.actwp.flyturn[i]     = flyturn
-            bs.traf.actwp.turnrad[i]     = turnrad
-
-            # Pass on whether currently flyturn mode:
-            # at beginning of leg,c copy tonextwp to lastwp
-            # set next turn False
-            bs.traf.actwp.turnfromlastwp[i] = bs.traf.actwp.turntonextwp[i]
-            bs.traf.actwp.turntonextwp[i]   = False
-
-            # Keep both turning speeds: turn to leg and turn from leg
-            bs.traf.actwp.oldturnspd[i]  = bs.traf.actwp.turnspd[i] # old turnspd, turning by this waypoint
-            if bs.traf.actwp.flyturn[i]:
-                bs.traf.actwp.turnspd[i] = turnspd                  # new turnspd, turning by next waypoint
-            else:
-                bs.traf.actwp.turnspd[i] = -990.
-
-            # Calculate turn dist (and radius which we do not use) now for scalar variable [i]
-            bs.traf.actwp.turndist[i], dummy = \
-                bs.traf.actwp.calcturn(bs.traf.tas[i], self.bankdef[i],
-                                        qdr[i], local_next_qdr,turnrad)  # update turn distance for VNAV
-
-            # Reduce turn dist for reduced turnspd
-            if bs.traf.actwp.flyturn[i] and bs.traf.actwp.turnrad[i]<0.0 and bs.traf.actwp.turnspd[i]>=0.:
-                turntas = cas2tas(bs.traf.actwp.turnspd[i], bs.traf.alt[i])
-                bs.traf.actwp.turndist[i] = bs.traf.actwp.turndist[i]*turntas*turntas/(bs.traf.tas[i]*bs.traf.tas[i])
-
-            # VNAV = FMS ALT/SPD mode incl. RTA
-            self.ComputeVNAV(i, toalt, bs.traf.actwp.xtoalt[i], bs.traf.actwp.torta[i],
-                             bs.traf.actwp.xtorta[i])
-
-        
+        if len(self.idxreached) > 0:
+            self.switchwp(self.idxreached, qdr)
 
         # End of per waypoint i switching loop
         # Update qdr2wp with up-to-date qdr, now that we have checked passing wp
-        self.qdr2wp = qdr%360.
+        self.qdr2wp[:] = qdr%360.
 
         # Continuous guidance when speed constraint on active leg is in update-method
 
         # If still an RTA in the route and currently no speed constraint
-        for iac in np.where((bs.traf.actwp.torta > -99.)*(bs.traf.actwp.spdcon<0.0))[0]:
-            iwp = bs.traf.ap.route[iac].iactwp
-            if bs.traf.ap.route[iac].wprta[iwp]>-99.:
+        iac = np.where((bs.traf.actwp.torta > -99.)*(bs.traf.actwp.spdcon<0.0))[0]
+        if len(iac) > 0:
+            # Only for a/c flying to an RTA waypoint
+            wprta, wpxtorta = routedb.getactwp(self.routeslot[iac], 'wprta', 'wpxtorta')
+            iac, wpxtorta = iac[wprta > -99.], wpxtorta[wprta > -99.]
 
-                 # For all a/c flying to an RTA waypoint, recalculate speed more often
-                dist2go4rta = geo.kwikdist(bs.traf.lat[iac],bs.traf.lon[iac],
-                                           bs.traf.actwp.lat[iac],bs.traf.actwp.lon[iac])*nm \
-                               + bs.traf.ap.route[iac].wpxtorta[iwp] # last term zero for active wp rta
+            # For all a/c flying to an RTA waypoint, recalculate speed more often
+            dist2go4rta = geo.kwikdist(bs.traf.lat[iac],bs.traf.lon[iac],
+                                       bs.traf.actwp.lat[iac],bs.traf.actwp.lon[iac])*nm \
+                           + wpxtorta # last term zero for active wp rta
 
-                # Set bs.traf.actwp.spd to rta speed, if necessary
-                self.setspeedforRTA(iac,bs.traf.actwp.torta[iac],dist2go4rta)
+            # Set bs.traf.actwp.spd to rta speed, if necessary
+            self.setspeedforRTA(iac,bs.traf.actwp.torta[iac],dist2go4rta)
 
-                # If VNAV speed is on (by default coupled to VNAV), use it for speed guidance
-                if bs.traf.swvnavspd[iac] and bs.traf.actwp.spd[iac]>=0.0:
-                     bs.traf.selspd[iac] = bs.traf.actwp.spd[iac]
+            # If VNAV speed is on (by default coupled to VNAV), use it for speed guidance
+            iac = iac[bs.traf.swvnavspd[iac] & (bs.traf.actwp.spd[iac]>=0.0)]
+            bs.traf.selspd[iac] = bs.traf.actwp.spd[iac]
+
+    def switchwp(self, idx, qdr):
+        """
+        Shift waypoint data for all aircraft with indices idx, which have
+        reached their active waypoint, and compute the VNAV profile for the
+        new legs. qdr [deg] to the new active waypoints is updated in place.
+        """
+        actwp = bs.traf.actwp
+
+        # Save current wp speed for use on next leg when we pass this waypoint
+        # VNAV speeds are always FROM-speeds, so we accelerate/decellerate at the waypoint
+        # where this speed is specified, so we need to save it for use now
+        # before getting the new data for the next waypoint
+
+        # Get speed for next leg from the waypoint we pass now
+        actwp.spd[idx]    = actwp.nextspd[idx]
+        actwp.spdcon[idx] = actwp.nextspd[idx]
+
+        # If specified, use the given turn radius of passing wp for bank angle
+        turnspd = np.where(actwp.turnspd[idx] >= 0., actwp.turnspd[idx], bs.traf.tas[idx])
+        useturnrad = np.logical_and(actwp.flyturn[idx], actwp.turnrad[idx] > 0.)
+        turnphi = np.zeros(len(idx))  # [rad] or leave untouched???
+        turnphi[useturnrad] = np.arctan(turnspd[useturnrad] * turnspd[useturnrad] /
+                                        (actwp.turnrad[idx[useturnrad]] * nm * g0))  # [rad]
+        self.turnphi[idx] = turnphi
+
+        # Stack commands are executed per aircraft: for the still active
+        # waypoint which we pass, and for aircraft that landed on a runway
+        swlastwp = actwp.swlastwp[idx]
+        for i, lastwp in zip(idx, swlastwp):
+            self.route[i].runactwpstack()
+            if not lastwp and self.route[i].flag_landed_runway:
+                self.route[i].stacklandingcmds()
+
+        # Prevent trying to activate the next waypoint when it was already the last waypoint
+        ilast = idx[swlastwp]
+        bs.traf.swlnav[ilast] = False
+        bs.traf.swvnav[ilast] = False
+        bs.traf.swvnavspd[ilast] = False
+
+        # Get next wp for the other aircraft
+        idx = idx[~swlastwp]
+        slots = self.routeslot[idx]
+        lat, lon, alt, actwp.nextspd[idx], \
+        actwp.xtoalt[idx], toalt, \
+            actwp.xtorta[idx], actwp.torta[idx], \
+            lnavon, flyby, flyturn, turnrad, turnspd,\
+            actwp.next_qdr[idx], actwp.swlastwp[idx] =      \
+            Route.getnextwps(slots)  # [m] note: xtoalt,nextaltco are in meters
+
+        actwp.nextturnlat[idx], actwp.nextturnlon[idx], \
+        actwp.nextturnspd[idx], actwp.nextturnrad[idx], \
+        actwp.nextturnidx[idx] = Route.getnextturnwps(slots)
+
+        # End of route/no more waypoints: switch off LNAV using the lnavon
+        # switch returned by getnextwps
+        lnavoff = ~lnavon & bs.traf.swlnav[idx]
+        bs.traf.swlnav[idx[lnavoff]] = False
+        # Last wp: copy last wp values for alt and speed in autopilot
+        usespd = lnavoff & bs.traf.swvnavspd[idx] & (actwp.nextspd[idx] >= 0.0)
+        bs.traf.selspd[idx[usespd]] = actwp.nextspd[idx[usespd]]
+
+        # In case of no LNAV, do not allow VNAV mode on its own
+        bs.traf.swvnav[idx] = bs.traf.swvnav[idx] & bs.traf.swlnav[idx]
+
+        actwp.lat[idx] = lat  # [deg]
+        actwp.lon[idx] = lon  # [deg]
+        # 1.0 in case of fly by, else fly over
+        actwp.flyby[idx] = flyby
+
+        # Update qdr and turndist for this new waypoint for ComputeVNAV
+        qdr[idx], distnmi = geo.qdrdist(bs.traf.lat[idx], bs.traf.lon[idx],
+                                        actwp.lat[idx], actwp.lon[idx])
+
+        self.dist2wp[idx] = distnmi*nm
+
+        actwp.curlegdir[idx] = qdr[idx]
+        actwp.curleglen[idx] = self.dist2wp[idx]
+
+        # User has entered an altitude for this waypoint
+        altco = alt >= -0.01 # positive alt on this waypoint means altitude constraint
+        actwp.nextaltco[idx] = np.where(altco, alt, toalt)  # [m]
+        actwp.xtoalt[idx[altco]] = 0.0
+
+        # VNAV spd mode: use speed of this waypoint as commanded speed
+        # while passing waypoint and save next speed for passing next wp
+        # Speed is now from speed! Next speed is ready in wpdata
+        usespd = bs.traf.swvnavspd[idx] & (actwp.spd[idx] >= 0.0)
+        bs.traf.selspd[idx[usespd]] = actwp.spd[idx[usespd]]
+
+        # Update turndist so ComputeVNAV works, is there a next leg direction or not?
+        local_next_qdr = np.where(actwp.next_qdr[idx] < -900., qdr[idx], actwp.next_qdr[idx])
+
+        # Get flyturn switches and data
+        actwp.flyturn[idx]     = flyturn
+        actwp.turnrad[idx]     = turnrad
+
+        # Pass on whether currently flyturn mode:
+        # at beginning of leg,c copy tonextwp to lastwp
+        # set next turn False
+        actwp.turnfromlastwp[idx] = actwp.turntonextwp[idx]
+        actwp.turntonextwp[idx]   = False
+
+        # Keep both turning speeds: turn to leg and turn from leg
+        actwp.oldturnspd[idx] = actwp.turnspd[idx] # old turnspd, turning by this waypoint
+        actwp.turnspd[idx]    = np.where(flyturn, turnspd, -990.) # new turnspd, turning by next waypoint
+
+        # Calculate turn dist (and radius which we do not use) now for the new legs
+        actwp.turndist[idx], dummy = \
+            actwp.calcturn(bs.traf.tas[idx], self.bankdef[idx],
+                           qdr[idx], local_next_qdr, turnrad)  # update turn distance for VNAV
+
+        # Reduce turn dist for reduced turnspd
+        ired = idx[flyturn & (turnrad < 0.0) & (actwp.turnspd[idx] >= 0.)]
+        turntas = vcas2tas(actwp.turnspd[ired], bs.traf.alt[ired])
+        actwp.turndist[ired] = actwp.turndist[ired]*turntas*turntas/(bs.traf.tas[ired]*bs.traf.tas[ired])
+
+        # VNAV = FMS ALT/SPD mode incl. RTA
+        self.ComputeVNAV(idx, toalt, actwp.xtoalt[idx], actwp.torta[idx],
+                         actwp.xtorta[idx])
 
     def update(self):
         # FMS LNAV mode:
@@ -277,8 +276,8 @@ class Autopilot(Entity, replaceable=True):
         qdr, distinnm = geo.qdrdist(bs.traf.lat, bs.traf.lon,
                                     bs.traf.actwp.lat, bs.traf.actwp.lon)  # [deg][nm])
 
-        self.qdr2wp  = qdr
-        self.dist2wp = distinnm*nm  # Conversion to meters
+        self.qdr2wp[:]  = qdr
+        self.dist2wp[:] = distinnm*nm  # Conversion to meters
 
         # FMS route update and possibly waypoint shift. Note: qdr, dist2wp will be updated accordingly in case of wp switch
         self.update_fms(qdr, self.dist2wp) # Updates self.qdr2wp when necessary
@@ -309,28 +308,28 @@ class Autopilot(Entity, replaceable=True):
         #    to continue descending when you get into a conflict
         #    while descending to the destination (the last waypoint)
         #    Use 0.1 nm (185.2 m) circle in case turndist might be zero
-        self.swvnavvs = bs.traf.swvnav * np.where(bs.traf.swlnav, startdescorclimb,
-                                        self.dist2wp <= np.maximum(0.1*nm,bs.traf.actwp.turndist))
+        self.swvnavvs[:] = bs.traf.swvnav * np.where(bs.traf.swlnav, startdescorclimb,
+                                           self.dist2wp <= np.maximum(0.1*nm,bs.traf.actwp.turndist))
 
         # Recalculate V/S based on current altitude and distance to next alt constraint
         # How much time do we have before we need to descend?
         # Now done in ComputeVNAV
         # See ComputeVNAV for bs.traf.actwp.vs calculation
 
-        self.vnavvs  = np.where(self.swvnavvs, bs.traf.actwp.vs, self.vnavvs)
+        self.vnavvs[:] = np.where(self.swvnavvs, bs.traf.actwp.vs, self.vnavvs)
         #was: self.vnavvs  = np.where(self.swvnavvs, self.steepness * bs.traf.gs, self.vnavvs)
 
         # self.vs = np.where(self.swvnavvs, self.vnavvs, self.vsdef * bs.traf.limvs_flag)
         # for VNAV use fixed V/S and change start of descent
         selvs = np.where(abs(bs.traf.selvs) > 0.1, bs.traf.selvs, self.vsdef) # m/s
-        self.vs  = np.where(self.swvnavvs, self.vnavvs, selvs)
-        self.alt = np.where(self.swvnavvs, bs.traf.actwp.nextaltco, bs.traf.selalt)
+        self.vs[:]  = np.where(self.swvnavvs, self.vnavvs, selvs)
+        self.alt[:] = np.where(self.swvnavvs, bs.traf.actwp.nextaltco, bs.traf.selalt)
 
         # When descending or climbing in VNAV also update altitude command of select/hold mode
-        bs.traf.selalt = np.where(self.swvnavvs,bs.traf.actwp.nextaltco,bs.traf.selalt)
+        bs.traf.selalt[:] = np.where(self.swvnavvs,bs.traf.actwp.nextaltco,bs.traf.selalt)
 
         # LNAV commanded track angle
-        self.trk = np.where(bs.traf.swlnav, self.qdr2wp, self.trk)
+        self.trk[:] = np.where(bs.traf.swlnav, self.qdr2wp, self.trk)
 
         # FMS speed guidance: anticipate accel/decel distance for next leg or turn
 
@@ -340,7 +339,8 @@ class Autopilot(Entity, replaceable=True):
         # use the turn speed
 
         # Is turn speed specified and are we not already slow enough? We only decelerate for turns, not accel.
-        turntas       = np.where(bs.traf.actwp.nextturnspd>0.0, vcas2tas(bs.traf.actwp.nextturnspd, bs.traf.alt),
+        atmos         = bs.traf.derived.atmos(bs.traf.alt)
+        turntas       = np.where(bs.traf.actwp.nextturnspd>0.0, vcas2tas(bs.traf.actwp.nextturnspd, bs.traf.alt, atmos),
                                  -1.0+0.*bs.traf.tas)
         # Switch is now whether the aircraft has any turn waypoints
         swturnspd     = bs.traf.actwp.nextturnidx > 0
@@ -356,7 +356,7 @@ class Autopilot(Entity, replaceable=True):
         # Note that because nextspd comes from the stack, and can be either a mach number or
         # a calibrated airspeed, it can only be converted from Mach / CAS [kts] to TAS [m/s]
         # once the altitude is known.
-        nexttas = vcasormach2tas(bs.traf.actwp.nextspd, bs.traf.alt)
+        nexttas = vcasormach2tas(bs.traf.actwp.nextspd, bs.traf.alt, atmos)
 
 #        tasdiff   = (nexttas - bs.traf.tas)*(bs.traf.actwp.spd>=0.) # [m/s]
 
@@ -368,12 +368,12 @@ class Autopilot(Entity, replaceable=True):
         qdrturn, dist2turn = geo.qdrdist(bs.traf.lat, bs.traf.lon,
                                         bs.traf.actwp.nextturnlat, bs.traf.actwp.nextturnlon)
 
-        self.qdrturn = qdrturn
+        self.qdrturn[:] = qdrturn
         dist2turn = dist2turn * nm
 
         # Where we don't have a turn waypoint, as in turn idx is negative, then put distance
         # as Earth circumference.
-        self.dist2turn = np.where(bs.traf.actwp.nextturnidx > 0, dist2turn, 40075000)
+        self.dist2turn[:] = np.where(bs.traf.actwp.nextturnidx > 0, dist2turn, 40075000)
 
         # Check also whether VNAVSPD is on, if not, SPD SEL has override for next leg
         # and same for turn logic
@@ -384,7 +384,7 @@ class Autopilot(Entity, replaceable=True):
                                         swturnspd*bs.traf.swvnavspd*bs.traf.swvnav*bs.traf.swlnav
 
         # Hold turn mode can only be switched on here, cannot be switched off here (happeps upon passing wp)
-        bs.traf.actwp.turntonextwp = bs.traf.swlnav*np.logical_or(bs.traf.actwp.turntonextwp,useturnspd)
+        bs.traf.actwp.turntonextwp[:] = bs.traf.swlnav*np.logical_or(bs.traf.actwp.turntonextwp,useturnspd)
 
         # Which CAS/Mach do we have to keep? VNAV, last turn or next turn?
         oncurrentleg = (abs(degto180(bs.traf.trk - qdr)) < 2.0) # [deg]
@@ -392,23 +392,23 @@ class Autopilot(Entity, replaceable=True):
 
         # Avoid using old turning speeds when turning of this leg to the next leg
         # by disabling (old) turningspd when on leg
-        bs.traf.actwp.oldturnspd = np.where(oncurrentleg*(bs.traf.actwp.oldturnspd>0.), -998.,
-                                            bs.traf.actwp.oldturnspd)
+        bs.traf.actwp.oldturnspd[:] = np.where(oncurrentleg*(bs.traf.actwp.oldturnspd>0.), -998.,
+                                               bs.traf.actwp.oldturnspd)
 
         # turnfromlastwp can only be switched off here, not on (latter happens upon passing wp)
-        bs.traf.actwp.turnfromlastwp = np.logical_and(bs.traf.actwp.turnfromlastwp,inoldturn)
+        bs.traf.actwp.turnfromlastwp[:] = np.logical_and(bs.traf.actwp.turnfromlastwp,inoldturn)
 
         # Select speed: turn sped, next speed constraint, or current speed constraint
-        bs.traf.selspd = np.where(useturnspd,bs.traf.actwp.nextturnspd,
-                                  np.where(usenextspdcon, bs.traf.actwp.nextspd,
-                                           np.where((bs.traf.actwp.spdcon>=0)*bs.traf.swvnavspd,bs.traf.actwp.spd,
-                                                                            bs.traf.selspd)))
+        bs.traf.selspd[:] = np.where(useturnspd,bs.traf.actwp.nextturnspd,
+                                     np.where(usenextspdcon, bs.traf.actwp.nextspd,
+                                              np.where((bs.traf.actwp.spdcon>=0)*bs.traf.swvnavspd,bs.traf.actwp.spd,
+                                                                               bs.traf.selspd)))
 
         # Temporary override when still in old turn
-        bs.traf.selspd = np.where(inoldturn*(bs.traf.actwp.oldturnspd>0.)*bs.traf.swvnavspd*bs.traf.swvnav*bs.traf.swlnav,
-                                  bs.traf.actwp.oldturnspd,bs.traf.selspd)
+        bs.traf.selspd[:] = np.where(inoldturn*(bs.traf.actwp.oldturnspd>0.)*bs.traf.swvnavspd*bs.traf.swvnav*bs.traf.swlnav,
+                                     bs.traf.actwp.oldturnspd,bs.traf.selspd)
 
-        self.inturn = np.logical_or(useturnspd,inoldturn)
+        self.inturn[:] = np.logical_or(useturnspd,inoldturn)
 
         #debug if inoldturn[0]:
         #debug     print("inoldturn bs.traf.trk =",bs.traf.trk[0],"qdr =",qdr)
@@ -422,7 +422,7 @@ class Autopilot(Entity, replaceable=True):
         #debug     print("no speed given")
 
         # Below crossover altitude: CAS=const, above crossover altitude: Mach = const
-        self.tas = vcasormach2tas(bs.traf.selspd, bs.traf.alt)
+        self.tas[:] = vcasormach2tas(bs.traf.selspd, bs.traf.alt, atmos)
 
     def ComputeVNAV(self, idx, toalt, xtoalt, torta, xtorta):
         """
@@ -451,20 +451,23 @@ class Autopilot(Entity, replaceable=True):
         Output if this function:
         self.dist2vs = distance 2 next waypoint where climb/descent needs to activated
         bs.traf.actwp.vs =  V/S to be used during climb/descent part, so when dist2wp<dist2vs [m] (to next waypoint)
+
+        idx can be a single aircraft index, or an array of aircraft indices with
+        arrays of the same length for toalt, xtoalt, torta and xtorta.
         """
 
-        #print ("ComputeVNAV for",bs.traf.id[idx],":",toalt/ft,"ft  ",xtoalt/nm,"nm")
-        #print("Called by",callstack()[1].function)
+        idx = np.atleast_1d(idx)
+        toalt, xtoalt, torta, xtorta = (np.broadcast_to(np.asarray(v, dtype=float), idx.shape)
+                                        for v in (toalt, xtoalt, torta, xtorta))
 
         # Check  whether active waypoint speed needs to be adjusted for RTA
         # sets bs.traf.actwp.spd, if necessary
         # debug print("xtorta+legdist =",(xtorta+legdist)/nm)
-        self.setspeedforRTA(idx, torta, xtorta + self.dist2wp[idx])  # all scalar
+        self.setspeedforRTA(idx, torta, xtorta + self.dist2wp[idx])
 
-        # Check if there is a target altitude and VNAV is on, else return doing nothing
-        if toalt < 0 or not bs.traf.swvnav[idx]:
-            self.dist2vs[idx] = -999999. #dist to next wp will never be less than this, so VNAV will do nothing
-            return
+        # Check if there is a target altitude and VNAV is on, else do nothing
+        vnav = (toalt >= 0) & bs.traf.swvnav[idx]
+        self.dist2vs[idx[~vnav]] = -999999. #dist to next wp will never be less than this, so VNAV will do nothing
 
         # So: somewhere there is an altitude constraint ahead
         # Compute proper values for bs.traf.actwp.nextaltco, self.dist2vs, self.alt, bs.traf.actwp.vs
@@ -502,119 +505,126 @@ class Autopilot(Entity, replaceable=True):
         # - Descend at the latest when necessary for next altitude constraint
         #   which can be many waypoints beyond current actual waypoint
         epsalt = 2.*ft # deadzone
-        if bs.traf.alt[idx] > toalt + epsalt:
-            # Stop potential current climb (e.g. due to not making it to previous altco)
-            # then stop immediately, as in: do not make it worse.
-            if bs.traf.vs[idx]>0.0001:
-                self.vnavvs[idx] = 0.0
-                self.alt[idx] = bs.traf.alt[idx]
-                if bs.traf.swvnav[idx]:
-                    bs.traf.selalt[idx] = bs.traf.alt[idx]
-
-            # Descent modes: VNAV (= swtod/Top of Descent logic) or aiming at next alt constraint
-
-            # Calculate max allowed altitude at next wp (above toalt)
-            bs.traf.actwp.nextaltco[idx] = toalt  # [m] next alt constraint
-            bs.traf.actwp.xtoalt[idx]    = xtoalt # [m] distance to next alt constraint measured from next waypoint
-
-
-            # VNAV ToD logic
-            if self.swtod[idx]:
-                # Get distance to waypoint
-                self.dist2wp[idx] = nm*geo.kwikdist(bs.traf.lat[idx], bs.traf.lon[idx],
-                                                 bs.traf.actwp.lat[idx],
-                                                 bs.traf.actwp.lon[idx])  # was not always up to date, so update first
-
-                # Distance to next waypoint where we need to start descent (top of descent) [m]
-                descdist = abs(bs.traf.alt[idx] - toalt) / self.steepness  # [m] required length for descent
-                self.dist2vs[idx] = descdist - xtoalt   # [m] part of that length on this leg
-
-                #print(bs.traf.id[idx],"traf.alt =",bs.traf.alt[idx]/ft,"ft toalt = ",toalt/ft,"ft descdist =",descdist/nm,"nm")
-                #print ("d2wp = ",self.dist2wp[idx]/nm,"nm d2vs = ",self.dist2vs[idx]/nm,"nm")
-                #print("xtoalt =",xtoalt/nm,"nm descdist =",descdist/nm,"nm")
-
-                # Exceptions: Descend now? Or never on this leg?
-                if self.dist2wp[idx] < self.dist2vs[idx]:  # Urgent descent, we're late![m]
-                    # Descend now using whole remaining distance on leg to reach altitude
-                    self.alt[idx] = bs.traf.actwp.nextaltco[idx]  # dial in altitude of next waypoint as calculated
-                    t2go = self.dist2wp[idx]/max(0.01,bs.traf.gs[idx])
-                    bs.traf.actwp.vs[idx] = (bs.traf.alt[idx]-toalt)/max(0.01,t2go)
-
-                elif xtoalt<descdist: # Not even descending is needed at next waypoint
-                    # Top of decent needs to be on this leg, as next wp is in descent
-                    bs.traf.actwp.vs[idx] = -abs(self.steepness) * (bs.traf.gs[idx] +
-                                                                    (bs.traf.gs[idx] < 0.2 * bs.traf.tas[idx]) *
-                                                                    bs.traf.tas[idx])
-
-                else:
-                    # else still level
-                    bs.traf.actwp.vs[idx] = 0.0
+        descent = vnav & (bs.traf.alt[idx] > toalt + epsalt)
+        climb = vnav & ~descent & (bs.traf.alt[idx] < toalt - 10. * ft)
+
+        # VNAV descent mode
+        i = idx[descent]
+        toalt_i, xtoalt_i = toalt[descent], xtoalt[descent]
+
+        # Stop potential current climb (e.g. due to not making it to previous altco)
+        # then stop immediately, as in: do not make it worse.
+        istop = i[bs.traf.vs[i] > 0.0001]
+        self.vnavvs[istop] = 0.0
+        self.alt[istop] = bs.traf.alt[istop]
+        bs.traf.selalt[istop] = bs.traf.alt[istop]
+
+        # Descent modes: VNAV (= swtod/Top of Descent logic) or aiming at next alt constraint
+
+        # Calculate max allowed altitude at next wp (above toalt)
+        bs.traf.actwp.nextaltco[i] = toalt_i  # [m] next alt constraint
+        bs.traf.actwp.xtoalt[i]    = xtoalt_i # [m] distance to next alt constraint measured from next waypoint
+
+        # VNAV ToD logic
+        tod = self.swtod[i].astype(bool)
+        itod, toalt_t, xtoalt_t = i[tod], toalt_i[tod], xtoalt_i[tod]
+
+        # Get distance to waypoint
+        self.dist2wp[itod] = nm*geo.kwikdist(bs.traf.lat[itod], bs.traf.lon[itod],
+                                             bs.traf.actwp.lat[itod],
+                                             bs.traf.actwp.lon[itod])  # was not always up to date, so update first
+
+        # Distance to next waypoint where we need to start descent (top of descent) [m]
+        descdist = np.abs(bs.traf.alt[itod] - toalt_t) / self.steepness  # [m] required length for descent
+        self.dist2vs[itod] = descdist - xtoalt_t   # [m] part of that length on this leg
+
+        # Exceptions: Descend now? Or never on this leg?
+        late = self.dist2wp[itod] < self.dist2vs[itod]  # Urgent descent, we're late![m]
+        ondescent = ~late & (xtoalt_t < descdist)  # Not even descending is needed at next waypoint
+
+        # Descend now using whole remaining distance on leg to reach altitude
+        ilate = itod[late]
+        self.alt[ilate] = bs.traf.actwp.nextaltco[ilate]  # dial in altitude of next waypoint as calculated
+        t2go = self.dist2wp[ilate]/np.maximum(0.01,bs.traf.gs[ilate])
+        bs.traf.actwp.vs[ilate] = (bs.traf.alt[ilate]-toalt_t[late])/np.maximum(0.01,t2go)
+
+        # Top of decent needs to be on this leg, as next wp is in descent
+        ides = itod[ondescent]
+        bs.traf.actwp.vs[ides] = -abs(self.steepness) * (bs.traf.gs[ides] +
+                                                        (bs.traf.gs[ides] < 0.2 * bs.traf.tas[ides]) *
+                                                        bs.traf.tas[ides])
+
+        # else still level
+        bs.traf.actwp.vs[itod[~late & ~ondescent]] = 0.0
+
+        # We are higher but swtod = False, so there is no ToD descent logic, simply aim at next altco
+        inotod = i[~tod]
+        steepness = (bs.traf.alt[inotod]-bs.traf.actwp.nextaltco[inotod]) / \
+                    (np.maximum(0.01,self.dist2wp[inotod]+xtoalt_i[~tod]))
+        bs.traf.actwp.vs[inotod] = -np.abs(steepness) * (bs.traf.gs[inotod] +
+                                                         (bs.traf.gs[inotod] < 0.2 * bs.traf.tas[inotod]) *
+                                                         bs.traf.tas[inotod])
 
-            else:
-                # We are higher but swtod = False, so there is no ToD descent logic, simply aim at next altco
-                steepness = (bs.traf.alt[idx]-bs.traf.actwp.nextaltco[idx])/(max(0.01,self.dist2wp[idx]+xtoalt))
-                bs.traf.actwp.vs[idx] = -abs(steepness) * (bs.traf.gs[idx] +
-                                                           (bs.traf.gs[idx] < 0.2 * bs.traf.tas[idx]) * bs.traf.tas[
-                                                               idx])
         # VNAV climb mode: climb as soon as possible (T/C logic)
-        elif bs.traf.alt[idx] < toalt - 10. * ft:
-            # Stop potential current descent (e.g. due to not making it to previous altco)
-            # then stop immediately, as in: do not make it worse.
-            if bs.traf.vs[idx] < -0.0001:
-                self.vnavvs[idx] = 0.0
-                self.alt[idx] = bs.traf.alt[idx]
-                if bs.traf.swvnav[idx]:
-                    bs.traf.selalt[idx] = bs.traf.alt[idx]
-
-            # Altitude we want to climb to: next alt constraint in our route (could be further down the route)
-            bs.traf.actwp.nextaltco[idx] = toalt   # [m]
-            bs.traf.actwp.xtoalt[idx]    = xtoalt  # [m] distance to next alt constraint measured from next waypoint
-            self.alt[idx]          = bs.traf.actwp.nextaltco[idx]  # dial in altitude of next waypoint as calculated
-            self.dist2vs[idx]      = 99999. #[m] Forces immediate climb as current distance to next wp will be less
-
-
-            t2go = max(0.1, self.dist2wp[idx]+xtoalt) / max(0.01, bs.traf.gs[idx])
-            if self.swtoc[idx]:
-                steepness = self.steepness # default steepness
-            else:
-                steepness = (bs.traf.alt[idx] - bs.traf.actwp.nextaltco[idx]) / (max(0.01, self.dist2wp[idx] + xtoalt))
+        i = idx[climb]
+        xtoalt_i = xtoalt[climb]
+
+        # Stop potential current descent (e.g. due to not making it to previous altco)
+        # then stop immediately, as in: do not make it worse.
+        istop = i[bs.traf.vs[i] < -0.0001]
+        self.vnavvs[istop] = 0.0
+        self.alt[istop] = bs.traf.alt[istop]
+        bs.traf.selalt[istop] = bs.traf.alt[istop]
+
+        # Altitude we want to climb to: next alt constraint in our route (could be further down the route)
+        bs.traf.actwp.nextaltco[i] = toalt[climb]   # [m]
+        bs.traf.actwp.xtoalt[i]    = xtoalt_i  # [m] distance to next alt constraint measured from next waypoint
+        self.alt[i]          = bs.traf.actwp.nextaltco[i]  # dial in altitude of next waypoint as calculated
+        self.dist2vs[i]      = 99999. #[m] Forces immediate climb as current distance to next wp will be less
+
+        t2go = np.maximum(0.1, self.dist2wp[i]+xtoalt_i) / np.maximum(0.01, bs.traf.gs[i])
+        steepness = np.where(self.swtoc[i], self.steepness, # default steepness
+                             (bs.traf.alt[i] - bs.traf.actwp.nextaltco[i]) /
+                             (np.maximum(0.01, self.dist2wp[i] + xtoalt_i)))
+
+        bs.traf.actwp.vs[i]  = np.maximum(steepness*bs.traf.gs[i],
+                                          (bs.traf.actwp.nextaltco[i] - bs.traf.alt[i]) / t2go) # [m/s]
 
-            bs.traf.actwp.vs[idx]  = np.maximum(steepness*bs.traf.gs[idx],
-                                       (bs.traf.actwp.nextaltco[idx] - bs.traf.alt[idx]) / t2go) # [m/s]
         # Level leg: never start V/S
-        else:
-            self.dist2vs[idx] = -999.  # [m]
-
-        return
+        self.dist2vs[idx[vnav & ~descent & ~climb]] = -999.  # [m]
 
     def setspeedforRTA(self, idx, torta, xtorta):
-        #debug print("setspeedforRTA called, torta,xtorta =",torta,xtorta/nm)
-
-        # Calculate required CAS to meet RTA
-        # for aircraft nr. idx (scalar)
-        if torta < -90. : # -999 signals there is no RTA defined in remainder of route
-            return False
+        """ Calculate required CAS to meet RTA for the aircraft in idx
+            (array or scalar), and set bs.traf.actwp.spd to it when there is
+            no speed constraint and VNAV speed is on.
+            Returns the required CAS, or -999 when there is no RTA or it is
+            no longer possible. """
+        idx = np.atleast_1d(idx)
+        torta, xtorta = np.broadcast_to(torta, idx.shape), np.broadcast_to(xtorta, idx.shape)
+        rtacas = np.full(len(idx), -999.)
+
+        # -999 signals there is no RTA defined in remainder of route
+        deltime = torta - bs.sim.simt # Remaining time to next RTA [s] in simtime
+        inrta = (torta >= -90.) & (deltime > 0) # Still possible?
+        if not np.any(inrta):
+            return rtacas
 
-        deltime = torta-bs.sim.simt # Remaining time to next RTA [s] in simtime
-        if deltime>0: # Still possible?
-            gsrta = calcvrta(bs.traf.gs[idx], xtorta,
-                             deltime, bs.traf.perf.axmax[idx])
+        i = idx[inrta]
+        gsrta = calcvrta(bs.traf.gs[i], xtorta[inrta], deltime[inrta],
+                         bs.traf.perf.axmax[i])
 
-            # Subtract tail wind speed vector
-            tailwind = (bs.traf.windnorth[idx]*bs.traf.gsnorth[idx] + bs.traf.windeast[idx]*bs.traf.gseast[idx]) / \
-                        bs.traf.gs[idx]
+        # Subtract tail wind speed vector
+        tailwind = (bs.traf.windnorth[i]*bs.traf.gsnorth[i] + bs.traf.windeast[i]*bs.traf.gseast[i]) / \
+                    bs.traf.gs[i]
 
-            # Convert to CAS
-            rtacas = tas2cas(gsrta-tailwind,bs.traf.alt[idx])
+        # Convert to CAS
+        rtacas[inrta] = vtas2cas(gsrta-tailwind,bs.traf.alt[i])
 
-            # Performance limits on speed will be applied in traf.update
-            if bs.traf.actwp.spdcon[idx]<0. and bs.traf.swvnavspd[idx]:
-                bs.traf.actwp.spd[idx] = rtacas
-                #print("setspeedforRTA: xtorta =",xtorta)
+        # Performance limits on speed will be applied in traf.update
+        setspd = (bs.traf.actwp.spdcon[i]<0.) & bs.traf.swvnavspd[i]
+        bs.traf.actwp.spd[i[setspd]] = rtacas[inrta][setspd]
 
-            return rtacas
-        else:
-            return False
+        return rtacas
 
     @stack.command(name='ALT')
     def selaltcmd(self, idx: 'acid', alt: 'alt', vspd: 'vspd'=None):
@@ -852,7 +862,7 @@ def calcvrta(v0, dx, deltime, trafax):
     # Calculate required target ground speed v1 [m/s]
     # to meet an RTA at this leg
     #
-    # Arguments are scalar
+    # Arguments are scalars or arrays
     #
     #   v0      = current ground speed [m/s]
     #   dx      = leg distance [m]
@@ -860,13 +870,10 @@ def calcvrta(v0, dx, deltime, trafax):
     #   trafax  = horizontal acceleration [m/s2]
 
     # Set up variables
-    dt = deltime
+    v0, dx, dt, trafax = np.broadcast_arrays(v0, dx, deltime, trafax)
 
     # Do we need decelerate or accelerate
-    if v0 * dt < dx:
-        ax = max(0.01,abs(trafax))
-    else:
-        ax = -max(0.01,abs(trafax))
+    ax = np.where(v0 * dt < dx, 1.0, -1.0) * np.maximum(0.01, np.abs(trafax))
 
     # Solve 2nd order equation for v1 which results from:
     #
@@ -885,33 +892,25 @@ def calcvrta(v0, dx, deltime, trafax):
     D = b * b - 4. * a * c
 
     # Possibly two v1 solutions
-    vlst = []
+    sqrtD = np.sqrt(np.maximum(0., D))
+    x1 = (-b - sqrtD) / (2. * a)
+    x2 = (-b + sqrtD) / (2. * a)
 
-    if D >= 0.:
-        x1 = (-b - sqrt(D)) / (2. * a)
-        x2 = (-b + sqrt(D)) / (2. * a)
+    # Check solutions for v1
+    # Physically possible: both dtacc and dtconst >0
+    dtacc1 = (x1 - v0) / ax
+    dtacc2 = (x2 - v0) / ax
+    valid1 = (D >= 0.) & (dtacc1 >= 0) & (dt - dtacc1 >= 0.)
+    valid2 = (D >= 0.) & (dtacc2 >= 0) & (dt - dtacc2 >= 0.)
 
-        # Check solutions for v1
-        for v1 in (x1, x2):
-            dtacc = (v1 - v0) / ax
-            dtconst = dt - dtacc
-
-            # Physically possible: both dtacc and dtconst >0
-            if dtacc >= 0 and dtconst >= 0.:
-                vlst.append(v1)
-
-    if len(vlst) == 0:  # Not possible? Maybe borderline, so then simple calculation
-        vtarg = dx/dt
+    # Not possible? Maybe borderline, so then simple calculation
+    vtarg = np.where(valid1, x1, np.where(valid2, x2, dx / dt))
 
     # Just in case both would be valid, take closest to v0
-    elif len(vlst) == 2:
-        vtarg = vlst[int(abs(vlst[1] - v0) < abs(vlst[0] - v0))]
-
-    # Normal case is one solution
-    else:
-        vtarg = vlst[0]
+    both = valid1 & valid2
+    vtarg[both] = np.where(np.abs(x2 - v0) < np.abs(x1 - v0), x2, x1)[both]
 
-    return vtarg
+    return vtarg if vtarg.ndim else vtarg.item()
 
 def distaccel(v0,v1,axabs):
     """Calculate distance travelled during acceleration/deceleration
@@ -5,93 +5,94 @@ KL204 ATALT FL100 KL204 SPD 350
 import numpy as np
 import bluesky as bs
 from bluesky import stack
+from bluesky.core.trafficarrays import TrafficArrays, newcapacity
 from bluesky.tools.geo import qdrdist
 
 # Enumerated condtion types
 alttype, spdtype, postype = 0, 1, 2
 
 
-class Condition():
+class Condition(TrafficArrays):
+    """ Table of conditional commands.
+
+        Conditions are stored in arrays, of which the first ncond elements
+        are in use, and refer to their aircraft by index. These indices are
+        updated when aircraft are deleted, and the conditions of deleted
+        aircraft are removed. """
+
+    # Names of the condition table arrays
+    condvars = ('acidx', 'condtype', 'target', 'lastdif', 'lat', 'lon', 'cmd')
+
     def __init__(self):
+        super().__init__()
 
         self.ncond = 0  # Number of conditions
 
-        self.id       = []                         # Id of aircraft of condition
-        self.condtype = np.array([],dtype=int)     # Condition type (0=alt,1=spd)
+        self.acidx    = np.array([],dtype=int)     # Index of aircraft of condition
+        self.condtype = np.array([],dtype=int)     # Condition type (0=alt,1=spd,2=pos)
         self.target   = np.array([],dtype=float)   # Target value (alt,speed,distance[nm])
         self.lastdif  = np.array([],dtype=float)   # Difference during last update
-        self.posdata  = []                         # Data for postype: tuples lat[deg],lon[deg] of ref position
-        self.cmd      = []                         # Commands to be issued
+        self.lat      = np.array([],dtype=float)   # [deg] Latitude of ref position (postype)
+        self.lon      = np.array([],dtype=float)   # [deg] Longitude of ref position (postype)
+        self.cmd      = np.array([],dtype=object)  # Commands to be issued
 
     def update(self):
         if self.ncond==0:
             return
 
-        # Update indices based on list of id's
-        acidxlst = np.array(bs.traf.id2idx(self.id))
-        if len(acidxlst)>0:
-            idelcond = sorted(list(np.where(acidxlst<0)[0]))
-            for i in idelcond[::-1]:
-                del (self.id[i])
-                self.condtype = np.delete(self.condtype, i)
-                self.target = np.delete(self.target, i)
-                self.lastdif = np.delete(self.lastdif, i)
-                del self.posdata[i]
-                del self.cmd[i]
-
-            self.ncond = len(self.id)
-            if self.ncond==0:
-                return
-            acidxlst = np.array(bs.traf.id2idx(self.id))
-
-        # Check condition types
-        actdist = np.ones(self.ncond)*999e9  # Invalid number which never triggers anything is extremely large
-        for j in range(self.ncond):
-            if self.condtype[j] == postype:
-                qdr,dist = qdrdist(bs.traf.lat[acidxlst[j]],bs.traf.lon[acidxlst[j]],self.posdata[j][0],self.posdata[j][1])
-                actdist[j] = dist # [nm]
-
         # Get relevant actual value using index list as index to numpy arrays
-        self.actual = (self.condtype == alttype) * bs.traf.alt[acidxlst] + \
-                      (self.condtype == spdtype) * bs.traf.cas[acidxlst] + \
-                      (self.condtype == postype) * actdist
+        n        = self.ncond
+        acidx    = self.acidx[:n]
+        condtype = self.condtype[:n]
+        actual   = np.where(condtype == alttype, bs.traf.alt[acidx], bs.traf.cas[acidx])
 
-        # Compare sign of actual difference with sign of last difference
-        actdif       = self.target - self.actual
+        # Distances [nm] to the reference positions of all position conditions
+        ipos = np.flatnonzero(condtype == postype)
+        if len(ipos) > 0:
+            qdr, actual[ipos] = qdrdist(bs.traf.lat[acidx[ipos]], bs.traf.lon[acidx[ipos]],
+                                        self.lat[ipos], self.lon[ipos])
 
-        # Make sorted arrya of indices of true conditions and their conditional commands
-        idxtrue      = sorted(list(np.where(actdif*self.lastdif <= 0.0)[0]))# Sign changed
-        self.lastdif = actdif
-        if idxtrue==None or len(idxtrue)==0:
+        # Compare sign of actual difference with sign of last difference
+        actdif    = self.target[:n] - actual
+        istrue    = actdif * self.lastdif[:n] <= 0.0  # Sign changed
+        istrue   &= ~bs.traf.deleted[acidx]  # Skip aircraft queued for deletion
+        self.lastdif[:n] = actdif
+        if not istrue.any():
             return
 
-
-        # Execute commands found to have true condition
-        for i in idxtrue:
-            if i>=0:
-                stack.stack(self.cmd[i])
-                # debug
-                # stack.stack(" ECHO Conditional command issued: "+self.cmd[i])
-
-        # Delete executed commands to clean up arrays and lists
-        # from highest index to lowest for consistency
-        for i in idxtrue[::-1]:
-            if i>=0:
-                del self.id[i]
-                self.condtype = np.delete(self.condtype,i)
-                self.target   = np.delete(self.target,i)
-                self.lastdif  = np.delete(self.lastdif,i)
-                del self.posdata[i]
-                del self.cmd[i]
-
-        # Adjust number of conditions
-        self.ncond = len(self.id)
-
-        if self.ncond!=len(self.cmd):
-            print ("self.ncond=",self.ncond)
-            print ("self.cmd=",self.cmd)
-            print ("traffic/conditional.py: self.delcondition: invalid condition array size")
-        return
+        # Execute commands found to have true condition, in order of addition
+        for cmd in self.cmd[:n][istrue]:
+            stack.stack(cmd)
+            # debug
+            # stack.stack(" ECHO Conditional command issued: "+cmd)
+
+        # Delete executed commands
+        self.compact(~istrue)
+
+    def compact(self, keep):
+        ''' Keep only the conditions for which keep is True. '''
+        n = np.count_nonzero(keep)
+        for name in self.condvars:
+            arr = getattr(self, name)
+            arr[:n] = arr[:self.ncond][keep]
+        # Release the stored command strings
+        self.cmd[n:self.ncond] = None
+        self.ncond = n
+
+    def remap(self, newidx):
+        ''' Update aircraft indices after a delete, and remove the
+            conditions of deleted aircraft. '''
+        super().remap(newidx)
+        if self.ncond > 0:
+            acidx = newidx[self.acidx[:self.ncond]]
+            self.acidx[:self.ncond] = acidx
+            self.compact(acidx >= 0)
+
+    def reset(self):
+        ''' Remove all conditions. '''
+        super().reset()
+        self.cmd[:self.ncond] = None
+        self.ncond = 0
 
     def ataltcmd(self,acidx,targalt,cmdtxt):
         actalt = bs.traf.alt[acidx]
@@ -111,33 +112,22 @@ class Condition():
     def addcondition(self,acidx, icondtype, target, actual, cmdtxt,latlon=None):
         #print ("addcondition:", acidx, icondtype, target, actual, cmdtxt, latlon)
 
-        # Add condition to arrays
-        self.id.append(bs.traf.id[acidx])
-
-        self.condtype = np.append(self.condtype,icondtype)
-        self.target   = np.append(self.target,target)
-        self.lastdif  = np.append(self.lastdif,target - actual)
+        # Grow the condition table when it is full
+        n = self.ncond
+        if n == len(self.acidx):
+            size = newcapacity(n + 1)
+            for name in self.condvars:
+                arr = getattr(self, name)
+                setattr(self, name, np.concatenate((arr, np.zeros(size - n, dtype=arr.dtype))))
 
-        self.posdata.append(latlon)
-        self.cmd.append(cmdtxt)
-
-        self.ncond = self.ncond+1
+        # Add condition to arrays
+        self.acidx[n]    = acidx
+        self.condtype[n] = icondtype
+        self.target[n]   = target
+        self.lastdif[n]  = target - actual
+        self.lat[n], self.lon[n] = latlon or (0.0, 0.0)
+        self.cmd[n]      = cmdtxt
+
+        self.ncond = n + 1
         #print("addcondition: self.ncond",self.ncond)
         return
-
-    def renameac(self,oldid,newid):
-        # Continonal commands are stored per id (ac name)
-        # When renamed, call this method to update list
-        # rename ids in list of ids
-        # Call this if RENAME command is implemented
-        if self.id.count(old.id) == 0:
-            return
-        for i in range(len(self.id)):
-            if self.id[i] == oldid:
-                self.id[i] = newid
-        return
-
-
-
-
-
@@ -0,0 +1,59 @@
+""" Cache of quantities derived from the traffic state. """
+import numpy as np
+from bluesky.tools.aero import vatmos
+
+
+class DerivedState:
+    """ Cache of the ISA atmosphere at the aircraft altitudes, and of the
+        sine and cosine of aircraft heading and track.
+
+        Within one simulation step these quantities are needed by several
+        modules (kinematics, performance, autopilot, conflict detection).
+        A result is stored together with a copy of the array it was
+        computed from, and is returned again for as long as it is requested
+        for an array with the same content. When the traffic state changes
+        (also when it is updated in place) the result is recomputed.
+
+        The returned arrays are shared between callers, and should not be
+        modified.
+    """
+
+    # Number of stored results per quantity (e.g., for both hdg and trk)
+    size = 2
+
+    def __init__(self):
+        self.entries = dict(atmos=[], sincos=[])
+
+    def atmos(self, h):
+        """ Pressure [Pa], density [kg/m3] and temperature [K] at
+            altitude(s) h [m], as returned by aero.vatmos. """
+        return self.get('atmos', h, vatmos)
+
+    def sincos(self, angle):
+        """ Sine and cosine of angle(s) [deg]. """
+        return self.get('sincos', angle, sincosdeg)
+
+    def get(self, name, arg, fun):
+        """ Return fun(arg), using the stored result when available. """
+        entries = self.entries[name]
+        for i, (key, value) in enumerate(entries):
+            if np.shape(key) == np.shape(arg) and np.array_equal(key, arg):
+                # Move to the front, so that the least recently used is dropped first
+                entries.insert(0, entries.pop(i))
+                return value
+
+        value = fun(arg)
+        entries.insert(0, (np.array(arg), value))
+        del entries[self.size:]
+        return value
+
+    def clear(self):
+        """ Remove all stored results. """
+        for entries in self.entries.values():
+            entries.clear()
+
+
+def sincosdeg(angle):
+    """ Sine and cosine of angle(s) [deg]. """
+    rad = np.radians(angle)
+    return np.sin(rad), np.cos(rad)
@@ -9,7 +9,9 @@ from bluesky.tools.aero import ft, kts, g0, nm, mach2cas, casormach2tas
 from bluesky.tools.misc import degto180, txt2tim, txt2alt, txt2spd
 from bluesky.tools.position import txt2pos
 from bluesky import stack
+from bluesky.traffic.routedb import routedb, wpfields, fpfields, WaypointColumn, StackColumn
 from bluesky.stack.cmdparser import Command, command, commandgroup
+from bluesky.stack.argparser import argparsers, getnextarg, ArgumentError
 
 
 
@@ -37,31 +39,23 @@ class Route(Replaceable):
     # Aircraft route objects
     _routes = WeakValueDictionary()
 
-    def __init__(self, acid):
+    def __init__(self, acid, slot=None):
         # Add self to dictionary of all aircraft routes
         Route._routes[acid] = self
         # Aircraft id (callsign) of the aircraft to which this route belongs
         self.acid = acid
-        self.nwp = 0
-
-       # Waypoint data
-        self.wpname = []    # List of waypoint names for this flight plan
-        self.wptype = []    # List of waypoint types
-        self.wplat  = []    # List of waypoint latitudes
-        self.wplon  = []    # List of waypoint longitudes
-        self.wpalt  = []    # [m] negative value means not specified
-        self.wpspd  = []    # [m/s] negative value means not specified
-        self.wprta  = []    # [m/s] negative value means not specified
-        self.wpflyby = []   # Flyby (True)/flyover(False) switch
-        self.wpstack = []   # Stack with command execured when passing this waypoint
-
-        # Made for drones: fly turn mode, means use specified turn radius and optionally turn speed
-        self.wpflyturn = []   # Flyturn (True) or flyover/flyby (False) switch
-        self.wpturnrad = []   # [nm] Turn radius per waypoint (<0 = not specified)
-        self.wpturnspd = []   # [kts] Turn speed (IAS/CAS) per waypoint (<0 = not specified)
-
-        # Current actual waypoint
-        self.iactwp = -1
+
+        # Waypoint data is stored in the route database, the wp... attributes
+        # of this route are list-like views of this data. The slot can be
+        # passed when slots are allocated in bulk (see RouteDatabase.newslots)
+        if slot is not None:
+            self.routedb = routedb
+            self.slot = slot
+        elif getattr(self, 'slot', None) is None:
+            self.routedb = routedb
+            self.slot = routedb.newslot()
+        else:
+            self.routedb.clear(self.slot)
 
         # Set to default addwpt wpmode
         # Note that neither flyby nor flyturn means: flyover)
@@ -72,18 +66,62 @@ class Route(Replaceable):
         self.turnrad  = -999. # Negative value indicating no value has been set
         self.turnspd  = -999. # Dito, in this case bank angle of vehicle will be used with current speed
 
-        # if the aircraft lands on a runway, the aircraft should keep the
-        # runway heading
-        # default: False
-        self.flag_landed_runway = False
+        # When True, flight plan calculations are postponed until all
+        # waypoints of a route are loaded
+        self.holdfp = False
+
+        # True when the RTA data of the flight plan is calculated, False
+        # when it has the default values (no RTA in the route)
+        self.fprta = False
+
+    def __del__(self):
+        # Release the waypoint data of this route, in the database that holds
+        # it. At interpreter shutdown the database can already be cleaned up.
+        db = getattr(self, 'routedb', None)
+        slot = getattr(self, 'slot', None)
+        if db is None or slot is None:
+            return
+        try:
+            if db.inuse[slot]:
+                db.free(slot)
+        except (AttributeError, IndexError, TypeError):
+            pass
+
+    @property
+    def nwp(self):
+        """ Number of waypoints in this route """
+        return int(self.routedb.nwp[self.slot])
+
+    @nwp.setter
+    def nwp(self, value):
+        # The number of waypoints follows from the waypoint data, so it can
+        # only be reduced, which removes the waypoints at the end
+        if value > self.nwp:
+            raise ValueError('Route.nwp can only be reduced, use addwpt to add waypoints')
+        if value <= 0:
+            self.routedb.clear(self.slot)
+        else:
+            for wpidx in range(self.nwp - 1, value - 1, -1):
+                self.routedb.delete(self.slot, wpidx)
+
+    @property
+    def iactwp(self):
+        """ Index of the current active waypoint """
+        return int(self.routedb.iactwp[self.slot])
+
+    @iactwp.setter
+    def iactwp(self, value):
+        self.routedb.iactwp[self.slot] = value
 
-        self.wpdirfrom = []
-        self.wpdistto  = []
-        self.wpialt    = []
-        self.wptoalt   = []
-        self.wpxtoalt  = []
-        self.wptorta   = []
-        self.wpxtorta  = []
+    @property
+    def flag_landed_runway(self):
+        """ If the aircraft lands on a runway, the aircraft should keep the
+            runway heading (default: False) """
+        return bool(self.routedb.landed[self.slot])
+
+    @flag_landed_runway.setter
+    def flag_landed_runway(self, value):
+        self.routedb.landed[self.slot] = value
 
     @staticmethod
     def get_available_name(data, name_, len_=2):
@@ -95,15 +133,23 @@ class Route(Replaceable):
         fmt_ = "{:0" + str(len_) + "d}"
 
         # Avoid using call sign without number
-        if bs.traf.id.count(name_) > 0:
+        if name_ in bs.traf.idindex:
             appi = 1
             name_ = name_+fmt_.format(appi)
 
-        while data.count(name_) > 0 :
+        names = set(data)
+        while name_ in names:
             appi += 1
             name_ = name_[:-len_]+fmt_.format(appi)
         return name_
     
+    def rename(self, acid):
+        ''' Change the aircraft id (callsign) of this route. '''
+        if Route._routes.get(self.acid) is self:
+            del Route._routes[self.acid]
+        Route._routes[acid] = self
+        self.acid = acid
+
     @stack.command(name = 'ADDWPTMODE', annotations = 'acid, [wpt,alt]')
     @staticmethod
     def addwptMode(acidx, mode = None, value = None):
@@ -415,11 +461,65 @@ class Route(Replaceable):
         if wpidx < 0:
             return False, "Waypoint " + name + " not added."
 
+    @stack.command(name='ADDWPTS', annotations='acid,string')
+    @staticmethod
+    def addwptsStack(acidx, wptlist):
+        """ADDWPTS acid, (wpname/lat,lon),[alt],[spd], (wpname/lat,lon),[alt],[spd], ...
+
+            Add a list of waypoints to the end of the route, and calculate
+            the flight plan once for the complete route. Every waypoint is
+            followed by its (optionally empty) altitude and speed."""
+        acid = bs.traf.id[acidx]
+        acrte = Route._routes.get(acid)
+
+        # As with ADDWPT, only fly direct to the first waypoint when the
+        # route has no waypoints other than origin and destination yet
+        norig = int(bs.traf.ap.orig[acidx] != "")
+        ndest = int(bs.traf.ap.dest[acidx] != "")
+        firstwpts = acrte.nwp - norig - ndest == 0
+
+        # Add waypoints as with ADDWPT, but postpone flight plan calculations
+        result = True
+        acrte.holdfp = True
+        try:
+            while wptlist:
+                if wptlist.lstrip()[0] == ',':
+                    raise ArgumentError('Missing waypoint')
+                wpt, wptlist = argparsers['wpt'].parse(wptlist)
+                alt, wptlist = Route.getoptarg('alt', wptlist)
+                spd, wptlist = Route.getoptarg('spd', wptlist)
+                result = Route.addwptStack(acidx, wpt, alt, spd)
+                if result is not True and not result[0]:
+                    break
+        except (ValueError, ArgumentError) as e:
+            result = False, f'ADDWPTS: {e.args[0]}'
+        finally:
+            acrte.holdfp = False
+
+        # Calculate flight plan. Then fly direct to the first waypoint of a
+        # new route, or only update the constraints of the active waypoint
+        # of a route that was already flown
+        acrte.calcfp()
+        iactwp = acrte.iactwp
+        if 0 <= iactwp < acrte.nwp:
+            if firstwpts:
+                acrte.direct(acidx, acrte.wpname[iactwp])
+            else:
+                bs.traf.actwp.xtoalt[acidx]    = acrte.wpxtoalt[iactwp]
+                bs.traf.actwp.nextaltco[acidx] = acrte.wptoalt[iactwp]
+                bs.traf.actwp.torta[acidx]     = acrte.wptorta[iactwp]
+                bs.traf.actwp.xtorta[acidx]    = acrte.wpxtorta[iactwp]
+        return result
+
+    @staticmethod
+    def getoptarg(argtype, argstring):
+        """ Parse an optional argument of ADDWPTS, None if it is empty. """
+        if not argstring or argstring.lstrip()[0] == ',':
+            return None, getnextarg(argstring)[1]
+        return argparsers[argtype].parse(argstring)
+
     def addwpt_simple(self, iac, name, wptype, lat, lon, alt=-999., spd=-999.):
         """Adds waypoint in the most simple way possible"""
-        # For safety
-        self.nwp = len(self.wplat)
-
         name = name.upper().strip()
 
         wplat = lat
@@ -432,8 +532,7 @@ class Route(Replaceable):
         self.addwpt_data(
             False, self.nwp, newname, wplat, wplon, wptype, alt, spd)
 
-        idx = self.nwp
-        self.nwp += 1
+        idx = self.nwp - 1
 
         #update qdr and "last waypoint switch" in traffic
         if idx>=0:
@@ -695,18 +794,12 @@ class Route(Replaceable):
             self.wpstack[wpidx] = []
 
         else:
-            self.wpname.insert(wpidx, wpname)
-            self.wplat.insert(wpidx, wplat)
-            self.wplon.insert(wpidx, wplon)
-            self.wpalt.insert(wpidx, wpalt)
-            self.wpspd.insert(wpidx, wpspd)
-            self.wptype.insert(wpidx, wptype)
-            self.wpflyby.insert(wpidx, self.swflyby)
-            self.wpflyturn.insert(wpidx, self.swflyturn)
-            self.wpturnrad.insert(wpidx, self.turnrad)
-            self.wpturnspd.insert(wpidx, self.turnspd)
-            self.wprta.insert(wpidx,-999.0)       # initially no RTA
-            self.wpstack.insert(wpidx,[])
+            self.routedb.insert(self.slot, wpidx, wpname=wpname, wplat=wplat,
+                           wplon=wplon, wpalt=wpalt, wpspd=wpspd,
+                           wptype=wptype, wpflyby=self.swflyby,
+                           wpflyturn=self.swflyturn,
+                           wpturnrad=self.turnrad, wpturnspd=self.turnspd,
+                           wprta=-999.0) # initially no RTA
 
 
     def addwpt(self, iac, name, wptype, lat, lon, alt=-999., spd=-999., afterwp="", beforewp=""):
@@ -718,9 +811,6 @@ class Route(Replaceable):
 #        print ("spd = ",spd)
 #        print ("afterwp ="+afterwp)
 #        print
-        # For safety
-        self.nwp = len(self.wplat)
-
         name = name.upper().strip()
 
         wplat = lat
@@ -761,7 +851,6 @@ class Route(Replaceable):
                 self.insert_wpt_data(
                     wpidx, wprtename, wplat, wplon, wptype, alt, spd)
 
-                self.nwp += 1
                 if orig and self.iactwp >= 0:
                     self.iactwp += 1
                 elif not orig and self.iactwp < 0 and self.nwp == 1:
@@ -825,7 +914,6 @@ class Route(Replaceable):
                         False, wpidx, newname, wplat, wplon, wptype, alt, spd)
 
                 idx = wpidx
-                self.nwp += 1
 
             else:
                 idx = -1
@@ -841,8 +929,9 @@ class Route(Replaceable):
         if not (wptype == Route.calcwp):
             self.calcfp()
 
-        # Update autopilot settings
-        if wpok and 0 <= self.iactwp < self.nwp:
+        # Update autopilot settings (postponed with the flight plan
+        # calculations, see ADDWPTS)
+        if wpok and not self.holdfp and 0 <= self.iactwp < self.nwp:
             self.direct(iac, self.wpname[self.iactwp])
 
 
@@ -1025,94 +1114,129 @@ class Route(Replaceable):
         return [self.wplat[trnidx], self.wplon[trnidx], self.wpturnspd[trnidx], self.wpturnrad[trnidx], trnidx]
 
     def getnextwp(self):
-        """Go to next waypoint and return data"""
-
+        """Go to next waypoint and return data (see getnextwps)"""
+        # when landing, the aircraft just needs a fixed heading to
+        # remain on the runway
         if self.flag_landed_runway:
+            self.stacklandingcmds()
+        return tuple(value[0] for value in Route.getnextwps(array([self.slot])))
 
-            # when landing, LNAV is switched off
-            lnavon = False
-
-            # no further waypoint
-            nextqdr = -999.
-
-            # and the aircraft just needs a fixed heading to
-            # remain on the runway
-            # syntax: HDG acid,hdg (deg,True)
-            name = self.wpname[self.iactwp]
-
-            # Change RW06,RWY18C,RWY24001 to resp. 06,18C,24
-            if "RWY" in name:
-                rwykey = name[8:10]
-                if len(name)>10:
-                    if not name[10].isdigit():
-                        rwykey = name[8:11]
-            # also if it is only RW
-            else:
-                rwykey = name[7:9]
-                if len(name) > 9:
-                    if not name[9].isdigit():
-                        rwykey = name[7:10]
-
-            # Use this code to look up runway heading
-            wphdg = bs.navdb.rwythresholds[name[:4]][rwykey][2]
-
-            # keep constant runway heading
-            stack.stack("HDG " + str(self.acid) + " " + str(wphdg))
-
-            # start decelerating
-            stack.stack("DELAY " + "10 " + "SPD " + str(self.acid) + " " + "10")
-
-            # delete aircraft
-            stack.stack("DELAY " + "42 " + "DEL " + str(self.acid))
-
-            swlastwp = (self.iactwp == self.nwp - 1)
-
-            return self.wplat[self.iactwp],self.wplon[self.iactwp],   \
-                           self.wpalt[self.iactwp],self.wpspd[self.iactwp],   \
-                           self.wpxtoalt[self.iactwp],self.wptoalt[self.iactwp], \
-                           self.wpxtorta[self.iactwp], self.wptorta[self.iactwp], \
-                           lnavon,self.wpflyby[self.iactwp], \
-                           self.wpflyturn[self.iactwp],self.wpturnrad[self.iactwp],\
-                           self.wpturnspd[self.iactwp], \
-                           nextqdr, swlastwp
+    @staticmethod
+    def getnextwps(slots):
+        """ Go to next waypoint in the routes in slots and return data.
+            Vectorised version of getnextwp, which returns arrays with the
+            data of all routes, but doesn't stack the commands of routes
+            that have landed on a runway (see stacklandingcmds). """
+        nwp = routedb.nwp[slots]
+        landed = routedb.landed[slots]
 
-        # Switch LNAV off when last waypoint has been passed
-        lnavon = self.iactwp < self.nwp -1
+        # Switch LNAV off when last waypoint has been passed or when landed
+        lnavon = (routedb.iactwp[slots] < nwp - 1) & ~landed
 
         # if LNAV on: increase counter
-        if lnavon:
-            self.iactwp += 1
-
-        # Activate switch to indicate that this is the last waypoint (for lenient passing logic in actwp.Reached function)
-        swlastwp = (self.iactwp == self.nwp-1)
-
-        nextqdr = self.getnextqdr()
+        iactwp = routedb.iactwp[slots] + lnavon
+        routedb.iactwp[slots] = iactwp
+
+        # Activate switch to indicate that this is the last waypoint
+        swlastwp = iactwp == nwp - 1
+
+        start = routedb.start[slots]
+        rows = where((iactwp > -1) & (iactwp < nwp), start + iactwp, -1)
+        wptype = routedb.data['wptype']
+        wpname = routedb.data['wpname']
+
+        # Direction of next leg, when there is one
+        nextqdr = full(len(rows), -999.)
+        hasnext = (iactwp > -1) & (iactwp < nwp - 1) & ~landed
+        if any(hasnext):
+            cur = rows[hasnext]
+            wplat, wplon = routedb.data['wplat'], routedb.data['wplon']
+            nextqdr[hasnext], _ = geo.qdrdist(wplat[cur], wplon[cur],
+                                              wplat[cur + 1], wplon[cur + 1])
 
         # in case that there is a runway, the aircraft should remain on it
-        # instead of deviating to the airport centre
         # When there is a destination: current = runway, next  = Dest
         # Else: current = runway and this is also the last waypoint
-        if (self.wptype[self.iactwp] == 5 and
-                self.wpname[self.iactwp] == self.wpname[-1]) or \
-           (self.wptype[self.iactwp] == 5 and self.iactwp+1<self.nwp and
-                self.wptype[self.iactwp + 1] == 3):
+        runway = (rows >= 0) & ~landed
+        runway[runway] = wptype[rows[runway]] == 5
+        if any(runway):
+            cur = rows[runway]
+            last = start[runway] + nwp[runway] - 1
+            nextdest = cur < last
+            nextdest[nextdest] = wptype[cur[nextdest] + 1] == 3
+            runway[runway] = (wpname[cur] == wpname[last]) | nextdest
+            routedb.landed[slots[runway]] = True
+
+        lat, lon, alt, spd, xtoalt, toalt, xtorta, torta, flyby, flyturn, \
+            turnrad, turnspd = routedb.getrows(rows, 'wplat', 'wplon', 'wpalt',
+                'wpspd', 'wpxtoalt', 'wptoalt', 'wpxtorta', 'wptorta',
+                'wpflyby', 'wpflyturn', 'wpturnrad', 'wpturnspd')
+
+        return lat, lon, alt, spd, xtoalt, toalt, xtorta, torta, \
+               lnavon, flyby, flyturn, turnrad, turnspd, nextqdr, swlastwp
 
-            self.flag_landed_runway = True
+    @staticmethod
+    def getnextturnwps(slots):
+        """ Give the next turn waypoint data of the routes in slots.
+            Vectorised version of getnextturnwp. """
+        start = routedb.start[slots]
+        first = maximum(routedb.iactwp[slots], 0)
+        nleft = maximum(routedb.nwp[slots] - first, 0)
+
+        # Rows of all remaining waypoints, and the route they belong to
+        offset = arange(nleft.sum()) - repeat(cumsum(nleft) - nleft, nleft)
+        rows = repeat(start + first, nleft) + offset
+        iroute = repeat(arange(len(slots)), nleft)
+
+        # First turn waypoint of each route
+        isturn = routedb.data['wpflyturn'][rows]
+        iroute, ifirst = unique(iroute[isturn], return_index=True)
+        rows = rows[isturn][ifirst]
+
+        # Default values for routes without turn waypoints
+        lat, lon = zeros(len(slots)), zeros(len(slots))
+        spd, rad, idx = full((3, len(slots)), -999.)
+        lat[iroute] = routedb.data['wplat'][rows]
+        lon[iroute] = routedb.data['wplon'][rows]
+        spd[iroute] = routedb.data['wpturnspd'][rows]
+        rad[iroute] = routedb.data['wpturnrad'][rows]
+        idx[iroute] = rows - start[iroute]
+        return lat, lon, spd, rad, idx
+
+    def stacklandingcmds(self):
+        """ Stack the commands to keep the runway heading and stop, for an
+            aircraft that has landed on the runway of this route. """
+        # syntax: HDG acid,hdg (deg,True)
+        name = self.wpname[self.iactwp]
+
+        # Change RW06,RWY18C,RWY24001 to resp. 06,18C,24
+        if "RWY" in name:
+            rwykey = name[8:10]
+            if len(name)>10:
+                if not name[10].isdigit():
+                    rwykey = name[8:11]
+        # also if it is only RW
+        else:
+            rwykey = name[7:9]
+            if len(name) > 9:
+                if not name[9].isdigit():
+                    rwykey = name[7:10]
+
+        # Use this code to look up runway heading
+        wphdg = bs.navdb.rwythresholds[name[:4]][rwykey][2]
 
-        #print ("getnextwp:",self.wpname[self.iactwp],"   torta = ",self.wptorta[self.iactwp])
+        # keep constant runway heading
+        stack.stack("HDG " + str(self.acid) + " " + str(wphdg))
 
+        # start decelerating
+        stack.stack("DELAY " + "10 " + "SPD " + str(self.acid) + " " + "10")
 
-        return self.wplat[self.iactwp],self.wplon[self.iactwp],   \
-               self.wpalt[self.iactwp],self.wpspd[self.iactwp],   \
-               self.wpxtoalt[self.iactwp],self.wptoalt[self.iactwp],\
-               self.wpxtorta[self.iactwp],self.wptorta[self.iactwp],\
-               lnavon,self.wpflyby[self.iactwp], \
-               self.wpflyturn[self.iactwp], self.wpturnrad[self.iactwp], \
-               self.wpturnspd[self.iactwp], \
-               nextqdr, swlastwp
+        # delete aircraft
+        stack.stack("DELAY " + "42 " + "DEL " + str(self.acid))
 
     def runactwpstack(self):
-        for cmdline in self.wpstack[self.iactwp]:
+        # Waypoints without stacked commands have no command list
+        for cmdline in self.routedb.column(self.slot, 'wpstack')[self.iactwp] or ():
             stack.stack(cmdline)
             #debug
             # stack.stack("ECHO "+self.acid+" AT "+self.wpname[self.iactwp]+" command issued:"+cmdline)
@@ -1163,14 +1287,7 @@ class Route(Replaceable):
         if acrte.iactwp == wpidx and not wpidx == acrte.nwp - 1:
             acrte.direct(acidx, acrte.wpname[wpidx + 1])
 
-        acrte.nwp =acrte.nwp - 1
-        del acrte.wpname[wpidx]
-        del acrte.wplat[wpidx]
-        del acrte.wplon[wpidx]
-        del acrte.wpalt[wpidx]
-        del acrte.wpspd[wpidx]
-        del acrte.wprta[wpidx]
-        del acrte.wptype[wpidx]
+        acrte.routedb.delete(acrte.slot, wpidx)
         if acrte.iactwp > wpidx:
             acrte.iactwp = max(0, acrte.iactwp - 1)
 
@@ -1311,133 +1428,176 @@ class Route(Replaceable):
                 lat = f*self.wplat[j]+(1.-f)*self.wplat[j+1]
                 lon = f*self.wplon[j]+(1.-f)*self.wplon[j+1]
 
-                self.wpname.insert(j,name[i])
-                self.wptype.insert(j,Route.calcwp)
-                self.wplat.insert(j,lat)
-                self.wplon.insert(j,lon)
-                self.wpalt.insert(j,alt[i])
-                self.wpspd.insert(j,-999.)
+                self.routedb.insert(self.slot, j, wpname=name[i], wptype=Route.calcwp,
+                               wplat=lat, wplon=lon, wpalt=alt[i], wpspd=-999.)
 
     def insertcalcwp(self, i, name):
         """Insert empty wp with no attributes at location i"""
 
-        self.wpname.insert(i,name)
-        self.wplat.insert(i,0.)
-        self.wplon.insert(i,0.)
-        self.wpalt.insert(i,-999.)
-        self.wpspd.insert(i,-999.)
-        self.wptype.insert(i,Route.calcwp)
+        self.routedb.insert(self.slot, i, wpname=name, wplat=0., wplon=0.,
+                       wpalt=-999., wpspd=-999., wptype=Route.calcwp)
 
     def calcfp(self): # Current Flight Plan calculations, which actualize based on flight condition
-        """Do flight plan calculations"""
+        """Do flight plan calculations, for the legs affected by changes
+           to the route since the previous calculation"""
 #        self.delwpt("T/D")
 #        self.delwpt("T/C")
 
-        # Direction to waypoint
-        self.nwp = len(self.wpname)
-
-        # Create flight plan calculation table
-        self.wpdirfrom   = self.nwp*[0.]
-        self.wpdistto    = self.nwp*[0.]
-        self.wpialt      = self.nwp*[-1]
-        self.wptoalt     = self.nwp*[-999.]
-        self.wpxtoalt    = self.nwp*[1.]  # Avoid division by zero
-        self.wpirta      = self.nwp*[-1]
-        self.wptorta     = self.nwp*[-999.]
-        self.wpxtorta    = self.nwp*[1.]  #[m] Avoid division by zero
-
-        # No waypoints: make empty variables to be safe and return: nothing to do
-        if self.nwp==0:
+        # Range of changed waypoints, and number of waypoints inserted since
+        # the previous calculation
+        lo, hi, shift = self.routedb.fprange(self.slot)
+        if self.holdfp or lo > hi:
             return
+        self.routedb.fpclean(self.slot)
 
-        # Calculate lateral leg data
-        # LNAV: Calculate leg distances and directions
-
-        for i in range(0, self.nwp - 1):
-            qdr,dist = geo.qdrdist(self.wplat[i]  ,self.wplon[i],
-                                self.wplat[i+1],self.wplon[i+1])
-            self.wpdirfrom[i] = qdr
-            self.wpdistto[i+1]  = dist #[nm]  distto is in nautical miles
+        # No waypoints: nothing to do
+        nwp = self.nwp
+        if nwp==0:
+            return
+        lo, hi = min(lo, nwp - 1), min(hi, nwp - 1)
+
+        # Flight plan calculation table. These are array views on the
+        # route database, so assigning to them updates the route.
+        wpdirfrom = self.routedb.column(self.slot, 'wpdirfrom')
+        wpdistto  = self.routedb.column(self.slot, 'wpdistto')
+        wpialt    = self.routedb.column(self.slot, 'wpialt')
+        wptoalt   = self.routedb.column(self.slot, 'wptoalt')
+        wpxtoalt  = self.routedb.column(self.slot, 'wpxtoalt')
+        wpirta    = self.routedb.column(self.slot, 'wpirta')
+        wptorta   = self.routedb.column(self.slot, 'wptorta')
+        wpxtorta  = self.routedb.column(self.slot, 'wpxtorta')
 
-        if self.nwp>1:
-            self.wpdirfrom[-1] = self.wpdirfrom[-2]
+        # Calculate lateral leg data
+        # LNAV: Calculate leg distances and directions of the legs from
+        # and to the changed waypoints
+        ileg = max(lo - 1, 0)  # first and last leg start
+        jleg = hi + 1 if hi < nwp - 1 else nwp - 1
+        if jleg > ileg:
+            wplat = self.routedb.column(self.slot, 'wplat')
+            wplon = self.routedb.column(self.slot, 'wplon')
+            qdr, dist = geo.qdrdist(wplat[ileg:jleg], wplon[ileg:jleg],
+                                    wplat[ileg + 1:jleg + 1], wplon[ileg + 1:jleg + 1])
+            wpdirfrom[ileg:jleg]      = qdr
+            wpdistto[ileg + 1:jleg + 1] = dist #[nm]  distto is in nautical miles
+        wpdirfrom[-1] = wpdirfrom[-2] if nwp > 1 else 0.
+        wpdistto[0]   = 0.
 
         # Calculate longitudinal leg data
         # VNAV: calc next altitude constraint: index, altitude and distance to it
-        ialt = -1     # index to waypoint with next altitude constraint
-        toalt = -999. # value of next altitude constraint
-        xtoalt = 0.   # distance to next altitude constraint from this wp
-        for i in range(self.nwp-1,-1,-1):
+        # This is calculated backwards along the route. Only waypoints from
+        # the last changed waypoint back to the last altitude constraint
+        # before the changed waypoints are affected. Waypoints after the
+        # changed waypoints keep their data, but their index of the next
+        # altitude constraint moves with the inserted waypoints.
+        wptype = self.routedb.column(self.slot, 'wptype')
+        wpalt  = self.routedb.column(self.slot, 'wpalt')
+
+        # waypoint with altitude constraint (dest or alt specified)
+        isaltco = (wptype == Route.dest) | (wpalt >= 0)
+        before = flatnonzero(isaltco[:max(lo - 1, 0)])
+        istart = before[-1] + 1 if len(before) else 0
+
+        if hi < nwp - 1:
+            tail = wpialt[hi + 1:]
+            tail[tail >= 0] += shift
+            ialt   = wpialt[hi + 1]    # index to waypoint with next altitude constraint
+            toalt  = wptoalt[hi + 1]   # value of next altitude constraint
+            xtoalt = wpxtoalt[hi + 1]  # distance to next altitude constraint from this wp
 
-            # waypoint with altitude constraint (dest of al specified)
-            if self.wptype[i]==Route.dest:
-                ialt   = i
-                toalt  = 0.
-                xtoalt = 0.                # [m]
-
-            elif self.wpalt[i] >= 0:
+        else:
+            ialt   = -1
+            toalt  = -999.
+            xtoalt = 0.
+            if not isaltco[-1]:
+                # waypoint with no altitude constraint at end of route
+                wpialt[-1], wptoalt[-1], wpxtoalt[-1] = ialt, toalt, xtoalt
+                hi -= 1
+
+        # Walk back over the altitude constraints, and keep counting the
+        # distance over the waypoints without constraint in between
+        iend = hi
+        for i in list(istart + flatnonzero(isaltco[istart:hi + 1]))[::-1] + [istart - 1]:
+            if i < iend:
+                # xtoalt is the running sum of the legs, in the order of the
+                # route from the constraint backwards
+                xtoalts = add.accumulate(concatenate(
+                    ([xtoalt], wpdistto[iend + 1:i + 1:-1] * nm)))[1:]  # [m] xtoalt is in meters!
+                wpialt[i + 1:iend + 1]   = ialt
+                wptoalt[i + 1:iend + 1]  = toalt   #[m]
+                wpxtoalt[i + 1:iend + 1] = xtoalts[::-1]  #[m]
+                xtoalt = xtoalts[-1]
+
+            if i >= istart:
                 ialt   = i
-                toalt  = self.wpalt[i]
+                toalt  = 0. if wptype[i] == Route.dest else wpalt[i]
                 xtoalt = 0.                # [m]
-
-            # waypoint with no altitude constraint:keep counting
-            else:
-                if i!=self.nwp-1:
-                    xtoalt = xtoalt + self.wpdistto[i+1]*nm  # [m] xtoalt is in meters!
-                else:
-                    xtoalt = 0.0
-
-            self.wpialt[i]   = ialt
-            self.wptoalt[i]  = toalt   #[m]
-            self.wpxtoalt[i] = xtoalt  #[m]
+                wpialt[i], wptoalt[i], wpxtoalt[i] = ialt, toalt, xtoalt
+            iend = i - 1
 
         # RTA: calc next rta constraint: index, altitude and distance to it
         # If any RTA.
-        if any(array(self.wprta)>=0.0):
-            #print("Yes, I found RTAs")
+        wprta = self.routedb.column(self.slot, 'wprta')
+        if any(wprta>=0.0):
+            self.fprta = True
+            toalts = wptoalt.tolist()
+            toalt  = toalts[0]
+            distto = wpdistto.tolist()
+            rtas = wprta.tolist()
+            spds = self.routedb.column(self.slot, 'wpspd').tolist()
             irta = -1       # index of wp
             torta = -999.   # next rta value
             xtorta = 0.     # distance to next rta
-            for i in range(self.nwp - 1, -1, -1):
+            irtas, tortas, xtortas = nwp * [-1], nwp * [-999.], nwp * [1.]
+            for i in range(nwp - 1, -1, -1):
 
                 # waypoint with rta: reset counter, update rts
-                if self.wprta[i] >= 0:
+                if rtas[i] >= 0:
                     irta = i
-                    torta = self.wprta[i]
+                    torta = rtas[i]
                     xtorta = 0.  # [m]
 
                 # waypoint with no altitude constraint:keep counting
                 else:
-                    if i != self.nwp - 1:
+                    if i != nwp - 1:
                         # No speed or rta constraint: add to xtorta
-                        if self.wpspd[i] <= 0.0:
-                            xtorta = xtorta + self.wpdistto[i + 1] * nm  # [m] xtoalt is in meters!
+                        if spds[i] <= 0.0:
+                            xtorta = xtorta + distto[i + 1] * nm  # [m] xtoalt is in meters!
                         else:
                             # speed constraint on this leg: shift torta to account for this
                             # altitude unknown
-                            if self.wptoalt[i] >0.:
+                            if toalts[i] >0.:
                                 alt = toalt
                             else:
                                 # TODO: current a/c altitude would be better guess, but not accessible here
                                 # as we do not know aircraft index for this route
                                 alt = 10000.*ft # default to minimize errors, when no alt constraints are present
-                            legtas = casormach2tas(self.wpspd[i],alt)
+                            legtas = casormach2tas(spds[i],alt)
                             #TODO: account for wind at this position vy adding wind vectors to waypoints?
 
                             # xtorta stays the same! This leg will not be available for RTA scheduling, so distance
                             # is not in xtorta. Therefore we need to subtract legtime to ignore this leg for the RTA
                             # scheduling
-                            legtime = self.wpdistto[i+1]/legtas
+                            legtime = distto[i+1]/legtas
                             torta = torta - legtime
                     else:
                         xtorta = 0.0
                         torta = -999.0
 
-                self.wpirta[i]   = irta
-                self.wptorta[i]  = torta  # [s]
-                self.wpxtorta[i] = xtorta  # [m]
-            #print("wpxtorta=",self.wpxtorta)
-            #print("wptorta=", self.wptorta)
+                irtas[i]   = irta
+                tortas[i]  = torta  # [s]
+                xtortas[i] = xtorta  # [m]
+
+            wpirta[:]   = irtas
+            wptorta[:]  = tortas
+            wpxtorta[:] = xtortas
+
+        elif self.fprta:
+            # Waypoints that are added later get these defaults as well, so
+            # this is only needed when the last RTA was removed
+            self.fprta = False
+            wpirta[:]   = -1
+            wptorta[:]  = -999.
+            wpxtorta[:] = 1.  #[m] Avoid division by zero
 
     def findact(self,i):
         """ Find best default active waypoint.
@@ -1513,3 +1673,26 @@ class Route(Replaceable):
         else:
             nextqdr = -999.
         return nextqdr
+
+
+def wpcolumn(name):
+    """ Route property for the list-like view of a waypoint field """
+    viewtype = StackColumn if name == 'wpstack' else WaypointColumn
+
+    def fget(self):
+        return viewtype(self.routedb, self.slot, name)
+
+    def fset(self, values):
+        col = self.routedb.column(self.slot, name)
+        if len(values) != len(col):
+            raise ValueError(f'{name} needs {len(col)} values, got {len(values)}')
+        for i, value in enumerate(values):
+            col[i] = value
+        if name in fpfields:
+            self.routedb.touch(self.slot)
+
+    return property(fget, fset)
+
+
+for field in wpfields:
+    setattr(Route, field, wpcolumn(field))
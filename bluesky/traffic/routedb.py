@@ -0,0 +1,363 @@
+''' Columnar storage of the waypoint data of all aircraft routes. '''
+import numpy as np
+from bluesky.core.trafficarrays import newcapacity
+
+
+# Waypoint data fields, with their dtype and default value
+wpfields = {
+    'wpname':    (object, ''),      # Waypoint name
+    'wptype':    (np.int32, 0),     # Waypoint type (see Route)
+    'wplat':     (float, 0.0),      # [deg] Waypoint latitude
+    'wplon':     (float, 0.0),      # [deg] Waypoint longitude
+    'wpalt':     (float, -999.0),   # [m] negative value means not specified
+    'wpspd':     (float, -999.0),   # [m/s] negative value means not specified
+    'wprta':     (float, -999.0),   # [s] negative value means not specified
+    'wpflyby':   (bool, True),      # Flyby (True)/flyover(False) switch
+    'wpstack':   (object, None),    # Commands executed when passing waypoint
+    'wpflyturn': (bool, False),     # Flyturn (True) or flyover/flyby (False)
+    'wpturnrad': (float, -999.0),   # [nm] Turn radius (<0 = not specified)
+    'wpturnspd': (float, -999.0),   # [m/s] Turn speed (<0 = not specified)
+    'wpdirfrom': (float, 0.0),      # [deg] Direction of leg from waypoint
+    'wpdistto':  (float, 0.0),      # [nm] Length of leg to waypoint
+    'wpialt':    (np.int32, -1),    # Index of next altitude constraint
+    'wptoalt':   (float, -999.0),   # [m] Next altitude constraint
+    'wpxtoalt':  (float, 1.0),      # [m] Distance to next altitude constraint
+    'wpirta':    (np.int32, -1),    # Index of next RTA
+    'wptorta':   (float, -999.0),   # [s] Next RTA
+    'wpxtorta':  (float, 1.0)       # [m] Distance to next RTA
+}
+
+# Fields with Python objects, which are cleared when rows are released
+objfields = [name for name, (dtype, _) in wpfields.items() if dtype is object]
+
+# Fields used by the flight plan calculation: changing these marks the
+# waypoint for recalculation
+fpfields = ('wptype', 'wplat', 'wplon', 'wpalt', 'wpspd', 'wprta')
+
+
+class RouteDatabase:
+    ''' Waypoint data of all aircraft routes, stored in one array per
+        waypoint field.
+
+        Each route owns a block of consecutive rows in these arrays, of
+        which the first nwp rows contain its waypoints. Routes are
+        referred to by a slot number, which indexes the per-route arrays
+        start, cap, nwp, iactwp and landed. Slot numbers stay valid when blocks are
+        moved.
+
+        For each route, the range of waypoints that changed since its last
+        flight plan calculation is kept in fplo and fphi, together with
+        the net number of waypoints inserted since then in fpshift. This
+        allows Route.calcfp to only recalculate legs affected by an edit.
+
+        A route that outgrows its block moves to a new block, with one and
+        a half times the required capacity, at the end of the arrays. The
+        rows of moved and freed blocks are reclaimed by compacting all
+        blocks when the arrays are full and more than a quarter of the
+        allocated rows is unused. '''
+    def __init__(self):
+        self.data = {name: np.empty(0, dtype=dtype)
+                     for name, (dtype, _) in wpfields.items()}
+        # Per-route data, indexed by slot number
+        self.start = np.zeros(0, dtype=int)    # First row of block
+        self.cap = np.zeros(0, dtype=int)      # Number of rows in block
+        self.nwp = np.zeros(0, dtype=int)      # Number of waypoints
+        self.iactwp = np.zeros(0, dtype=int)   # Index of active waypoint
+        self.landed = np.zeros(0, dtype=bool)  # Landed on runway of route
+        self.fplo = np.zeros(0, dtype=int)     # First changed waypoint
+        self.fphi = np.zeros(0, dtype=int)     # Last changed waypoint
+        self.fpshift = np.zeros(0, dtype=int)  # Net inserted waypoints
+        self.inuse = np.zeros(0, dtype=bool)
+        self.freeslots = []
+        # Number of allocated rows, and number of these rows that are in
+        # blocks that are no longer used
+        self.top = 0
+        self.nunused = 0
+
+    def newslot(self):
+        ''' Create a new, empty route, and return its slot number. '''
+        return int(self.newslots(1)[0])
+
+    def newslots(self, n):
+        ''' Create n new, empty routes, and return their slot numbers. Free
+            slots are reused first, the per-route arrays are grown at most
+            once, and all slots are initialised together. '''
+        nfree = min(n, len(self.freeslots))
+        slots = self.freeslots[len(self.freeslots) - nfree:][::-1]
+        del self.freeslots[len(self.freeslots) - nfree:]
+        if nfree < n:
+            first = len(self.inuse)
+            last = first + n - nfree
+            size = newcapacity(last)
+            for name in ('start', 'cap', 'nwp', 'iactwp', 'landed', 'fplo',
+                         'fphi', 'fpshift', 'inuse'):
+                arr = getattr(self, name)
+                newarr = np.zeros(size, dtype=arr.dtype)
+                newarr[:first] = arr
+                setattr(self, name, newarr)
+            slots.extend(range(first, last))
+            self.freeslots = list(range(size - 1, last - 1, -1))
+        slots = np.array(slots, dtype=int)
+        self.start[slots] = self.top
+        self.cap[slots] = self.nwp[slots] = 0
+        self.iactwp[slots] = -1
+        self.landed[slots] = False
+        self.fpclean(slots)
+        self.inuse[slots] = True
+        return slots
+
+    def free(self, slot):
+        ''' Release the block and slot of a route. '''
+        self.clear(slot)
+        self.nunused += self.cap[slot]
+        self.cap[slot] = 0
+        self.inuse[slot] = False
+        self.freeslots.append(slot)
+
+    def clear(self, slot):
+        ''' Remove all waypoints of a route. '''
+        self._release(self.start[slot], self.nwp[slot])
+        self.nwp[slot] = 0
+        self.iactwp[slot] = -1
+        self.landed[slot] = False
+        self.fpclean(slot)
+
+    def reserve(self, slot, n):
+        ''' Make sure that the block of a route can hold n waypoints. '''
+        if n <= self.cap[slot]:
+            return
+        newcap = max(4, n + n // 2)
+        newstart = self._alloc(newcap)
+        # Allocation can compact the arrays, so look up the block afterwards
+        start, nwp = self.start[slot], self.nwp[slot]
+        for arr in self.data.values():
+            arr[newstart:newstart + nwp] = arr[start:start + nwp]
+        self._release(start, nwp)
+        self.nunused += self.cap[slot]
+        self.start[slot] = newstart
+        self.cap[slot] = newcap
+
+    def insert(self, slot, idx, **values):
+        ''' Insert a waypoint before index idx in a route. Fields that are
+            not passed get their default value. '''
+        nwp = self.nwp[slot]
+        if idx < 0:
+            idx = max(0, idx + nwp)
+        idx = min(idx, nwp)
+        self.reserve(slot, nwp + 1)
+        row = self.start[slot] + idx
+        end = self.start[slot] + nwp
+        for name, arr in self.data.items():
+            arr[row + 1:end + 1] = arr[row:end]
+            arr[row] = values.get(name, wpfields[name][1])
+        self.nwp[slot] = nwp + 1
+
+        # Waypoints after idx move one place up
+        fphi = self.fphi[slot]
+        self.fplo[slot] = min(self.fplo[slot], idx)
+        self.fphi[slot] = max(fphi + (fphi >= idx), idx)
+        self.fpshift[slot] += 1
+
+    def delete(self, slot, idx):
+        ''' Delete the waypoint with index idx from a route. '''
+        nwp = self.nwp[slot]
+        if idx < 0:
+            idx += nwp
+        if not 0 <= idx < nwp:
+            raise IndexError('waypoint index out of range')
+        row = self.start[slot] + idx
+        end = self.start[slot] + nwp
+        for arr in self.data.values():
+            arr[row:end - 1] = arr[row + 1:end]
+        self._release(end - 1, 1)
+        self.nwp[slot] = nwp - 1
+
+        # The waypoints before and after the deleted waypoint now form a leg
+        fphi = self.fphi[slot]
+        self.fplo[slot] = min(self.fplo[slot], max(0, idx - 1))
+        self.fphi[slot] = max(fphi - (fphi > idx), idx)
+        self.fpshift[slot] -= 1
+
+    def touch(self, slot, idx=None):
+        ''' Mark waypoint idx of a route as changed since the last flight
+            plan calculation. All waypoints are marked when idx is None. '''
+        nwp = self.nwp[slot]
+        if idx is None:
+            lo, hi = 0, nwp - 1
+        else:
+            lo = hi = idx + nwp if idx < 0 else idx
+        self.fplo[slot] = min(self.fplo[slot], lo)
+        self.fphi[slot] = max(self.fphi[slot], hi)
+
+    def fprange(self, slot):
+        ''' Range of waypoints changed since the last flight plan calculation
+            of a route, and the net number of waypoints inserted since then.
+            When nothing changed, the first index is larger than the last. '''
+        return int(self.fplo[slot]), int(self.fphi[slot]), int(self.fpshift[slot])
+
+    def fpclean(self, slot):
+        ''' Mark the flight plan calculation of a route as up to date. '''
+        self.fplo[slot] = np.iinfo(self.fplo.dtype).max
+        self.fphi[slot] = -1
+        self.fpshift[slot] = 0
+
+    def column(self, slot, name):
+        ''' Array view of one waypoint field of a route. '''
+        start = self.start[slot]
+        return self.data[name][start:start + self.nwp[slot]]
+
+    def actwpidx(self, slots):
+        ''' Row indices of the active waypoints of the routes in slots.
+            The index is -1 for routes without a valid active waypoint. '''
+        iactwp = self.iactwp[slots]
+        valid = (iactwp >= 0) & (iactwp < self.nwp[slots])
+        return np.where(valid, self.start[slots] + iactwp, -1)
+
+    def getactwp(self, slots, *names):
+        ''' Values of waypoint fields at the active waypoints of the routes
+            in slots. Values of routes without a valid active waypoint are
+            the default values of the fields. '''
+        return self.getrows(self.actwpidx(slots), *names)
+
+    def getrows(self, rows, *names):
+        ''' Values of waypoint fields at rows. Rows with index -1 get the
+            default values of the fields. '''
+        valid = rows >= 0
+        values = []
+        for name in names:
+            dtype, default = wpfields[name]
+            value = np.full(len(rows), default, dtype=dtype)
+            value[valid] = self.data[name][rows[valid]]
+            values.append(value)
+        return values
+
+    def compact(self):
+        ''' Move all blocks to the start of the arrays, removing the unused
+            rows between them. '''
+        slots = np.flatnonzero(self.inuse)
+        slots = slots[np.argsort(self.start[slots], kind='stable')]
+        newstart = np.cumsum(self.cap[slots]) - self.cap[slots]
+        # Source and destination rows of all waypoints
+        nwp = self.nwp[slots]
+        offset = np.arange(nwp.sum()) - np.repeat(np.cumsum(nwp) - nwp, nwp)
+        src = np.repeat(self.start[slots], nwp) + offset
+        dst = np.repeat(newstart, nwp) + offset
+        for name, (dtype, default) in wpfields.items():
+            arr = self.data[name]
+            if dtype is object:
+                newarr = np.full(len(arr), default, dtype=object)
+                newarr[dst] = arr[src]
+                self.data[name] = newarr
+            else:
+                arr[dst] = arr[src]
+        self.start[slots] = newstart
+        self.top = int(self.cap[slots].sum())
+        self.nunused = 0
+
+    def memsize(self):
+        ''' Number of bytes used by the waypoint arrays. '''
+        return sum(arr.nbytes for arr in self.data.values())
+
+    def _alloc(self, n):
+        ''' Allocate a block of n rows, and return its first row. '''
+        size = len(self.data['wplat'])
+        if self.top + n > size and self.nunused > self.top // 4:
+            self.compact()
+        if self.top + n > size:
+            newsize = newcapacity(self.top + n)
+            for name, (dtype, default) in wpfields.items():
+                newarr = np.full(newsize, default, dtype=dtype)
+                newarr[:self.top] = self.data[name][:self.top]
+                self.data[name] = newarr
+        start = self.top
+        self.top += n
+        return start
+
+    def _release(self, start, n):
+        ''' Clear object references in n rows from start. '''
+        for name in objfields:
+            self.data[name][start:start + n] = wpfields[name][1]
+
+
+class WaypointColumn:
+    ''' List-like view of one waypoint field of a route. Elements can be
+        read and changed as in a list of equal length. Waypoints are added
+        and removed for all fields at once, with the Route methods. '''
+    __slots__ = ('db', 'slot', 'name')
+
+    def __init__(self, db, slot, name):
+        self.db = db
+        self.slot = slot
+        self.name = name
+
+    def __len__(self):
+        return int(self.db.nwp[self.slot])
+
+    def __getitem__(self, key):
+        # Elements are returned as Python objects, slices as lists
+        col = self.db.column(self.slot, self.name)
+        if isinstance(key, slice):
+            return col[key].tolist()
+        return col.item(key)
+
+    def __setitem__(self, key, value):
+        self.db.column(self.slot, self.name)[key] = value
+        if self.name in fpfields:
+            self.db.touch(self.slot, key if isinstance(key, (int, np.integer)) else None)
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __contains__(self, value):
+        return value in self.tolist()
+
+    def __eq__(self, other):
+        if isinstance(other, (WaypointColumn, list, tuple)):
+            return self.tolist() == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self.db.column(self.slot, self.name), dtype=dtype)
+
+    def index(self, value):
+        ''' Index of the first element equal to value. '''
+        return self.tolist().index(value)
+
+    def count(self, value):
+        ''' Number of elements equal to value. '''
+        return self.tolist().count(value)
+
+    def tolist(self):
+        ''' Copy of the elements as a list of Python objects. '''
+        return self.db.column(self.slot, self.name).tolist()
+
+
+class StackColumn(WaypointColumn):
+    ''' View of the per-waypoint command lists of a route. The list of a
+        waypoint is only created when it is first accessed. '''
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        col = self.db.column(self.slot, self.name)
+        if isinstance(key, slice):
+            return [self._get(col, i) for i in range(*key.indices(len(col)))]
+        return self._get(col, key)
+
+    def tolist(self):
+        return [cmds or [] for cmds in self.db.column(self.slot, self.name)]
+
+    @staticmethod
+    def _get(col, idx):
+        cmds = col[idx]
+        if cmds is None:
+            cmds = col[idx] = []
+        return cmds
+
+
+# The waypoint database of all routes in the simulation
+routedb = RouteDatabase()
@@ -5,16 +5,19 @@ try:
 except ImportError:
     # In python <3.3 collections.abc doesn't exist
     from collections import Collection
+import os
 from math import *
 from random import randint
 import numpy as np
 
 import bluesky as bs
+from bluesky import stack
 from bluesky.core import Entity, timed_function
+from bluesky.core.trafficarrays import newcapacity
 from bluesky.stack import refdata
-from bluesky.stack.recorder import savecmd
+from bluesky.stack.recorder import savecmds
 from bluesky.tools import geo
-from bluesky.tools.misc import latlon2txt
+from bluesky.tools.misc import latlon2txt, txt2alt_array, txt2spd_array
 from bluesky.tools.aero import cas2tas, casormach2tas, fpm, kts, ft, g0, Rearth, nm, tas2cas,\
                          vatmos,  vtas2cas, vtas2mach, vcasormach
 
@@ -22,6 +25,7 @@ from bluesky.tools.aero import cas2tas, casormach2tas, fpm, kts, ft, g0, Rearth,
 from bluesky.traffic.asas import ConflictDetection, ConflictResolution
 from .windsim import WindSim
 from .conditional import Condition
+from .derivedstate import DerivedState
 from .trails import Trails
 from .adsbmodel import ADSB
 from .aporasas import APorASAS
@@ -34,6 +38,9 @@ from .performance.perfbase import PerfBase
 # Register settings defaults
 bs.settings.set_variable_defaults(performance_model='openap', asas_dt=1.0)
 
+# Columns of the aircraft files that are read by CREFILE
+crefields = ('acid', 'type', 'lat', 'lon', 'hdg', 'alt', 'spd')
+
 # if bs.settings.performance_model == 'bada':
 #     try:
 #         print('Using BADA Performance model')
@@ -75,6 +82,10 @@ class Traffic(Entity):
         self.setroot(self)
 
         self.ntraf = 0
+        self.nextuid = 0  # Unique id of the next aircraft to be created
+        self.idindex = dict()  # Index of each aircraft by callsign
+        self.scratchbufs = dict()  # Scratch arrays per dtype, see scratch()
+        self.derived = DerivedState()  # Atmosphere and trig of hdg/trk, computed once per step
 
         self.cond = Condition()  # Conditional commands list
         self.wind = WindSim()
@@ -88,6 +99,8 @@ class Traffic(Entity):
             # Aircraft Info
             self.id      = []  # identifier (string)
             self.type    = []  # aircaft type (string)
+            self.uid     = np.array([], dtype=np.int64)  # unique, stable id
+            self.deleted = np.array([], dtype=bool)  # queued for deletion
 
             # Positions
             self.lat     = np.array([])  # latitude [deg]
@@ -108,6 +121,7 @@ class Traffic(Entity):
 
             # Acceleration
             self.ax = np.array([])  # [m/s2] current longitudinal acceleration
+            self.az = np.array([])  # [m/s2] current vertical acceleration
 
             # Atmosphere
             self.p       = np.array([])  # air pressure [N/m2]
@@ -145,6 +159,7 @@ class Traffic(Entity):
 
             # Traffic autopilot data
             self.swhdgsel = np.array([], dtype=np.bool)  # determines whether aircraft is turning
+            self.swaltsel = np.array([], dtype=bool)  # determines whether aircraft is climbing/descending
 
             # Traffic autothrottle settings
             self.swats    = np.array([], dtype=np.bool)  # Switch indicating whether autothrottle system is on/off
@@ -165,6 +180,9 @@ class Traffic(Entity):
         ''' Clear all traffic data upon simulation reset. '''
         # Some child reset functions depend on a correct value of self.ntraf
         self.ntraf = 0
+        self.nextuid = 0
+        self.idindex.clear()
+        self.derived.clear()
         # This ensures that the traffic arrays (which size is dynamic)
         # are all reset as well, so all lat,lon,sdp etc but also objects adsb
         super().reset()
@@ -209,7 +227,7 @@ class Traffic(Entity):
 
         if isinstance(acid, str):
             # Check if not already exist
-            if self.id.count(acid.upper()) > 0:
+            if acid.upper() in self.idindex:
                 return False, acid + " already exists."  # already exists do nothing
             acid = n * [acid]
 
@@ -234,7 +252,10 @@ class Traffic(Entity):
 
         # Aircraft Info
         self.id[-n:]   = acid
+        self.idindex.update(zip(acid, range(self.ntraf - n, self.ntraf)))
         self.type[-n:] = actype
+        self.uid[-n:]  = np.arange(self.nextuid, self.nextuid + n)
+        self.nextuid  += n
 
         # Positions
         self.lat[-n:]  = aclat
@@ -284,23 +305,62 @@ class Traffic(Entity):
         self.create_children(n)
 
         # Record as individual CRE commands for repeatability
-        #print(self.ntraf-n,self.ntraf)
-        for j in range(self.ntraf-n,self.ntraf):
-            # Reconstruct CRE command
-            line = "CRE "+",".join([self.id[j],self.type[j],
-                                    str(self.lat[j]),str(self.lon[j]),
-                                    str(round(self.trk[j])),str(round(self.alt[j]/ft)),
-                                    str(round(self.cas[j]/kts))])
-            # Savecmd(cmd,line): line is saved, cmd is used to prevent recording PAN & ZOOM commands and CRE
-            # So insert a dummy command to record the line
-            savecmd("---",line)
+        # Savecmd(cmd,line): line is saved, cmd is used to prevent recording PAN & ZOOM commands and CRE
+        # So insert a dummy command to record the line. Lines are only
+        # constructed when recording.
+        savecmds("---", ("CRE " + ",".join([self.id[j], self.type[j],
+                                            str(self.lat[j]), str(self.lon[j]),
+                                            str(round(self.trk[j])), str(round(self.alt[j]/ft)),
+                                            str(round(self.cas[j]/kts))])
+                         for j in range(self.ntraf - n, self.ntraf)))
 
         # Check for crecmdlist: contains commands to be issued for this a/c
         # If any are there, then stack them for all aircraft
-        for j in range(self.ntraf - n, self.ntraf):
-            for cmdtxt in self.crecmdlist:
-                 bs.stack.stack(self.id[j]+" "+cmdtxt)
+        if self.crecmdlist:
+            bs.stack.stack(*(acid + " " + cmdtxt for acid in self.id[-n:]
+                             for cmdtxt in self.crecmdlist))
 
+    @stack.command(name='CREFILE')
+    def crefile(self, fname: 'word'):
+        """ Create aircraft in bulk from a file.
+
+            Arguments:
+            - fname: CSV file with one aircraft per line, with columns
+              acid,type,lat,lon,hdg,alt,spd (alt in ft or as FL, spd as CAS
+              in kts or as Mach number, as in the CRE command), or NumPy .npz file
+              with arrays of these names and units. Relative paths are
+              relative to the scenario folder.
+
+            From Python, arrays in SI units can be passed directly to cre. """
+        if not os.path.isabs(fname):
+            fname = os.path.join(bs.settings.scenario_path, fname)
+        try:
+            if fname.lower().endswith('.npz'):
+                with np.load(fname) as data:
+                    columns = [data[name] for name in crefields]
+            else:
+                columns = np.loadtxt(fname, dtype=str, delimiter=',',
+                                     comments='#', ndmin=2).T
+                if len(columns) != len(crefields):
+                    return False, f'CREFILE: Expected columns {",".join(crefields)} in {fname}'
+        except (OSError, KeyError, ValueError) as e:
+            return False, f'CREFILE: Could not read {fname}: {e}'
+
+        acid = [acid.strip().upper() for acid in columns[0]]
+        actype = [actype.strip().upper() for actype in columns[1]]
+        try:
+            lat, lon, hdg = (np.asarray(col, dtype=float) for col in columns[2:5])
+            # Altitudes and speeds are interpreted as in the CRE command
+            alt = txt2alt_array(columns[5])
+            spd = txt2spd_array(columns[6])
+        except ValueError as e:
+            return False, f'CREFILE: Could not read {fname}: {e}'
+
+        if len(set(acid)) < len(acid) or any(a in self.idindex for a in acid):
+            return False, 'CREFILE: Callsigns in file are not unique, or already exist'
+
+        self.cre(acid, actype, lat, lon, hdg, alt, spd)
+        return True, f'CREFILE: Created {len(acid)} aircraft'
 
     def creconfs(self, acid, actype, targetidx, dpsi, dcpa, tlosh, dH=None, tlosv=None, spd=None):
         ''' Create an aircraft in conflict with target aircraft.
@@ -378,25 +438,66 @@ class Traffic(Entity):
 
     def delete(self, idx):
         """Delete an aircraft"""
-        # If this is a multiple delete, sort first for list delete
-        # (which will use list in reverse order to avoid index confusion)
+        # If this is a multiple delete, convert to a sorted index array
         if isinstance(idx, Collection):
             idx = np.sort(idx)
 
+        # New index of each aircraft after the delete (-1 if deleted)
+        keep = np.ones(self.ntraf, dtype=bool)
+        keep[idx] = False
+        newidx = np.where(keep, np.cumsum(keep) - 1, -1)
+        delidx = np.flatnonzero(newidx < 0)
+        for i in delidx:
+            # Aircraft queued for deletion are already removed from idindex,
+            # and their callsign can be in use by a newer aircraft
+            if self.idindex.get(self.id[i]) == i:
+                del self.idindex[self.id[i]]
+
         # Call the actual delete function
         super().delete(idx)
 
         # Update number of aircraft
         self.ntraf = len(self.lat)
+
+        # Only aircraft after the first deleted one get a new index
+        if len(delidx):
+            first = delidx[0]
+            if self.deleted[first:].any():
+                self.idindex.update((self.id[i], i) for i in range(first, self.ntraf)
+                                    if not self.deleted[i])
+            else:
+                self.idindex.update(zip(self.id[first:], range(first, self.ntraf)))
+
+        # Inform objects that store aircraft indices
+        self.remap(newidx)
+        return True
+
+    def queuedelete(self, idx):
+        """Mark aircraft for deletion. Queued aircraft are deleted together,
+           with a single compaction of all traffic arrays and lists, after
+           stack processing and at the end of each timestep. Until then,
+           they can no longer be found by callsign, and the deleted mask is
+           used to exclude them from conflict detection and resolution,
+           conditional commands and performance calculations."""
+        idx = np.atleast_1d(np.asarray(idx, dtype=int))
+        for i in idx[~self.deleted[idx]]:
+            if self.idindex.get(self.id[i]) == i:
+                del self.idindex[self.id[i]]
+        self.deleted[idx] = True
         return True
 
+    def flushdelete(self):
+        """Delete all aircraft that are queued for deletion."""
+        if self.deleted.any():
+            self.delete(np.flatnonzero(self.deleted))
+
     def update(self):
         # Update only if there is traffic ---------------------
         if self.ntraf == 0:
             return
 
         #---------- Atmosphere --------------------------------
-        self.p, self.rho, self.Temp = vatmos(self.alt)
+        self.p[:], self.rho[:], self.Temp[:] = self.derived.atmos(self.alt)
 
         #---------- ADSB Update -------------------------------
         self.adsb.update()
@@ -410,7 +511,7 @@ class Traffic(Entity):
         self.perf.update()
 
         #---------- Limit commanded speeds based on performance ------------------------------
-        self.aporasas.tas, self.aporasas.vs, self.aporasas.alt = \
+        self.aporasas.tas[:], self.aporasas.vs[:], self.aporasas.alt[:] = \
             self.perf.limits(self.aporasas.tas, self.aporasas.vs,
                              self.aporasas.alt, self.ax)
 
@@ -435,94 +536,169 @@ class Traffic(Entity):
         self.cr.update(self.cd, self, self)
 
     def update_airspeed(self):
+        # All intermediate results are written to preallocated scratch
+        # arrays, and the traffic arrays are updated in place
+        simdt = bs.sim.simdt
+        tmp1, tmp2, tmp3, tmp4 = self.scratch(4)
+        mask, = self.scratch(1, bool)
+
         # Compute horizontal acceleration
-        delta_spd = self.aporasas.tas - self.tas
-        need_ax = np.abs(delta_spd) > np.abs(bs.sim.simdt * self.perf.axmax)
-        self.ax = need_ax * np.sign(delta_spd) * self.perf.axmax
+        delta_spd = np.subtract(self.aporasas.tas, self.tas, out=tmp1)
+        np.abs(np.multiply(simdt, self.perf.axmax, out=tmp2), out=tmp2)
+        need_ax = np.greater(np.abs(delta_spd, out=tmp3), tmp2, out=mask)
+        np.multiply(np.multiply(need_ax, np.sign(delta_spd, out=tmp2), out=tmp2),
+                    self.perf.axmax, out=self.ax)
         # Update velocities
-        self.tas = np.where(need_ax, self.tas + self.ax * bs.sim.simdt, self.aporasas.tas)
-        self.cas = vtas2cas(self.tas, self.alt)
-        self.M = vtas2mach(self.tas, self.alt)
+        np.add(self.tas, np.multiply(self.ax, simdt, out=tmp1), out=tmp1)
+        np.copyto(self.tas, self.aporasas.tas)
+        np.copyto(self.tas, tmp1, where=need_ax)
+        atmos = self.derived.atmos(self.alt)
+        self.cas[:] = vtas2cas(self.tas, self.alt, atmos)
+        self.M[:] = vtas2mach(self.tas, self.alt, atmos)
 
         # Turning
-        turnrate = np.degrees(g0 * np.tan(np.where(self.ap.turnphi>self.eps,self.ap.turnphi,self.ap.bankdef) \
-                                          / np.maximum(self.tas, self.eps)))
-        delhdg = (self.aporasas.hdg - self.hdg + 180) % 360 - 180  # [deg]
-        self.swhdgsel = np.abs(delhdg) > np.abs(bs.sim.simdt * turnrate)
+        np.copyto(tmp1, self.ap.bankdef)
+        np.copyto(tmp1, self.ap.turnphi, where=np.greater(self.ap.turnphi, self.eps, out=mask))
+        turnrate = np.divide(tmp1, np.maximum(self.tas, self.eps, out=tmp2), out=tmp1)
+        np.degrees(np.multiply(g0, np.tan(turnrate, out=turnrate), out=turnrate), out=turnrate)
+        delhdg = np.subtract(self.aporasas.hdg, self.hdg, out=tmp2)
+        np.subtract(np.remainder(np.add(delhdg, 180, out=delhdg), 360, out=delhdg),
+                    180, out=delhdg)  # [deg]
+        dhdg = np.multiply(simdt, turnrate, out=tmp1)
+        np.greater(np.abs(delhdg, out=tmp3), np.abs(dhdg, out=tmp4), out=self.swhdgsel)
 
         # Update heading
-        self.hdg = np.where(self.swhdgsel, 
-                            self.hdg + bs.sim.simdt * turnrate * np.sign(delhdg), self.aporasas.hdg) % 360.0
+        np.multiply(dhdg, np.sign(delhdg, out=tmp4), out=tmp3)
+        np.add(self.hdg, tmp3, out=tmp3)
+        np.copyto(self.hdg, self.aporasas.hdg)
+        np.copyto(self.hdg, tmp3, where=self.swhdgsel)
+        np.remainder(self.hdg, 360.0, out=self.hdg)
 
         # Update vertical speed (alt select, capture and hold autopilot mode)
-        delta_alt = self.aporasas.alt - self.alt
+        delta_alt = np.subtract(self.aporasas.alt, self.alt, out=tmp1)
         # Old dead band version:
         #        self.swaltsel = np.abs(delta_alt) > np.maximum(
         #            10 * ft, np.abs(2 * bs.sim.simdt * self.vs))
 
         # Update version: time based engage of altitude capture (to adapt for UAV vs airliner scale)
-        self.swaltsel = np.abs(delta_alt) >  1.05*np.maximum(np.abs(bs.sim.simdt * self.aporasas.vs), \
-                                                         np.abs(bs.sim.simdt * self.vs))
-        target_vs = self.swaltsel * np.sign(delta_alt) * np.abs(self.aporasas.vs)
-        delta_vs = target_vs - self.vs
-        # print(delta_vs / fpm)
-        need_az = np.abs(delta_vs) > 300 * fpm   # small threshold
-        self.az = need_az * np.sign(delta_vs) * (300 * fpm)   # fixed vertical acc approx 1.6 m/s^2
-        self.vs = np.where(need_az, self.vs+self.az*bs.sim.simdt, target_vs)
-        self.vs = np.where(np.isfinite(self.vs), self.vs, 0)    # fix vs nan issue
+        np.maximum(np.abs(np.multiply(simdt, self.aporasas.vs, out=tmp2), out=tmp2),
+                   np.abs(np.multiply(simdt, self.vs, out=tmp3), out=tmp3), out=tmp2)
+        np.greater(np.abs(delta_alt, out=tmp3), np.multiply(1.05, tmp2, out=tmp2),
+                   out=self.swaltsel)
+        target_vs = np.multiply(self.swaltsel, np.sign(delta_alt, out=tmp1), out=tmp1)
+        np.multiply(target_vs, np.abs(self.aporasas.vs, out=tmp2), out=target_vs)
+        delta_vs = np.subtract(target_vs, self.vs, out=tmp2)
+        need_az = np.greater(np.abs(delta_vs, out=tmp3), 300 * fpm, out=mask)   # small threshold
+        np.multiply(np.multiply(need_az, np.sign(delta_vs, out=tmp3), out=tmp3),
+                    300 * fpm, out=self.az)   # fixed vertical acc approx 1.6 m/s^2
+        np.add(self.vs, np.multiply(self.az, simdt, out=tmp3), out=tmp3)
+        np.copyto(self.vs, target_vs)
+        np.copyto(self.vs, tmp3, where=need_az)
+        np.copyto(self.vs, 0.0, where=np.logical_not(np.isfinite(self.vs, out=mask), out=mask))    # fix vs nan issue
 
     def update_groundspeed(self):
         # Compute ground speed and track from heading, airspeed and wind
+        tmp1, tmp2 = self.scratch(2)
+        sinhdg, coshdg = self.derived.sincos(self.hdg)
+        np.multiply(self.tas, coshdg, out=self.gsnorth)
+        np.multiply(self.tas, sinhdg, out=self.gseast)
         if self.wind.winddim == 0:  # no wind
-            self.gsnorth  = self.tas * np.cos(np.radians(self.hdg))
-            self.gseast   = self.tas * np.sin(np.radians(self.hdg))
-
-            self.gs  = self.tas
-            self.trk = self.hdg
+            np.copyto(self.gs, self.tas)
+            np.copyto(self.trk, self.hdg)
             self.windnorth[:], self.windeast[:] = 0.0,0.0
 
         else:
-            applywind = self.alt>50.*ft # Only apply wind when airborne
+            applywind, noapplywind = self.scratch(2, bool)
+            np.greater(self.alt, 50.*ft, out=applywind) # Only apply wind when airborne
+            np.logical_not(applywind, out=noapplywind)
 
             vnwnd,vewnd = self.wind.getdata(self.lat, self.lon, self.alt)
             self.windnorth[:], self.windeast[:] = vnwnd,vewnd
-            self.gsnorth  = self.tas * np.cos(np.radians(self.hdg)) + self.windnorth*applywind
-            self.gseast   = self.tas * np.sin(np.radians(self.hdg)) + self.windeast*applywind
+            self.gsnorth += np.multiply(self.windnorth, applywind, out=tmp1)
+            self.gseast  += np.multiply(self.windeast, applywind, out=tmp1)
 
-            self.gs  = np.logical_not(applywind)*self.tas + \
-                       applywind*np.sqrt(self.gsnorth**2 + self.gseast**2)
+            np.add(np.square(self.gsnorth, out=tmp1), np.square(self.gseast, out=tmp2), out=tmp1)
+            np.multiply(applywind, np.sqrt(tmp1, out=tmp1), out=tmp1)
+            np.add(np.multiply(noapplywind, self.tas, out=tmp2), tmp1, out=self.gs)
 
-            self.trk = np.logical_not(applywind)*self.hdg + \
-                       applywind*np.degrees(np.arctan2(self.gseast, self.gsnorth)) % 360.
-
-        self.work += (self.perf.thrust * bs.sim.simdt * np.sqrt(self.gs * self.gs + self.vs * self.vs))
+            trk = np.degrees(np.arctan2(self.gseast, self.gsnorth, out=tmp1), out=tmp1)
+            np.remainder(np.multiply(applywind, trk, out=tmp1), 360., out=tmp1)
+            np.add(np.multiply(noapplywind, self.hdg, out=tmp2), tmp1, out=self.trk)
 
+        np.add(np.multiply(self.gs, self.gs, out=tmp1), np.multiply(self.vs, self.vs, out=tmp2), out=tmp1)
+        np.multiply(np.multiply(self.perf.thrust, bs.sim.simdt, out=tmp2),
+                    np.sqrt(tmp1, out=tmp1), out=tmp1)
+        self.work += tmp1
 
     def update_pos(self):
         # Update position
-        self.alt = np.where(self.swaltsel, np.round(self.alt + self.vs * bs.sim.simdt, 6), self.aporasas.alt)
-        self.lat = self.lat + np.degrees(bs.sim.simdt * self.gsnorth / Rearth)
-        self.coslat = np.cos(np.deg2rad(self.lat))
-        self.lon = self.lon + np.degrees(bs.sim.simdt * self.gseast / self.coslat / Rearth)
-        self.distflown += self.gs * bs.sim.simdt
+        simdt = bs.sim.simdt
+        tmp1, = self.scratch(1)
+        np.round(np.add(self.alt, np.multiply(self.vs, simdt, out=tmp1), out=tmp1), 6, out=tmp1)
+        np.copyto(self.alt, self.aporasas.alt)
+        np.copyto(self.alt, tmp1, where=self.swaltsel)
+        np.divide(np.multiply(simdt, self.gsnorth, out=tmp1), Rearth, out=tmp1)
+        self.lat += np.degrees(tmp1, out=tmp1)
+        np.cos(np.deg2rad(self.lat, out=self.coslat), out=self.coslat)
+        np.divide(np.multiply(simdt, self.gseast, out=tmp1), self.coslat, out=tmp1)
+        self.lon += np.degrees(np.divide(tmp1, Rearth, out=tmp1), out=tmp1)
+        self.distflown += np.multiply(self.gs, simdt, out=tmp1)
+
+    def scratch(self, n, dtype=float):
+        """Returns n scratch arrays of size ntraf for intermediate results.
+           Their storage is reused between calls, so the arrays are only
+           valid until the next call with the same dtype."""
+        buf = self.scratchbufs.get(dtype)
+        if buf is None or buf.shape[0] < n or buf.shape[1] < self.ntraf:
+            shape = (n, newcapacity(self.ntraf)) if buf is None else \
+                (max(n, buf.shape[0]), max(buf.shape[1], newcapacity(self.ntraf)))
+            buf = self.scratchbufs[dtype] = np.empty(shape, dtype=dtype)
+        return list(buf[:n, :self.ntraf])
 
     def id2idx(self, acid):
-        """Find index of aircraft id"""
+        """Find index of aircraft id (-1 if not found). For multiple id's
+           an integer numpy array of indices is returned, not a list (use
+           tolist() where list methods are needed)."""
         if not isinstance(acid, str):
             # id2idx is called for multiple id's
-            # Fast way of finding indices of all ACID's in a given list
-            tmp = dict((v, i) for i, v in enumerate(self.id))
-            return [tmp.get(acidi, -1) for acidi in acid]
+            get = self.idindex.get
+            return np.array([get(acidi, -1) for acidi in acid], dtype=int)
         else:
              # Catch last created id (* or # symbol)
+             # that is not queued for deletion
             if acid in ('#', '*'):
-                return self.ntraf - 1
-
-            try:
-                return self.id.index(acid.upper())
-            except:
+                for idx in range(self.ntraf - 1, -1, -1):
+                    if not self.deleted[idx]:
+                        return idx
                 return -1
 
+            return self.idindex.get(acid.upper(), -1)
+
+    def rename(self, idx, newid):
+        """Change the callsign of aircraft idx"""
+        newid = newid.upper()
+        if newid in self.idindex:
+            return False, newid + " already exists."
+        oldid = self.id[idx]
+        del self.idindex[oldid]
+        self.idindex[newid] = idx
+        self.id[idx] = newid
+
+        # Update the other lookups by callsign
+        self.ap.route[idx].rename(newid)
+        uid = int(self.uid[idx])
+        if uid in self.cd.uid2id:
+            self.cd.uid2id[uid] = newid
+        return True
+
+    def uid2idx(self, uid):
+        """Find indices of aircraft with unique id(s) uid (-1 if not found)"""
+        if self.ntraf == 0:
+            return np.full(np.shape(uid), -1)
+        # Aircraft are always appended, so uids are sorted
+        idx = np.minimum(np.searchsorted(self.uid, uid), self.ntraf - 1)
+        return np.where(self.uid[idx] == uid, idx, -1)
+
     def setnoise(self, noise=None):
         """Noise (turbulence, ADBS-transmission noise, ADSB-truncated effect)"""
         if noise is None:
@@ -1,9 +1,13 @@
 """ Create aircraft trails on the radar display."""
-from math import *
 import numpy as np
 import bluesky as bs
-from bluesky import settings
 from bluesky.core import TrafficArrays
+from bluesky.core.trafficarrays import newcapacity
+
+
+# Maximum number of stored trail segments, and maximum age [s] of a trail
+# segment (0 = no maximum age)
+bs.settings.set_variable_defaults(trails_maxseg=1000000, trails_maxage=0.0)
 
 
 class Trails(TrafficArrays):
@@ -15,6 +19,12 @@ class Trails(TrafficArrays):
 
     Members: see create
 
+    Trail segments are stored in a ring buffer with a capacity of
+    settings.trails_maxseg segments. When it is full, the oldest segments
+    are overwritten. Segments are counted from the start of the simulation,
+    and the foreground/background (pygame) and unsent (QtGL) segments are
+    kept as ranges of this count.
+
     Created by  : Jacco M. Hoekstra
     """
 
@@ -34,162 +44,162 @@ class Trails(TrafficArrays):
         # Set default color to Blue
         self.defcolor = self.colorList['CYAN']
 
-        # Foreground data on line pieces
-        self.lat0 = np.array([])
-        self.lon0 = np.array([])
-        self.lat1 = np.array([])
-        self.lon1 = np.array([])
-        self.time = np.array([])
-        self.col  = []
-        self.fcol = np.array([])
-
-        # background copy of data
-        self.bglat0 = np.array([])
-        self.bglon0 = np.array([])
-        self.bglat1 = np.array([])
-        self.bglon1 = np.array([])
-        self.bgtime = np.array([])
-        self.bgcol = []
+        # Ring buffer with line pieces
+        self.maxseg = bs.settings.trails_maxseg  # Maximum number of segments
+        self.maxage = bs.settings.trails_maxage  # [s] Maximum age of a segment
+        self.seglat0 = np.array([])
+        self.seglon0 = np.array([])
+        self.seglat1 = np.array([])
+        self.seglon1 = np.array([])
+        self.segtime = np.array([])
+        self.segcol  = np.zeros((0, 3), dtype=int)
 
         with self.settrafarrays():
-            self.accolor = []
+            self.accolor = np.zeros((0, 3), dtype=int)
             self.lastlat = np.array([])
             self.lastlon = np.array([])
             self.lasttim = np.array([])
 
-        self.clearnew()
+        self.clear()
 
         return
 
     def create(self,n=1):
         super().create(n)
 
-        self.accolor[-1] = self.defcolor
-        self.lastlat[-1] = bs.traf.lat[-1]
-        self.lastlon[-1] = bs.traf.lon[-1]
+        self.accolor[-n:] = self.defcolor
+        self.lastlat[-n:] = bs.traf.lat[-n:]
+        self.lastlon[-n:] = bs.traf.lon[-n:]
 
     def update(self):
-        self.acid    = bs.traf.id
         if not self.active:
-            self.lastlat = bs.traf.lat
-            self.lastlon = bs.traf.lon
+            self.lastlat[:] = bs.traf.lat
+            self.lastlon[:] = bs.traf.lon
             self.lasttim[:] = bs.sim.simt
             return
         """Add linepieces for trails based on traffic data"""
 
-        # Use temporary list/array for fast append
-        lstlat0 = []
-        lstlon0 = []
-        lstlat1 = []
-        lstlon1 = []
-        lsttime = []
-
-        # Check for update
-        delta = bs.sim.simt - self.lasttim
-        idxs = np.where(delta > self.dt)[0]
-
-        # Add all a/c which need the update
-        # if len(idxs)>0:
-        #     print "len(idxs)=",len(idxs)
-
-        for i in idxs:
-            # Add to lists
-            lstlat0.append(self.lastlat[i])
-            lstlon0.append(self.lastlon[i])
-            lstlat1.append(bs.traf.lat[i])
-            lstlon1.append(bs.traf.lon[i])
-            lsttime.append(bs.sim.simt)
-
-            if isinstance(self.col, np.ndarray):
-                # print type(trailcol[i])
-                # print trailcol[i]
-                # print "col type: ",type(self.col)
-                self.col = self.col.tolist()
-
-            type(self.col)
-            self.col.append(self.accolor[i])
+        # Add a segment for all a/c which need the update
+        idxs = np.flatnonzero(bs.sim.simt - self.lasttim > self.dt)
+        if len(idxs) > 0:
+            self.addsegments(self.lastlat[idxs], self.lastlon[idxs],
+                             bs.traf.lat[idxs], bs.traf.lon[idxs],
+                             self.accolor[idxs])
 
             # Update aircraft record
-            self.lastlat[i] = bs.traf.lat[i]
-            self.lastlon[i] = bs.traf.lon[i]
-            self.lasttim[i] = bs.sim.simt
-
-        # When a/c is no longer part of trail semgment,
-        # it is no longer a/c data => move to the GUI buffer (send or draw)
-        if self.pygame:
-            # Pygame: send to drawing buffer
-            self.lat0 = np.concatenate((self.lat0, np.array(lstlat0)))
-            self.lon0 = np.concatenate((self.lon0, np.array(lstlon0)))
-            self.lat1 = np.concatenate((self.lat1, np.array(lstlat1)))
-            self.lon1 = np.concatenate((self.lon1, np.array(lstlon1)))
-            self.time = np.concatenate((self.time, np.array(lsttime)))
-        else:
-            # QtGL: add to send buffer
-            self.newlat0.extend(lstlat0)
-            self.newlon0.extend(lstlon0)
-            self.newlat1.extend(lstlat1)
-            self.newlon1.extend(lstlon1)
-        # Update colours
-        self.fcol = (1. - np.minimum(self.tcol0, np.abs(bs.sim.simt - self.time)) / self.tcol0)
-
-        return
+            self.lastlat[idxs] = bs.traf.lat[idxs]
+            self.lastlon[idxs] = bs.traf.lon[idxs]
+            self.lasttim[idxs] = bs.sim.simt
+
+        # Remove segments that are too old
+        if self.maxage > 0.0 and self.nseg > 0:
+            self.evict(bs.sim.simt - self.maxage)
+
+    def addsegments(self, lat0, lon0, lat1, lon1, col):
+        """Add line pieces to the ring buffer, overwriting the oldest
+           pieces when it is full"""
+        n = len(lat0)
+        if n > self.maxseg:
+            lat0, lon0, lat1, lon1 = lat0[-self.maxseg:], lon0[-self.maxseg:], \
+                lat1[-self.maxseg:], lon1[-self.maxseg:]
+            col = col[-self.maxseg:]
+            self.nadded += n - self.maxseg
+            n = self.maxseg
+
+        # Grow ring buffer until it reaches its maximum capacity
+        if self.nseg + n > len(self.seglat0) < self.maxseg:
+            self.grow(min(self.maxseg, newcapacity(self.nseg + n)))
+
+        idx = self.ringidx(self.nadded, self.nadded + n)
+        self.seglat0[idx] = lat0
+        self.seglon0[idx] = lon0
+        self.seglat1[idx] = lat1
+        self.seglon1[idx] = lon1
+        self.segtime[idx] = bs.sim.simt
+        self.segcol[idx]  = col
+        self.nadded += n
+
+        # Segments that were overwritten are no longer in the buffer
+        nover = max(0, self.nseg + n - len(self.seglat0))
+        self.istart = (self.istart + nover) % len(self.seglat0)
+        self.nseg += n - nover
+
+    def grow(self, size):
+        """Reallocate the ring buffer with given size, oldest segment first"""
+        idx = self.ringidx(self.nadded - self.nseg, self.nadded)
+        for name in ('seglat0', 'seglon0', 'seglat1', 'seglon1', 'segtime', 'segcol'):
+            arr = getattr(self, name)
+            new = np.zeros((size,) + arr.shape[1:], dtype=arr.dtype)
+            new[:self.nseg] = arr[idx]
+            setattr(self, name, new)
+        self.istart = 0
+
+    def evict(self, tmin):
+        """Remove all segments created before tmin"""
+        # Segment times increase in order of addition, so they are sorted
+        # within the (at most two) contiguous parts of the ring buffer
+        iend = self.istart + self.nseg
+        nevict = np.searchsorted(self.segtime[self.istart:iend], tmin)
+        if self.istart + nevict == len(self.segtime):
+            nevict += np.searchsorted(self.segtime[:max(0, iend - len(self.segtime))], tmin)
+        self.istart = (self.istart + nevict) % len(self.segtime)
+        self.nseg -= nevict
+
+    def ringidx(self, start, stop):
+        """Indices in the ring buffer of the segments with number start up to
+           stop, counted from the first segment added"""
+        first = max(start, self.nadded - self.nseg) - (self.nadded - self.nseg)
+        last = stop - (self.nadded - self.nseg)
+        return (self.istart + np.arange(first, max(first, last))) % max(1, len(self.seglat0))
+
+    def getsegments(self, name, start, stop=None):
+        """Segment data from segment number start up to stop (default: up to
+           and including the newest segment)"""
+        return getattr(self, name)[self.ringidx(start, self.nadded if stop is None else stop)]
+
+    # Foreground (pygame): segments that were added since the last buffer()
+    lat0 = property(lambda self: self.getsegments('seglat0', self.ifg))
+    lon0 = property(lambda self: self.getsegments('seglon0', self.ifg))
+    lat1 = property(lambda self: self.getsegments('seglat1', self.ifg))
+    lon1 = property(lambda self: self.getsegments('seglon1', self.ifg))
+    time = property(lambda self: self.getsegments('segtime', self.ifg))
+    col  = property(lambda self: self.getsegments('segcol', self.ifg))
+
+    # Background (pygame): segments before the last buffer()
+    bglat0 = property(lambda self: self.getsegments('seglat0', 0, self.ifg))
+    bglon0 = property(lambda self: self.getsegments('seglon0', 0, self.ifg))
+    bglat1 = property(lambda self: self.getsegments('seglat1', 0, self.ifg))
+    bglon1 = property(lambda self: self.getsegments('seglon1', 0, self.ifg))
+    bgtime = property(lambda self: self.getsegments('segtime', 0, self.ifg))
+    bgcol  = property(lambda self: self.getsegments('segcol', 0, self.ifg))
+
+    # Send buffer (QtGL): segments that were added since the last clearnew()
+    newlat0 = property(lambda self: self.getsegments('seglat0', self.isent))
+    newlon0 = property(lambda self: self.getsegments('seglon0', self.isent))
+    newlat1 = property(lambda self: self.getsegments('seglat1', self.isent))
+    newlon1 = property(lambda self: self.getsegments('seglon1', self.isent))
+
+    @property
+    def nnew(self):
+        """Number of segments that were not sent yet"""
+        return min(self.nseg, self.nadded - self.isent)
 
     def buffer(self):
         """Buffer trails: Move current stack to background """
-
-        self.bglat0 = np.append(self.bglat0, self.lat0)
-        self.bglon0 = np.append(self.bglon0, self.lon0)
-        self.bglat1 = np.append(self.bglat1, self.lat1)
-        self.bglon1 = np.append(self.bglon1, self.lon1)
-        self.bgtime = np.append(self.bgtime, self.time)
-
-        # No color saved: Background: always 'old color' self.col0
-        if isinstance(self.bgcol, np.ndarray):
-            self.bgcol = self.bgcol.tolist()
-        if isinstance(self.col, np.ndarray):
-            self.col = self.col.tolist()
-
-        self.bgcol = self.bgcol + self.col
-        self.bgacid = self.bgacid + self.acid
-
-        self.clearfg()  # Clear foreground trails
+        self.ifg = self.nadded
         return
 
     def clearnew(self):
         # Clear new lines pipeline used for QtGL
-        self.newlat0 = []
-        self.newlon0 = []
-        self.newlat1 = []
-        self.newlon1 = []
-
-
-    def clearfg(self):  # Foreground
-        """Clear trails foreground"""
-        self.lat0 = np.array([])
-        self.lon0 = np.array([])
-        self.lat1 = np.array([])
-        self.lon1 = np.array([])
-        self.time = np.array([])
-        self.col = np.array([])
-        return
-
-    def clearbg(self):  # Background
-        """Clear trails background"""
-        self.bglat0 = np.array([])
-        self.bglon0 = np.array([])
-        self.bglat1 = np.array([])
-        self.bglon1 = np.array([])
-        self.bgtime = np.array([])
-        self.bgacid = []
-        return
+        self.isent = self.nadded
 
     def clear(self):
         """Clear all data, Foreground and background"""
-        self.lastlon = np.array([])
-        self.lastlat = np.array([])
-        self.clearfg()
-        self.clearbg()
-        self.clearnew()
+        self.istart = 0  # Index in ring buffer of the oldest segment
+        self.nseg   = 0  # Number of segments in ring buffer
+        self.nadded = 0  # Number of segments added since the start
+        self.ifg    = 0  # Number of the first foreground segment (pygame)
+        self.isent  = 0  # Number of the first unsent segment (QtGL)
         return
 
     def setTrails(self, *args):
@@ -1,10 +1,16 @@
 """ Wind implementation for BlueSky."""
 from numpy import array, sin, cos, arange, radians, ones, append, ndarray, \
                   minimum, repeat, delete, zeros, maximum, floor, interp, \
-                  pi, concatenate, unique
+                  pi, concatenate, unique, stack, diff
 from scipy.interpolate import interp1d, RegularGridInterpolator
+from scipy.spatial import cKDTree
+from bluesky import settings
 from bluesky.tools.aero import ft
 
+# Number of nearest wind definition points used for inverse distance
+# interpolation of a wind field that is not a regular grid
+settings.set_variable_defaults(wind_knn=16)
+
 class Windfield():
     """ Windfield class:
         Methods:
@@ -23,6 +29,14 @@ class Windfield():
 
             remove(idx) = remove a defined profile using the index
 
+        Interpolation:
+            A field that consists of one regular lat/lon grid with altitude
+            profiles (addpointvne) is interpolated linearly on its grid.
+            Otherwise, the wind is interpolated with inverse distance squared
+            weights of the settings.wind_knn nearest definition points,
+            found with a k-d tree. The cost per call then scales with
+            npos * wind_knn, instead of npos * nvec.
+
         Members:
             lat(nvec)          = latitudes of wind definitions
             lon(nvec)          = longitudes of wind definitions
@@ -65,8 +79,8 @@ class Windfield():
         self.vnorth  = array([[]])
         self.veast   = array([[]])
         self.nvec    = 0
-        self.fe      = None
-        self.fn      = None
+        self.fgrid   = None  # Interpolator of a gridded field (alt, lat, lon)
+        self.tree    = None  # k-d tree of the definition points
         return
 
     def addpointvne(self, lat, lon, vnorth, veast, windalt=None):
@@ -74,6 +88,9 @@ class Windfield():
             wind speed [m/s] in north and east component. 
             Optionally an array with altitudes can be used
         """              
+        self.ungrid()
+        self.tree = None
+
         if windalt is not None and len(windalt) > 1:           
             # Set altitude interpolation functions
             fnorth = interp1d(windalt, vnorth.T, bounds_error=False, 
@@ -81,31 +98,23 @@ class Windfield():
             feast  = interp1d(windalt, veast.T, bounds_error=False, 
                               fill_value=(veast[0], veast[-1]), assume_sorted=True)
                        
-            # Assume regular grid and set RGI for interpolation
-            if len(lat) > 3: 
-                try:
-                    # Interpolate along windalt axis
-                    altaxis = concatenate((array([0.]), windalt))
-                    vnaxis = fnorth(altaxis).T
-                    veaxis = feast(altaxis).T
-                    
-                    # Get unique latitudes and longitudes for RGI
-                    lats = unique(lat)
-                    lons = unique(lon)
-                    
-                    # Set RGI interpolation functions
-                    vevalues = veaxis.reshape((len(altaxis), len(lats), len(lons)))
-                    vnvalues = vnaxis.reshape((len(altaxis), len(lats), len(lons)))
-                    self.fe = RegularGridInterpolator((altaxis, lats, lons), 
-                                                      vevalues, bounds_error=False, fill_value=0.)
-                    self.fn = RegularGridInterpolator((altaxis, lats, lons), 
-                                                      vnvalues, bounds_error=False, fill_value=0.) 
-                except:
-                    # Create vn, ve if RGI is not possible
-                    vnaxis = fnorth(self.altaxis).T
-                    veaxis = feast(self.altaxis).T
+            # Keep the grid structure when the field is one regular grid
+            altaxis = concatenate((array([0.]), windalt))
+            grid = self.gridindex(lat, lon) if self.nvec == 0 else None
+            if grid is not None and (diff(altaxis) > 0.).all():
+                # Interpolate along windalt axis
+                vnaxis = fnorth(altaxis).T
+                veaxis = feast(altaxis).T
+
+                # Set grid interpolation function for both components
+                lats, lons, ilat, ilon = grid
+                values = zeros((len(altaxis), len(lats), len(lons), 2))
+                values[:, ilat, ilon, 0] = vnaxis
+                values[:, ilat, ilon, 1] = veaxis
+                self.fgrid = RegularGridInterpolator((altaxis, lats, lons), values,
+                                                     bounds_error=False, fill_value=0.)
             else:
-                # Create vn, ve if less than 4 coords are present
+                # Create vn, ve on the fixed altitude axis
                 vnaxis = fnorth(self.altaxis).T
                 veaxis = feast(self.altaxis).T
         
@@ -136,6 +145,8 @@ class Windfield():
             Optionally an array with altitudes can be used in which case windspd
             and wind speed need to have the same dimension
         """
+        self.ungrid()
+        self.tree = None
 
         # If scalar, copy into table for altitude axis
         if not(type(windalt) in [ndarray,list]) and windalt == None: # scalar to array
@@ -183,8 +194,6 @@ class Windfield():
         return idx # return index of added point
     
     def getdata(self,userlat,userlon,useralt=0.0): # in case no altitude specified and field is 3D, use sea level wind
-        eps = 1e-20 # [m2] to avoid divison by zero for using exact same points
-
         swvector = (type(userlat)==list or type(userlat)==ndarray)
         if swvector:
             npos = len(userlat)
@@ -204,10 +213,9 @@ class Windfield():
         else:
             alt = zeros(npos)
 
-        # Check if RGI functions are present, if so use them for interpolation
-        if self.fe is not None and self.fn is not None:
-            vnorth = self.fn(concatenate((alt.reshape(1,-1), lat, lon), axis=0).T)
-            veast  = self.fe(concatenate((alt.reshape(1,-1), lat, lon), axis=0).T)
+        # Check if the field is gridded, if so interpolate on the grid
+        if self.fgrid is not None:
+            vnorth, veast = self.fgrid(concatenate((alt.reshape(1,-1), lat, lon), axis=0).T).T
         else:
             # Check dimension of wind field
             if self.winddim == 0:   # None = no wind
@@ -220,53 +228,36 @@ class Windfield():
     
             elif self.winddim >= 2: # 2D/3D field = more points defined but no altitude profile
     
-                #---- Get horizontal weight factors
-    
-                # Average cosine for flat-eartyh approximation
-                cavelat = cos(radians(0.5*(lat+array([self.lat]).transpose())))
-    
-                # Lat and lon distance in 60 nm units (1 lat degree)
-                dy = lat - array([self.lat]).transpose() #(nvec,npos)
-                dx = cavelat*(lon - array([self.lon]).transpose())
-    
-                # Calulate invesre distance squared
-                invd2   = 1./(eps+dx*dx+dy*dy) # inverse of distance squared
-    
-                # Normalize weights
-                sumsid2 = ones((1,self.nvec)).dot(invd2) # totals to normalize weights
-                totals = repeat(sumsid2,self.nvec,axis=0) # scale up dims to (nvec,npos)
-                
-                horfact = invd2/totals # rows x col = nvec x npos, weight factors
+                #---- Get horizontal weight factors of the nearest points (npos x k)
+                ivec, horfact = self.knnweights(lat.reshape(npos), lon.reshape(npos))
     
                 #---- Altitude interpolation
     
                 # No altitude profiles used: do 2D planar interpolation only
                 if self.winddim == 2 or ((type(useralt) not in (list,ndarray)) and useralt==0.0): # 2D field no altitude interpolation
-                    vnorth  = self.vnorth[0,:].dot(horfact)
-                    veast   = self.veast[0,:].dot(horfact)
+                    vnorth  = (self.vnorth[0, ivec] * horfact).sum(axis=1)
+                    veast   = (self.veast[0, ivec] * horfact).sum(axis=1)
     
                 # 3D interpolation as one or more points contain altitude profile
                 else:
     
                     # Get altitude index as float for alt interpolation
-                    idxalt = maximum(0., minimum(self.altaxis[-1]-eps, alt) / self.altstep) # find right index
+                    idxalt = maximum(0., minimum(self.altaxis[-1], alt) / self.altstep) # find right index
     
                     # Convert to index and factor
-                    ialt   = floor(idxalt).astype(int) # index array for lower altitude
+                    ialt   = minimum(floor(idxalt).astype(int), self.nalt - 2) # index array for lower altitude
                     falt   = idxalt-ialt  # factor for upper value
-    
-                    # Altitude interpolation combined with horizontal
-                    nvec   = len(self.lon) # Get number of definition points
+                    ialt   = ialt.reshape(npos, 1)
     
                     # North wind (y-direction ot lat direction)
-                    vn0    = (self.vnorth[ialt,:]*horfact.T).dot(ones((nvec,1))) # hor interpolate lower alt (npos x)
-                    vn1    = (self.vnorth[ialt+1,:]*horfact.T).dot(ones((nvec,1))) # hor interpolate lower alts (npos x)
-                    vnorth = (1.-falt)*(vn0.reshape(npos)) + falt*(vn1.reshape(npos)) # As 1D array
+                    vn0    = (self.vnorth[ialt, ivec] * horfact).sum(axis=1) # hor interpolate lower alt (npos)
+                    vn1    = (self.vnorth[ialt + 1, ivec] * horfact).sum(axis=1) # hor interpolate upper alt (npos)
+                    vnorth = (1.-falt)*vn0 + falt*vn1
     
                     # East wind (x-direction or lon direction)
-                    ve0    = (self.veast[ialt,:]*horfact.T).dot(ones((nvec,1)))
-                    ve1    = (self.veast[ialt+1,:]*horfact.T).dot(ones((nvec,1)))
-                    veast  = (1.-falt)*(ve0.reshape(npos)) + falt*(ve1.reshape(npos)) # As 1D array
+                    ve0    = (self.veast[ialt, ivec] * horfact).sum(axis=1)
+                    ve1    = (self.veast[ialt + 1, ivec] * horfact).sum(axis=1)
+                    veast  = (1.-falt)*ve0 + falt*ve1
 
         # Return same type as positons were given
         if type(userlat)==ndarray:
@@ -278,10 +269,63 @@ class Windfield():
         else:
             return float(vnorth),float(veast)
 
+    def knnweights(self, lat, lon):
+        """ Get the indices of the nearest wind definition points (at most
+            settings.wind_knn) of each position, and their normalised inverse
+            distance squared weights, both as (npos x k) arrays. """
+        eps = 1e-20 # [m2] to avoid divison by zero for using exact same points
+
+        k = min(settings.wind_knn, self.nvec)
+        if k == self.nvec:
+            ivec = repeat(arange(self.nvec).reshape(1, -1), len(lat), axis=0)
+        else:
+            if self.tree is None:
+                self.tree = cKDTree(unitvec(self.lat, self.lon))
+            ivec = self.tree.query(unitvec(lat, lon), k=k)[1].reshape(len(lat), k)
+
+        # Average cosine for flat-earth approximation
+        vlat = self.lat[ivec]
+        cavelat = cos(radians(0.5 * (lat.reshape(-1, 1) + vlat)))
+
+        # Lat and lon distance in 60 nm units (1 lat degree)
+        dy = lat.reshape(-1, 1) - vlat
+        dx = cavelat * (lon.reshape(-1, 1) - self.lon[ivec])
+
+        # Inverse distance squared, normalized to weight factors
+        invd2 = 1. / (eps + dx * dx + dy * dy)
+        return ivec, invd2 / invd2.sum(axis=1, keepdims=True)
+
+    @staticmethod
+    def gridindex(lat, lon):
+        """ Check whether positions (in any order) form a regular lat/lon grid.
+            Returns the grid axes and the grid indices of the positions, or
+            None when they do not form a grid. """
+        lats, ilat = unique(lat, return_inverse=True)
+        lons, ilon = unique(lon, return_inverse=True)
+        if len(lats) < 2 or len(lons) < 2 or len(lats) * len(lons) != len(lat) or \
+                len(unique(ilat * len(lons) + ilon)) != len(lat):
+            return None
+        return lats, lons, ilat, ilon
+
+    def ungrid(self):
+        """ Convert a gridded field to definition points with profiles on the
+            fixed altitude axis, to allow changing the field. """
+        if self.fgrid is None:
+            return
+        altaxis = self.fgrid.grid[0]
+        for name in ('vnorth', 'veast'):
+            values = getattr(self, name)
+            setattr(self, name, interp1d(altaxis, values, axis=0, bounds_error=False,
+                                         fill_value=(values[0], values[-1]),
+                                         assume_sorted=True)(self.altaxis))
+        self.fgrid = None
+
     def remove(self,idx): # remove a point using the returned index when it was added
+        self.ungrid()
+        self.tree = None
         if idx<len(self.lat):
             self.lat = delete(self.lat,idx)
-            self.lon = delete(self.lat,idx)
+            self.lon = delete(self.lon,idx)
 
             self.vnorth = delete(self.vnorth,idx,axis=1)
             self.veast  = delete(self.veast ,idx,axis=1)
@@ -293,3 +337,10 @@ class Windfield():
                 self.winddim = min(2,len(self.lat)) # Check for 0, 1D, 2D or 3D
 
         return
+
+
+def unitvec(lat, lon):
+    """ Unit vectors (n x 3) of positions [deg], for nearest neighbour search """
+    rlat = radians(lat)
+    rlon = radians(lon)
+    return stack((cos(rlat) * cos(rlon), cos(rlat) * sin(rlon), sin(rlat)), axis=-1)
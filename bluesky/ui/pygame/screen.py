@@ -554,15 +554,19 @@ class Screen:
             if bs.traf.trails.active:
                 bs.traf.trails.buffer()  # move all new trails to background
 
+                # Gather the segments from the trail buffer once
+                lat0, lon0 = bs.traf.trails.bglat0, bs.traf.trails.bglon0
+                lat1, lon1 = bs.traf.trails.bglat1, bs.traf.trails.bglon1
+                col = bs.traf.trails.bgcol
+
                 trlsel = list(np.where(
-                    self.onradar(bs.traf.trails.bglat0, bs.traf.trails.bglon0) + \
-                    self.onradar(bs.traf.trails.bglat1, bs.traf.trails.bglon1))[0])
+                    self.onradar(lat0, lon0) + self.onradar(lat1, lon1))[0])
 
-                x0, y0 = self.ll2xy(bs.traf.trails.bglat0, bs.traf.trails.bglon0)
-                x1, y1 = self.ll2xy(bs.traf.trails.bglat1, bs.traf.trails.bglon1)
+                x0, y0 = self.ll2xy(lat0, lon0)
+                x1, y1 = self.ll2xy(lat1, lon1)
 
                 for i in trlsel:
-                    pg.draw.aaline(self.radbmp, bs.traf.trails.bgcol[i], \
+                    pg.draw.aaline(self.radbmp, col[i], \
                                    (x0[i], y0[i]), (x1[i], y1[i]))
 
             #---------- Draw ADSB Coverage Area
@@ -756,13 +760,13 @@ class Screen:
 
 
             # Draw conflicts: line from a/c to closest point of approach
-            nconf = len(bs.traf.cd.confpairs_unique)
+            nconf = len(bs.traf.cd.confkeys)
             n2conf = len(bs.traf.cd.confpairs)
 
             if nconf>0:
 
                 for j in range(n2conf):
-                    i = bs.traf.id2idx(bs.traf.cd.confpairs[j][0])
+                    i = bs.traf.cd.confpairs.idx[j, 0]
                     if i>=0 and i<bs.traf.ntraf and (i in trafsel):
                         latcpa, loncpa = geo.kwikpos(bs.traf.lat[i], bs.traf.lon[i], \
                                                     bs.traf.trk[i], bs.traf.cd.tcpamax[j] * bs.traf.gs[i] / nm)
@@ -839,15 +843,19 @@ class Screen:
 
             # Draw aircraft trails which are on screen
             if bs.traf.trails.active:
+                # Gather the segments from the trail buffer once
+                lat0, lon0 = bs.traf.trails.lat0, bs.traf.trails.lon0
+                lat1, lon1 = bs.traf.trails.lat1, bs.traf.trails.lon1
+                col = bs.traf.trails.col
+
                 trlsel = list(np.where(
-                    self.onradar(bs.traf.trails.lat0, bs.traf.trails.lon0) + \
-                    self.onradar(bs.traf.trails.lat1, bs.traf.trails.lon1))[0])
+                    self.onradar(lat0, lon0) + self.onradar(lat1, lon1))[0])
 
-                x0, y0 = self.ll2xy(bs.traf.trails.lat0, bs.traf.trails.lon0)
-                x1, y1 = self.ll2xy(bs.traf.trails.lat1, bs.traf.trails.lon1)
+                x0, y0 = self.ll2xy(lat0, lon0)
+                x1, y1 = self.ll2xy(lat1, lon1)
 
                 for i in trlsel:
-                    pg.draw.line(self.win, bs.traf.trails.col[i], \
+                    pg.draw.line(self.win, col[i], \
                                  (x0[i], y0[i]), (x1[i], y1[i]))
 
                 # Redraw background => buffer ; if >1500 foreground linepieces on screen
@@ -875,13 +883,13 @@ class Screen:
                                  "Freq=" + str(int(len(self.dts) / max(0.001, sum(self.dts)))))
 
             self.fontsys.printat(self.win, 10+240, 2, \
-                                 "#LOS      = " + str(len(bs.traf.cd.lospairs_unique)))
+                                 "#LOS      = " + str(len(bs.traf.cd.loskeys)))
             self.fontsys.printat(self.win, 10+240, 18, \
-                                 "Total LOS = " + str(len(bs.traf.cd.lospairs_all)))
+                                 "Total LOS = " + str(bs.traf.cd.nlos_all))
             self.fontsys.printat(self.win, 10+240, 34, \
-                                 "#Con      = " + str(len(bs.traf.cd.confpairs_unique)))
+                                 "#Con      = " + str(len(bs.traf.cd.confkeys)))
             self.fontsys.printat(self.win, 10+240, 50, \
-                                 "Total Con = " + str(len(bs.traf.cd.confpairs_all)))
+                                 "Total Con = " + str(bs.traf.cd.nconf_all))
 
             # Frame ready, flip to screen
             pg.display.flip()
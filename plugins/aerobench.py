@@ -0,0 +1,69 @@
+''' BlueSky atmosphere benchmark plugin.
+
+    Compares the wall time and accuracy of the vectorised aero functions
+    with the analytic atmosphere and with the table-driven atmosphere
+    (see bluesky.tools.aero.AtmosTable). '''
+import time
+import numpy as np
+from bluesky import stack
+from bluesky.tools import aero
+
+
+# Number of aircraft of the benchmark
+sizes = (100, 1000, 10000, 100000)
+
+# Number of timed calls per measurement, and number of measurements of
+# which the fastest is reported
+ncalls = 20
+nrepeat = 5
+
+
+def init_plugin():
+    ''' Plugin initialisation function. '''
+    config = {
+        'plugin_name':     'AEROBENCH',
+        'plugin_type':     'sim'
+        }
+
+    return config
+
+
+@stack.command(name='AEROBENCH')
+def aerobench(step: float = 1.0):
+    ''' Run the atmosphere benchmark for random altitudes and speeds, and
+        print the time per call and the maximum relative error of the
+        table-driven atmosphere with the given altitude step [m]. '''
+    funs = {
+        'vatmos': lambda h, spd: aero.vatmos(h),
+        'vtas2cas': aero.vtas2cas,
+        'vcas2tas': aero.vcas2tas,
+        'vcasormach2tas': aero.vcasormach2tas,
+    }
+    oldtable = aero.atmostable
+    lines = ['    n  function        analytic [ms]   table [ms]   max rel error']
+    for n in sizes:
+        rng = np.random.RandomState(n)
+        h = rng.rand(n) * 13000.0
+        spd = np.where(rng.rand(n) > 0.5, 0.8, rng.rand(n) * 150.0 + 100.0)
+        for name, fun in funs.items():
+            aero.atmoslut(False)
+            tisa, ref = measure(fun, h, spd)
+            aero.atmoslut(True, step)
+            tlut, value = measure(fun, h, spd)
+            err = max(np.max(np.abs(v / r - 1.0)) for v, r in
+                      zip(np.atleast_2d(value), np.atleast_2d(ref)))
+            lines.append(f'{n:6d}  {name:15s} {tisa * 1e3:13.3f} {tlut * 1e3:12.3f} {err:15.2e}')
+    aero.atmostable = oldtable
+    return True, '\n'.join(lines)
+
+
+def measure(fun, *args):
+    ''' Measure the wall time per call of fun, and return it with the result. '''
+    result = fun(*args)
+    tbest = float('inf')
+    for _ in range(nrepeat):
+        t0 = time.perf_counter()
+        for _ in range(ncalls):
+            fun(*args)
+        tbest = min(tbest, (time.perf_counter() - t0) / ncalls)
+    return tbest, result
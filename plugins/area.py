@@ -218,7 +218,7 @@ class Area(Entity):
 
             # delete all aicraft in self.delidx
             if len(delidx) > 0:
-                traf.delete(delidx)
+                traf.queuedelete(delidx)
 
 
 
@@ -226,9 +226,9 @@ class Area(Entity):
         if not self.swtaxi:
             delidxalt = np.where((self.oldalt >= self.swtaxialt)
                                  * (traf.alt < self.swtaxialt))[0]
-            self.oldalt = traf.alt
+            self.oldalt = traf.alt.copy()
             if len(delidxalt) > 0:
-                traf.delete(list(delidxalt))
+                traf.queuedelete(delidxalt)
 
     def set_area(self, *args, exparea=False):
         ''' Set Experiment Area. Aircraft leaving the experiment area are deleted.
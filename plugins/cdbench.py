@@ -0,0 +1,170 @@
+''' BlueSky conflict detection benchmark plugin.
+
+    Measures the wall time per call, the peak memory use and the number of
+    conflicts of all available conflict detection methods, for traffic
+    patterns of the synthetic plugin and random MCRE traffic, at traffic
+    sizes from 100 to 20000 aircraft. Results are written to a JSON file
+    to track performance between releases. '''
+import json
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import bluesky as bs
+from bluesky import stack, traf, sim
+from bluesky.traffic.asas import ConflictDetection
+import synthetic
+
+
+# Traffic sizes of the benchmark
+sizes = (100, 200, 500, 1000, 2000, 5000, 10000, 20000)
+
+
+def mcre(n):
+    ''' Random traffic in the current view area. '''
+    sim.reset()
+    traf.mcre(n)
+
+
+# Base traffic patterns, with their generator function and arguments.
+# Larger traffic sizes are obtained by tiling copies of the base pattern,
+# so that the traffic density (and the number of conflicts per aircraft)
+# stays the same.
+patterns = {
+    'SUPER':  (synthetic.gensuper, (50,)),
+    'SPHERE': (synthetic.sphere, (20,)),
+    'MATRIX': (synthetic.matrix, (10,)),
+    'FUNNEL': (synthetic.funnel, (10,)),
+    'MCRE':   (mcre, (100,))
+}
+
+# A method is skipped for the next traffic size when its (quadratically
+# extrapolated) time per call or peak memory use exceeds these limits
+maxtime = 30.0  # [s]
+maxmem = 4e9    # [bytes]
+
+# Number of timed calls per measurement
+ncalls = 3
+
+
+def init_plugin():
+    ''' Plugin initialisation function. '''
+    config = {
+        'plugin_name':     'CDBENCH',
+        'plugin_type':     'sim'
+        }
+
+    return config
+
+
+@stack.command(name='CDBENCH')
+def cdbench(fname: 'txt' = '', nmax: int = 20000, *methods: 'txt'):
+    ''' Run the conflict detection benchmark, and write the results to a
+        JSON file in the output folder.
+
+        Arguments:
+        - fname: The name of the JSON file (default cdbench_<date>.json)
+        - nmax: The largest number of aircraft to benchmark
+        - methods: The CD methods to benchmark (default all methods) '''
+    available = ConflictDetection.derived()
+    methods = [m.upper() for m in methods] or list(available)
+    unknown = [m for m in methods if m not in available]
+    if unknown:
+        return False, f'CDBENCH: Unknown CD method(s) {", ".join(unknown)}\n' + \
+            f'Available CD methods: {", ".join(available)}'
+
+    prevmethod = ConflictDetection.selected()
+    results = []
+    for pattern in patterns:
+        # Skip a method for larger traffic sizes when it becomes too slow
+        skip = dict()
+        benchsizes = [n for n in sizes if n <= nmax]
+        for n, nnext in zip(benchsizes, benchsizes[1:] + [nmax]):
+            gentraffic(pattern, n)
+            for name in methods:
+                if name in skip:
+                    results.append(dict(method=name, pattern=pattern,
+                                        ntraf=n, skipped=skip[name]))
+                    continue
+                result = measure(available[name])
+                result.update(method=name, pattern=pattern, ntraf=n)
+                results.append(result)
+
+                # Quadratic extrapolation to the next traffic size
+                factor = (nnext / n) ** 2
+                if result['time_mean'] * factor > maxtime:
+                    skip[name] = 'time limit'
+                elif result['peakmem'] * factor > maxmem:
+                    skip[name] = 'memory limit'
+    prevmethod.select()
+    sim.reset()
+
+    fname = fname or datetime.now().strftime('cdbench_%Y%m%d_%H%M%S.json')
+    if not fname.lower().endswith('.json'):
+        fname += '.json'
+    with open(bs.settings.log_path + '/' + fname, 'w') as f:
+        json.dump(dict(date=datetime.now().isoformat(),
+                       platform=platform.platform(),
+                       python=platform.python_version(),
+                       numpy=np.__version__,
+                       ncalls=ncalls,
+                       results=results), f, indent=1)
+
+    return True, f'CDBENCH: {len(results)} results written to ' + \
+        f'{bs.settings.log_path}/{fname}'
+
+
+def gentraffic(pattern, n):
+    ''' Create n aircraft by tiling copies of a base traffic pattern in a
+        square grid. '''
+    # Generate the base pattern, and store its aircraft states
+    fun, args = patterns[pattern]
+    np.random.seed(1)
+    fun(*args)
+    nbase = traf.ntraf
+    base = dict(lat=traf.lat.copy(), lon=traf.lon.copy(), hdg=traf.hdg.copy(),
+                alt=traf.alt.copy(), cas=traf.cas.copy(), vs=traf.vs.copy(),
+                selalt=traf.selalt.copy(), selvs=traf.selvs.copy(),
+                type=np.array(traf.type))
+
+    # Tiles are separated by at least two degrees, which is more than the
+    # distance that aircraft can close in within the lookahead time
+    ncols = int(np.ceil(np.sqrt(np.ceil(n / nbase))))
+    dlat = np.ptp(base['lat']) + 2.0
+    dlon = np.ptp(base['lon']) + 2.0
+    idx = np.arange(n) % nbase
+    tile = np.arange(n) // nbase
+    lat = base['lat'][idx] + (tile // ncols - 0.5 * (ncols - 1)) * dlat
+    lon = base['lon'][idx] + (tile % ncols - 0.5 * (ncols - 1)) * dlon
+
+    sim.reset()
+    traf.cre([f'{pattern}{i}' for i in range(n)], list(base['type'][idx]),
+             lat, lon, base['hdg'][idx], base['alt'][idx], base['cas'][idx])
+    traf.vs[:] = base['vs'][idx]
+    traf.selalt[:] = base['selalt'][idx]
+    traf.selvs[:] = base['selvs'][idx]
+
+
+def measure(method):
+    ''' Measure the wall time per call, the peak memory use and the number
+        of conflicts and losses of separation of a CD method for the
+        current traffic. '''
+    method.select()
+    cd = traf.cd
+
+    # Peak memory use, measured in a separate call as tracing memory
+    # allocations slows down the detection
+    tracemalloc.start()
+    confpairs, lospairs, *_ = cd.detect(traf, traf, cd.rpz, cd.hpz, cd.dtlookahead)
+    peakmem = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    times = []
+    for _ in range(ncalls):
+        t0 = time.perf_counter()
+        cd.detect(traf, traf, cd.rpz, cd.hpz, cd.dtlookahead)
+        times.append(time.perf_counter() - t0)
+
+    return dict(time_mean=np.mean(times), time_min=np.min(times),
+                peakmem=peakmem, nconf=len(confpairs), nlos=len(lospairs))
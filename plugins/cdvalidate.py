@@ -0,0 +1,93 @@
+''' BlueSky conflict detection validation plugin.
+
+    Compares the conflicts found with single-precision screening
+    (CDPRECISION FLOAT32) with the double-precision reference, on the
+    conflict geometries of the synthetic plugin. '''
+import numpy as np
+from bluesky import stack, traf
+from bluesky.tools.aero import Rearth
+from bluesky.traffic.asas import ConflictDetection, StateBased
+import synthetic
+
+
+# Synthetic scenarios used for validation, with their generator function
+# and arguments
+scenarios = {
+    'SUPER':    (synthetic.gensuper, (100,)),
+    'SPHERE':   (synthetic.sphere, (50,)),
+    'MATRIX':   (synthetic.matrix, (20,)),
+    'FUNNEL':   (synthetic.funnel, (10,)),
+    'TAKEOVER': (synthetic.takeover, (20,)),
+    'ROW':      (synthetic.row, (20, 30)),
+    'COL':      (synthetic.col, (20, 30))
+}
+
+
+def init_plugin():
+    ''' Plugin initialisation function. '''
+    config = {
+        'plugin_name':     'CDVALIDATE',
+        'plugin_type':     'sim'
+        }
+
+    return config
+
+
+@stack.command(name='CDVALIDATE')
+def cdvalidate(name: 'txt' = '', nsteps: int = 11):
+    ''' Validate single-precision conflict detection against double
+        precision on the synthetic conflict scenarios.
+
+        Arguments:
+        - name: The name of the synthetic scenario. All scenarios are
+          validated when no name is given.
+        - nsteps: The number of times over the lookahead time at which the
+          traffic is extrapolated and conflicts are compared. '''
+    if name and name not in scenarios:
+        return False, f'CDVALIDATE: Unknown scenario {name}\n' + \
+            f'Available scenarios: {", ".join(scenarios)}'
+
+    prevmethod = ConflictDetection.selected()
+    lines = []
+    success = True
+    for scenname in ([name] if name else scenarios):
+        fun, args = scenarios[scenname]
+        fun(*args)
+        nconf, nmismatch = validate(nsteps)
+        success = success and nmismatch == 0
+        lines.append(f'{scenname}: {traf.ntraf} aircraft, {nsteps} steps, '
+                     f'{nconf} conflicts, {nmismatch} mismatches')
+    prevmethod.select()
+
+    return success, '\n'.join(lines)
+
+
+def validate(nsteps):
+    ''' Compare single and double precision conflict detection for the
+        current traffic, extrapolated with constant velocities at nsteps
+        times within the lookahead time.
+        Returns the number of conflicts and the number of steps where the
+        results differ. '''
+    StateBased.select()
+    cd = traf.cd
+    lat0, lon0, alt0 = traf.lat.copy(), traf.lon.copy(), traf.alt.copy()
+    trkrad = np.radians(traf.trk)
+    nconf = nmismatch = 0
+    for t in np.linspace(0.0, cd.dtlookahead_def, nsteps):
+        traf.lat = lat0 + np.degrees(t * traf.gs * np.cos(trkrad) / Rearth)
+        traf.lon = lon0 + np.degrees(t * traf.gs * np.sin(trkrad) / Rearth /
+                                     np.cos(np.radians(traf.lat)))
+        traf.alt = alt0 + t * traf.vs
+        results = []
+        for precision in ('float64', 'float32'):
+            cd.setprecision(precision)
+            results.append(cd.detect(traf, traf, cd.rpz, cd.hpz, cd.dtlookahead))
+        cd.setprecision('float64')
+        ref, res = results
+        nconf += len(ref[0])
+        if not (ref[0] == res[0] and ref[1] == res[1] and
+                all(np.array_equal(np.asarray(a), np.asarray(b))
+                    for a, b in zip(ref[2:], res[2:]))):
+            nmismatch += 1
+    traf.lat, traf.lon, traf.alt = lat0, lon0, alt0
+    return nconf, nmismatch
@@ -0,0 +1,79 @@
+''' BlueSky kinematics benchmark plugin.
+
+    Measures the wall time per step and the peak memory use of the traffic
+    kinematics update (airspeed, groundspeed and position), and compares
+    it with the same update computed with temporary arrays, as it was
+    implemented before the kinematics were updated in place. The latter
+    is the reference implementation of the traffic tests (see
+    bluesky.tools.kinematics). '''
+import time
+import tracemalloc
+import numpy as np
+from bluesky import stack, traf, sim
+from bluesky.tools.kinematics import kinematics_state, kinematics_reference
+
+
+# Traffic sizes of the benchmark
+sizes = (100, 1000, 10000, 20000, 100000)
+
+# Number of timed steps per measurement
+nsteps = 50
+
+
+def init_plugin():
+    ''' Plugin initialisation function. '''
+    config = {
+        'plugin_name':     'KINBENCH',
+        'plugin_type':     'sim'
+        }
+
+    return config
+
+
+@stack.command(name='KINBENCH')
+def kinbench(nmax: int = 20000, wind: 'onoff' = False):
+    ''' Run the kinematics benchmark for random traffic, and print the
+        time per step of both implementations.
+
+        Arguments:
+        - nmax: The largest number of aircraft to benchmark
+        - wind: Benchmark with (ON) or without (OFF) wind
+
+        The benchmark resets the simulation, so it refuses to run when
+        there is traffic. '''
+    if traf.ntraf:
+        return False, 'KINBENCH: The benchmark resets the simulation, ' + \
+            'first delete all traffic with RESET'
+    lines = ['    ntraf   in-place [ms]   temporary [ms]   peak mem in-place/temporary [kB]']
+    for n in [n for n in sizes if n <= nmax]:
+        sim.reset()
+        traf.mcre(n)
+        if wind:
+            traf.wind.addpoint(np.mean(traf.lat), np.mean(traf.lon), 270.0, 20.0)
+        tinplace, meminplace = measure(inplace)
+        ttemp, memtemp = measure(kinematics_reference, kinematics_state(traf), sim.simdt)
+        lines.append(f'{n:9d} {tinplace * 1e3:15.3f} {ttemp * 1e3:16.3f} '
+                     f'{meminplace / 1e3:18.0f} / {memtemp / 1e3:.0f}')
+    sim.reset()
+    return True, '\n'.join(lines)
+
+
+def measure(fun, *args):
+    ''' Measure the wall time per call and the peak memory use of fun. '''
+    fun(*args)
+    tracemalloc.start()
+    fun(*args)
+    peakmem = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    t0 = time.perf_counter()
+    for _ in range(nsteps):
+        fun(*args)
+    return (time.perf_counter() - t0) / nsteps, peakmem
+
+
+def inplace():
+    ''' The kinematics update of the traffic object. '''
+    traf.update_airspeed()
+    traf.update_groundspeed()
+    traf.update_pos()
@@ -168,7 +168,7 @@ class OpenSkyListener(Entity):
         # opensky already filters
         delidx = np.where(np.logical_and(self.my_ac, curtime - self.upd_time > 10))[0]
         if len(delidx) > 0:
-            traf.delete(delidx)
+            traf.queuedelete(delidx)
 
         # t5 = time.time()
         # print('req={}, mod={}, cre={}, mov={}, del={}, ncre={}, nmov={}, ndel={}'.format(curtime-t1, t2-curtime, t3-t2, t4-t3, t5-t4, n_new, n_oth, len(delidx)))
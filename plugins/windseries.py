@@ -0,0 +1,285 @@
+''' BlueSky plugin for time-varying wind from a series of local files.
+
+    Reads a time series of wind fields on pressure levels from local netCDF
+    files (e.g., ERA5 downloads of the WINDECMWF plugin) and/or GRIB files
+    (e.g., GFS analyses of the WINDGFS plugin), and interpolates the wind
+    linearly in time, altitude, latitude and longitude.
+
+    Only the two time slices that bracket the current simulation time are
+    kept in memory. The slice after them is read in advance on a background
+    thread, so that the simulation does not have to wait when it passes to
+    the next interval. NetCDF (classic format) files are memory mapped, so
+    that reading a slice only touches the data of that slice.
+
+    Usage: select this wind implementation with IMPL WINDSIM WINDSERIES,
+    and load the files with WINDSERIES. '''
+import datetime
+import glob
+import os
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor, wait
+import numpy as np
+from scipy.interpolate import RegularGridInterpolator
+from scipy.io import netcdf_file
+import bluesky as bs
+from bluesky import stack
+from bluesky.traffic.windsim import WindSim
+
+try:
+    import netCDF4
+except ImportError:
+    netCDF4 = None
+
+try:
+    import pygrib
+except ImportError:
+    pygrib = None
+
+
+# Variable names of time, pressure level, latitude and longitude in netCDF files
+ncnames = dict(time=('time', 'valid_time'), level=('level', 'pressure_level', 'isobaricInhPa'),
+               lat=('latitude', 'lat'), lon=('longitude', 'lon'))
+
+# Seconds per time unit of netCDF time variables
+ncunits = dict(seconds=1.0, minutes=60.0, hours=3600.0, days=86400.0)
+
+
+def closefiles(files):
+    ''' Close all files in files. '''
+    for f in files:
+        f.close()
+
+
+def init_plugin():
+    global windseries
+    windseries = WindSeries()
+
+    config = {
+        'plugin_name': 'WINDSERIES',
+        'plugin_type': 'sim'
+    }
+
+    return config
+
+
+class WindSeries(WindSim):
+    def __init__(self):
+        super().__init__()
+        # Single reader thread: all file access goes through this executor,
+        # the simulation thread waits for the result where it needs it
+        self.reader = ThreadPoolExecutor(1)
+        self.clearseries()
+
+    def clearseries(self):
+        ''' Remove the wind series. '''
+        self.times   = []      # Times of the slices [s since self.epoch]
+        self.epoch   = None    # Time of the first slice (UTC)
+        self.loaders = []      # Function per slice that reads its (v, u) data
+        self.files   = []      # Opened files of the series
+        self.alts    = None    # [m] Altitude axis of the grid
+        self.lats    = None    # [deg] Latitude axis of the grid
+        self.lons    = None    # [deg] Longitude axis of the grid
+        self.subset  = None    # Grid indices (level, lat, lon) within the area
+        self.slices  = dict()  # Resident slices by index
+        self.pending = dict()  # Slices being read on the reader thread by index
+        self.ibracket = -1     # Index of the first slice of the bracket
+        self.fgrid   = None
+
+    def clear(self):
+        ''' Clear the wind field, including the wind series. '''
+        super().clear()
+        if hasattr(self, 'reader'):
+            # Wait for reads in progress before closing the files
+            for future in self.pending.values():
+                future.cancel()
+            wait(self.pending.values())
+            files = self.files
+            self.clearseries()
+            self.reader.submit(closefiles, files).result()
+
+    @stack.command(name='WINDSERIES')
+    def loadseries(self, path: 'txt', lat0: 'lat' = -90.0, lon0: 'lon' = -180.0,
+                   lat1: 'lat' = 90.0, lon1: 'lon' = 180.0):
+        ''' WINDSERIES: Load a time series of wind fields from local files.
+
+            Arguments:
+            - path: Directory or file pattern of netCDF (.nc) and/or GRIB
+              (.grb, .grb2, .grib) files. Relative paths are relative to
+              the data directory.
+            - lat0, lon0, lat1, lon1 [deg]: Bounding box of the wind field
+        '''
+        if not os.path.isabs(path):
+            path = os.path.join(bs.settings.data_path, path)
+        if os.path.isdir(path):
+            path = os.path.join(path, '*')
+        fnames = sorted(f for f in glob.glob(path) if
+                        os.path.splitext(f)[1].lower() in ('.nc', '.grb', '.grb2', '.grib'))
+        if not fnames:
+            return False, f'WINDSERIES: No netCDF or GRIB files found for {path}'
+
+        self.clear()
+        series = []
+        try:
+            for fname in fnames:
+                scan = self.scannetcdf if fname.lower().endswith('.nc') else self.scangrib
+                series.extend(self.reader.submit(scan, fname).result())
+        except (ValueError, KeyError, OSError) as e:
+            self.clear()
+            return False, f'WINDSERIES: Could not read {fname}: {e}'
+
+        # Sort the slices in time
+        series.sort(key=lambda entry: entry[0])
+        self.epoch = series[0][0]
+        self.times = [(t - self.epoch).total_seconds() for t, _ in series]
+        self.loaders = [loader for _, loader in series]
+
+        # Set the grid from the first slice, limited to the given area
+        levels, lats, lons, _, _ = self.reader.submit(self.loaders[0]).result()
+        lons = (lons + 180.0) % 360.0 - 180.0  # Convert range from 0~360 to -180~180
+        alts = (1.0 - (levels * 100.0 / 101325.0)**0.190264) * 44330.76923  # [m]
+        ilat = np.flatnonzero((lats >= min(lat0, lat1)) & (lats <= max(lat0, lat1)))
+        ilon = np.flatnonzero((lons >= min(lon0, lon1)) & (lons <= max(lon0, lon1)))
+        if len(ilat) < 2 or len(ilon) < 2 or len(alts) < 2:
+            self.clear()
+            return False, 'WINDSERIES: Wind data non-existent in area ' \
+                f'[{lat0}, {lat1}], [{lon0}, {lon1}]'
+        ialt = np.argsort(alts)
+        ilat = ilat[np.argsort(lats[ilat])]
+        ilon = ilon[np.argsort(lons[ilon])]
+        self.alts, self.lats, self.lons = alts[ialt], lats[ilat], lons[ilon]
+        self.subset = np.ix_(ialt, ilat, ilon)
+
+        # Wind is now given by the series
+        self.winddim = 3
+        self.bracket()
+
+        return True, f'WINDSERIES: Loaded {len(self.times)} wind fields from ' \
+            f'{self.epoch} to {self.epoch + datetime.timedelta(seconds=self.times[-1])}'
+
+    def scannetcdf(self, fname):
+        ''' Get the time and loader function of each slice in a netCDF file. '''
+        with open(fname, 'rb') as f:
+            classic = f.read(3) == b'CDF'
+        if classic:
+            # Classic netCDF files are memory mapped
+            data = netcdf_file(fname, mode='r', mmap=True, maskandscale=True)
+        elif netCDF4 is not None:
+            data = netCDF4.Dataset(fname, mode='r')
+        else:
+            raise ValueError('netCDF4 files require the netCDF4 package')
+        self.files.append(data)
+
+        var = dict()
+        for key, names in ncnames.items():
+            name = next((name for name in names if name in data.variables), None)
+            if name is None:
+                raise KeyError(f'no variable {names[0]}')
+            var[key] = data.variables[name]
+        units = var['time'].units
+        units = units.decode() if isinstance(units, bytes) else units
+        unit, _, ref = units.partition(' since ')
+        ref = datetime.datetime.fromisoformat(ref.strip().replace(' ', 'T')[:19])
+        times = [ref + datetime.timedelta(seconds=float(t) * ncunits[unit.strip().lower()])
+                 for t in var['time'][:]]
+
+        def loader(itime):
+            def load():
+                return (np.array(var['level'][:], dtype=float),
+                        np.array(var['lat'][:], dtype=float),
+                        np.array(var['lon'][:], dtype=float),
+                        np.asarray(data.variables['v'][itime], dtype=float),
+                        np.asarray(data.variables['u'][itime], dtype=float))
+            return load
+
+        return [(t, loader(itime)) for itime, t in enumerate(times)]
+
+    def scangrib(self, fname):
+        ''' Get the time and loader function of each slice in a GRIB file. '''
+        if pygrib is None:
+            raise ValueError('GRIB files require the pygrib package')
+
+        # Message numbers of the wind components per time and level
+        messages = dict()
+        grbs = pygrib.open(fname)
+        for grb in grbs:
+            if grb.typeOfLevel == 'isobaricInhPa' and grb.level >= 100 and \
+                    grb.shortName in ('u', 'v'):
+                messages.setdefault(grb.validDate, dict()).setdefault(
+                    grb.level, dict())[grb.shortName] = grb.messagenumber
+        grbs.close()
+
+        def loader(levels):
+            def load():
+                grbs = pygrib.open(fname)
+                lats, lons = grbs.message(levels[min(levels)]['u']).latlons()
+                v = [grbs.message(levels[level]['v']).values for level in sorted(levels)]
+                u = [grbs.message(levels[level]['u']).values for level in sorted(levels)]
+                grbs.close()
+                return (np.array(sorted(levels), dtype=float), lats[:, 0], lons[0, :],
+                        np.array(v, dtype=float), np.array(u, dtype=float))
+            return load
+
+        return [(t, loader(levels)) for t, levels in messages.items()
+                if all(len(comp) == 2 for comp in levels.values())]
+
+    def readslice(self, i):
+        ''' Read slice i as (alt, lat, lon, [vnorth, veast]) array. '''
+        _, _, _, v, u = self.loaders[i]()
+        return np.stack((v[self.subset], u[self.subset]), axis=-1)
+
+    def fetch(self, i):
+        ''' Start reading slice i on the reader thread, when it is not
+            resident or being read already. '''
+        if i not in self.slices and i not in self.pending:
+            self.pending[i] = self.reader.submit(self.readslice, i)
+
+    def bracket(self):
+        ''' Select the two slices around the current simulation time, and
+            return the time interpolation factor between them. '''
+        t = (bs.sim.utc - self.epoch).total_seconds()
+        i = max(0, min(bisect_right(self.times, t) - 1, len(self.times) - 2))
+        if i != self.ibracket:
+            bracket = (i, min(i + 1, len(self.times) - 1))
+            for j in bracket:
+                self.fetch(j)
+                if j not in self.slices:
+                    self.slices[j] = self.pending.pop(j).result()
+
+            # Keep only the bracketing slices, and read the next in advance
+            self.slices = {j: self.slices[j] for j in bracket}
+            for j in [j for j in self.pending if j != i + 2]:
+                self.pending.pop(j).cancel()
+            if i + 2 < len(self.times):
+                self.fetch(i + 2)
+
+            values = np.concatenate([self.slices[j] for j in bracket], axis=-1)
+            self.fgrid = RegularGridInterpolator((self.alts, self.lats, self.lons), values,
+                                                 bounds_error=False, fill_value=0.)
+            self.ibracket = i
+
+        if len(self.times) < 2:
+            return 0.0
+        return min(1.0, max(0.0, (t - self.times[i]) / (self.times[i + 1] - self.times[i])))
+
+    def getdata(self, userlat, userlon, useralt=0.0):
+        if not self.times:
+            return super().getdata(userlat, userlon, useralt)
+
+        lat = np.atleast_1d(np.asarray(userlat, dtype=float))
+        lon = np.atleast_1d(np.asarray(userlon, dtype=float))
+        alt = np.broadcast_to(np.asarray(0.0 if useralt is None else useralt, dtype=float), lat.shape)
+
+        # Interpolate both slices on the grid, and then in time. Below and above
+        # the grid the wind of the lowest and highest level is used.
+        ftime = self.bracket()
+        alt = np.clip(alt, self.alts[0], self.alts[-1])
+        wind = self.fgrid(np.column_stack((alt, lat, lon)))
+        vnorth = (1.0 - ftime) * wind[:, 0] + ftime * wind[:, 2]
+        veast  = (1.0 - ftime) * wind[:, 1] + ftime * wind[:, 3]
+
+        # Return same type as positons were given
+        if isinstance(userlat, np.ndarray):
+            return vnorth, veast
+        elif isinstance(userlat, list):
+            return list(vnorth), list(veast)
+        return float(vnorth[0]), float(veast[0])